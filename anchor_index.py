@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Anchor Index - Sidecar index of ##ANCHOR:iNNN## entries for random access into a report
+"""
+import os
+import re
+import mmap
+import sqlite3
+
+# Bump when the table layout or the scanning rules change
+INDEX_VERSION = "1"
+
+ANCHOR_MARKER = b'##ANCHOR:i'
+ANCHOR_ID_PATTERN = re.compile(r'##ANCHOR:i(\d+)##')
+
+# IDs looked up per query, well below SQLite's bound-parameter limit
+LOOKUP_CHUNK_SIZE = 500
+
+def default_index_path(input_file):
+    """Return the sidecar index path used for input_file."""
+    return input_file + '.idx'
+
+def _line_bounds(mm, pos):
+    """Return (start, end) offsets of the line containing pos, end including its terminator."""
+    size = len(mm)
+    # Text mode treats \n, \r\n and a lone \r as line endings
+    start = mm.rfind(b'\n', 0, pos) + 1
+    start = max(start, mm.rfind(b'\r', start, pos) + 1)
+    newline = mm.find(b'\n', pos)
+    end = size if newline == -1 else newline + 1
+    carriage_return = mm.find(b'\r', pos, end)
+    if carriage_return != -1:
+        end = carriage_return + 2 if mm[carriage_return + 1:carriage_return + 2] == b'\n' else carriage_return + 1
+    return start, end
+
+def scan_anchor_entries(mm):
+    """
+    Yield (person_id, offset, length) for each anchored entry of a memory-mapped report.
+
+    Follows generate_tex.iter_anchor_entries(): an entry is every byte between
+    an anchor line and the next line starting with ##ANCHOR:i, and anchors
+    with an empty body are skipped the same way.  Only lines containing the
+    marker are decoded.
+    """
+    size = len(mm)
+    person_id = None
+    entry_start = 0
+
+    pos = mm.find(ANCHOR_MARKER)
+    while pos != -1:
+        line_start, line_end = _line_bounds(mm, pos)
+        line = mm[line_start:line_end].decode('utf-8', errors='replace').strip()
+        if line.startswith('##ANCHOR:i'):
+            if person_id is not None and line_start > entry_start:
+                yield person_id, entry_start, line_start - entry_start
+
+            match = ANCHOR_ID_PATTERN.search(line)
+            if match:
+                person_id = match.group(1)
+            else:
+                person_id = None
+                print(f"Warning: Could not extract person_id from anchor: '{line}'")
+            entry_start = line_end
+        pos = mm.find(ANCHOR_MARKER, line_end)
+
+    # The last entry runs to the end of the file; a final anchor line only
+    # has a (blank) body if it ends with a newline
+    if person_id is not None and (entry_start < size or mm[size - 1:size] in (b'\n', b'\r')):
+        yield person_id, entry_start, size - entry_start
+
+class AnchorIndex:
+    """
+    Persistent SQLite map from person ID to the byte offset and length of its entry.
+
+    The index remembers the size and modification time of the report it was
+    built from and is rebuilt when either changes.  Entries keep their file
+    order, so a selection renders in the same order as a full conversion.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        with self._connection:
+            self._connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS anchors (position INTEGER PRIMARY KEY, person_id TEXT NOT NULL, "
+                                     "number INTEGER NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS anchors_person_id ON anchors (person_id)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS anchors_number ON anchors (number)")
+
+    def _meta(self):
+        return dict(self._connection.execute("SELECT key, value FROM meta"))
+
+    @staticmethod
+    def _stamp(input_file):
+        stat = os.stat(input_file)
+        return {'version': INDEX_VERSION, 'size': str(stat.st_size), 'mtime_ns': str(stat.st_mtime_ns)}
+
+    def is_current(self, input_file):
+        """Return True if the index was built from input_file as it is now."""
+        return self._meta() == self._stamp(input_file)
+
+    def rebuild(self, input_file):
+        """Scan input_file and replace the index contents; return the number of entries."""
+        stamp = self._stamp(input_file)
+        with open(input_file, 'rb') as f:
+            if int(stamp['size']) == 0:
+                rows = []
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    rows = [(person_id, int(person_id), offset, length)
+                            for person_id, offset, length in scan_anchor_entries(mm)]
+
+        with self._connection:
+            self._connection.execute("DELETE FROM meta")
+            self._connection.execute("DELETE FROM anchors")
+            self._connection.executemany("INSERT INTO anchors (person_id, number, offset, length) VALUES (?, ?, ?, ?)", rows)
+            self._connection.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", stamp.items())
+        return len(rows)
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM anchors").fetchone()[0]
+
+    def lookup(self, person_ids=(), id_range=None):
+        """
+        Return (person_id, offset, length) rows for the given IDs and/or inclusive numeric range, in file order.
+        """
+        rows = {}
+        person_ids = list(person_ids)
+        for start in range(0, len(person_ids), LOOKUP_CHUNK_SIZE):
+            chunk = person_ids[start:start + LOOKUP_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            for row in self._connection.execute(
+                    f"SELECT position, person_id, offset, length FROM anchors WHERE person_id IN ({placeholders})", chunk):
+                rows[row[0]] = row[1:]
+        if id_range is not None:
+            for row in self._connection.execute(
+                    "SELECT position, person_id, offset, length FROM anchors WHERE number BETWEEN ? AND ?", id_range):
+                rows[row[0]] = row[1:]
+        return [rows[position] for position in sorted(rows)]
+
+    def close(self):
+        self._connection.close()
+
+def open_index(input_file, index_file=None):
+    """
+    Open the sidecar index for input_file, rebuilding it if it is missing or stale.
+
+    Returns:
+        tuple: (AnchorIndex, True if the index was (re)built)
+    """
+    index = AnchorIndex(index_file or default_index_path(input_file))
+    if index.is_current(input_file):
+        return index, False
+    index.rebuild(input_file)
+    return index, True
+
+def read_entries(input_file, rows):
+    """
+    Yield (person_id, entry_content) for index rows by seeking straight to each entry.
+
+    The content is what generate_tex.iter_anchor_entries() yields for the
+    same entry: newlines normalised as in text mode and surrounding
+    whitespace stripped.
+    """
+    with open(input_file, 'rb') as f:
+        for person_id, offset, length in rows:
+            f.seek(offset)
+            text = f.read(length).decode('utf-8')
+            yield person_id, text.replace('\r\n', '\n').replace('\r', '\n').strip()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Batch Converter - Splits a genealogy report at anchors and converts every chunk to LaTeX in one run
+"""
+import os
+import re
+import sys
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import generate_tex
+import compressed_io
+from split_file import iter_chunk_ranges, plan_balanced_ranges, scan_costs
+
+def natural_sort_key(filename):
+    """Sort key that orders 'part2.txt' before 'part10.txt'."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', filename)]
+
+def convert_chunk_text(text, output_file):
+    """Convert the text of one chunk to a .tex file."""
+    with open(output_file, 'w', encoding='utf-8') as output:
+        generate_tex.convert_lines(text.split('\n'), output)
+    return output_file
+
+# Chunk files taken from an input directory, plain or compressed by split_file.py --compress
+CHUNK_EXTENSIONS = ('.txt',) + tuple(f".txt.{compression}" for compression in compressed_io.COMPRESSIONS)
+
+def convert_chunk_file(input_file, output_file):
+    """Convert one chunk file (plain or compressed) to a .tex file."""
+    with compressed_io.open_file(input_file) as f:
+        text = f.read()
+    return convert_chunk_text(text, output_file)
+
+def batch_convert(input_path, output_dir, lines_per_file=7000, prefix="part", jobs=None,
+                  keep_txt=False, master_name=None, chunks=None, macros=False):
+    """
+    Split a report (or take a directory of chunks) and convert every chunk to LaTeX.
+
+    A single report is split at anchors in memory, using the same boundaries as
+    split_file.py.  Chunks are converted concurrently to {prefix}1.tex,
+    {prefix}2.tex, ... and a master file of \\input lines is written next to them.
+
+    Args:
+        input_path (str): Report file (plain or compressed), or directory of .txt chunks
+        output_dir (str): Directory where .tex files will be created
+        lines_per_file (int): Approximate number of lines per chunk when splitting
+        prefix (str): Prefix for output filenames (default: "part")
+        jobs (int): Worker processes (default: one per CPU); 1 or less converts in this process
+        keep_txt (bool): Also write the intermediate {prefix}N.txt chunks
+        master_name (str): Master file name (default: "{prefix}_master.tex")
+        chunks (int): Split into this many chunks of near-equal compile cost instead
+            of every 'lines_per_file' lines
+        macros (bool): Define long lines repeated across the chunks once, as macros
+            in a file next to the master (see generate_tex.share_repeated_lines())
+
+    Returns:
+        bool: True if successful, False if there were errors
+    """
+    if not os.path.exists(input_path):
+        print(f"Error: Input '{input_path}' not found!")
+        return False
+
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+    except (PermissionError, OSError) as e:
+        print(f"Error: Cannot create/access output directory '{output_dir}': {e}")
+        return False
+
+    # Each task is (converter, source, output_file)
+    tasks = []
+    if os.path.isdir(input_path):
+        chunk_files = sorted((name for name in os.listdir(input_path) if name.endswith(CHUNK_EXTENSIONS)),
+                             key=natural_sort_key)
+        if not chunk_files:
+            print(f"Error: No .txt chunks found in '{input_path}'")
+            return False
+        for file_count, name in enumerate(chunk_files, 1):
+            output_file = os.path.join(output_dir, f"{prefix}{file_count}.tex")
+            tasks.append((convert_chunk_file, os.path.join(input_path, name), output_file))
+        print(f"Found {len(tasks)} chunks in {input_path}")
+    else:
+        with compressed_io.open_file(input_path) as f:
+            all_lines = f.readlines()
+        print(f"Total lines in input file: {len(all_lines)}")
+
+        if chunks:
+            ranges = plan_balanced_ranges(*scan_costs(all_lines), chunks)
+        else:
+            ranges = iter_chunk_ranges(all_lines, lines_per_file)
+        for file_count, (start_line, end_line) in enumerate(ranges, 1):
+            text = ''.join(all_lines[start_line:end_line])
+            if keep_txt:
+                chunk_file = os.path.join(output_dir, f"{prefix}{file_count}.txt")
+                with open(chunk_file, 'w', encoding='utf-8') as f:
+                    f.write(text)
+                print(f"Created {chunk_file} with lines {start_line+1} to {end_line}")
+            output_file = os.path.join(output_dir, f"{prefix}{file_count}.tex")
+            tasks.append((convert_chunk_text, text, output_file))
+        del all_lines
+        print(f"Split {input_path} into {len(tasks)} chunks")
+
+    try:
+        if jobs is not None and jobs <= 1:
+            tex_files = [converter(source, output_file) for converter, source, output_file in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                futures = [executor.submit(converter, source, output_file) for converter, source, output_file in tasks]
+                tex_files = [future.result() for future in futures]
+    except (OSError, UnicodeDecodeError, BrokenProcessPool) as e:
+        print(f"Error: Chunk conversion failed: {e}")
+        return False
+
+    for tex_file in tex_files:
+        print(f"Created {tex_file}")
+
+    master_file = os.path.join(output_dir, master_name or f"{prefix}_master.tex")
+    generate_tex.write_master_file(master_file, tex_files)
+    print(f"Created {master_file} including {len(tex_files)} chunks")
+
+    if macros:
+        print(generate_tex.macros_summary(generate_tex.share_repeated_lines(master_file, sharded=True)))
+
+    return True
+
+def main():
+    """Main function with command-line interface."""
+    parser = argparse.ArgumentParser(
+        description='Split a genealogy report and convert every chunk to LaTeX in one run',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python batch_convert.py "Ancestors_Report.txt" output/
+  python batch_convert.py "Ancestors_Report.txt" output/ --lines 14200 --prefix part --jobs 4
+  python batch_convert.py "Ancestors_Report.txt" output/ --chunks 8
+  python batch_convert.py chunks/ output/ --prefix part
+  python batch_convert.py "Ancestors_Report.txt.gz" output/
+        """
+    )
+
+    parser.add_argument('input_path', help='Report file (plain, .gz, .xz or .bz2), or directory of .txt chunks from split_file.py')
+    parser.add_argument('output_dir', help='Directory to save .tex chunks and the master file')
+    parser.add_argument('--lines', '-l', type=int, default=7000,
+                       help='Approximate lines per chunk (default: 7000)')
+    parser.add_argument('--chunks', '-k', type=int, default=None,
+                       help='Split into this many chunks of near-equal compile cost instead of every --lines lines')
+    parser.add_argument('--prefix', '-p', default='part',
+                       help='Prefix for output files (default: "part")')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                       help='Chunks converted in parallel (default: one per CPU)')
+    parser.add_argument('--keep-txt', action='store_true',
+                       help='Also write the intermediate .txt chunks')
+    parser.add_argument('--master', default=None,
+                       help='Name of the master include file (default: "<prefix>_master.tex")')
+    parser.add_argument('--macros', action='store_true',
+                       help='Define long lines repeated across the chunks once as macros, and report the bytes saved')
+
+    args = parser.parse_args()
+
+    success = batch_convert(args.input_path, args.output_dir, args.lines, args.prefix,
+                            args.jobs, args.keep_txt, args.master, args.chunks, args.macros)
+
+    if success:
+        print("\n✅ Batch conversion completed successfully!")
+        sys.exit(0)
+    else:
+        print("\n❌ Batch conversion failed!")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
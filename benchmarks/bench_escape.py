@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Benchmark - escape_latex() and escape_url()
+
+Checks that the cached escapers produce exactly the same output as the
+original chained str.replace() versions, then times them with and without
+the LRU cache on a workload of repeated place names, parent names and URLs
+and prints the cache counters.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_tex
+
+PLACES = ["Springfield, Illinois, USA", "Bad Kreuznach, Rheinland-Pfalz, Germany",
+          "St. Louis & Co, MO", "Fort #3, 50% Hill", "Tilde~Town", "Caret^Ville",
+          "C:\\Records\\{Box 7}", "Dollar$ton", "Müller_Hof"]
+NAMES = ["John Smith Jr.", "Mary O'Neil", "Johann von_Berg III", "Anna Henkelmann"]
+URLS = ["https://www.findagrave.com/memorial/{}/smith_x#a",
+        "https://www.example.org/wiki/Henkelmann_{}?x=%20&y=~z^&q={{id}}"]
+
+SPECIALS = "\\#$%&_{}~^ aZ9é"
+
+def legacy_escape_latex(text):
+    """The original chained-replace escape_latex(), kept as a reference."""
+    if text is None or text == "":
+        return ""
+    text = text.replace('\\', '\\textbackslash{}')
+    text = text.replace('#', '\\#')
+    text = text.replace('$', '\\$')
+    text = text.replace('%', '\\%')
+    text = text.replace('&', '\\&')
+    text = text.replace('_', '\\_')
+    text = text.replace('{', '\\{')
+    text = text.replace('}', '\\}')
+    text = text.replace('~', '\\textasciitilde{}')
+    text = text.replace('^', '\\textasciicircum{}')
+    return text
+
+def legacy_escape_url(url):
+    """The original chained-replace escape_url(), kept as a reference."""
+    return url.replace("_", "\\_").replace("#", "\\#").replace("$", "\\$").replace("%", "\\%").replace("&", "\\&").replace("{", "\\{").replace("}", "\\}").replace("~", "\\~{}").replace("^", "\\^{}")
+
+def make_workload(count, seed=0):
+    """Build a list of strings with the repetition profile of a large report."""
+    rng = random.Random(seed)
+    workload = []
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.4:
+            workload.append(rng.choice(PLACES))
+        elif kind < 0.7:
+            workload.append(rng.choice(NAMES))
+        else:
+            workload.append(rng.choice(URLS).format(rng.randint(1, 500)))
+    return workload
+
+def verify(samples, seed=1):
+    """Compare new and legacy escapers on random strings; return the number of mismatches."""
+    rng = random.Random(seed)
+    mismatches = 0
+    for _ in range(samples):
+        text = ''.join(rng.choice(SPECIALS) for _ in range(rng.randint(0, 400)))
+        if generate_tex.escape_latex(text) != legacy_escape_latex(text):
+            mismatches += 1
+        if generate_tex.escape_url(text) != legacy_escape_url(text):
+            mismatches += 1
+    return mismatches
+
+def time_calls(function, workload):
+    start = time.perf_counter()
+    for text in workload:
+        function(text)
+    return time.perf_counter() - start
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description='Benchmark escape_latex() and escape_url()')
+    parser.add_argument('--calls', type=int, default=500000,
+                       help='Number of strings escaped per timing run (default: 500000)')
+    parser.add_argument('--cache-size', type=int, default=generate_tex.ESCAPE_CACHE_SIZE,
+                       help=f'Escape cache size to benchmark (default: {generate_tex.ESCAPE_CACHE_SIZE})')
+    args = parser.parse_args()
+
+    mismatches = verify(20000)
+    if mismatches:
+        print(f"❌ {mismatches} outputs differ from the legacy escapers")
+        sys.exit(1)
+    print("Output identical to the legacy escapers on 20000 random strings")
+
+    workload = make_workload(args.calls)
+    urls = [text for text in workload if text.startswith('http')]
+    for text in workload + urls:
+        if legacy_escape_latex(text) != generate_tex.escape_latex(text):
+            print(f"❌ escape_latex differs on {text!r}")
+            sys.exit(1)
+    for text in urls:
+        if legacy_escape_url(text) != generate_tex.escape_url(text):
+            print(f"❌ escape_url differs on {text!r}")
+            sys.exit(1)
+
+    legacy_latex = time_calls(legacy_escape_latex, workload)
+    legacy_url = time_calls(legacy_escape_url, urls)
+
+    generate_tex.set_escape_cache_size(0)
+    uncached_latex = time_calls(generate_tex.escape_latex, workload)
+    uncached_url = time_calls(generate_tex.escape_url, urls)
+
+    generate_tex.set_escape_cache_size(args.cache_size)
+    cached_latex = time_calls(generate_tex.escape_latex, workload)
+    cached_url = time_calls(generate_tex.escape_url, urls)
+
+    print(f"\n{'':<22}{'escape_latex':>14}{'escape_url':>14}")
+    print(f"{'legacy':<22}{legacy_latex:>13.3f}s{legacy_url:>13.3f}s")
+    print(f"{'cache disabled':<22}{uncached_latex:>13.3f}s{uncached_url:>13.3f}s")
+    print(f"{'LRU cache':<22}{cached_latex:>13.3f}s{cached_url:>13.3f}s")
+
+    info = generate_tex.escape_cache_info()
+    for kind in ('latex', 'url'):
+        stats = info[kind]
+        print(f"{kind} cache: {stats.hits} hits, {stats.misses} misses, {stats.currsize}/{stats.maxsize} entries")
+
+if __name__ == "__main__":
+    main()
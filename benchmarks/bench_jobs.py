@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark - multi-core rendering with generate_tex.py --jobs
+
+Converts the same report with an increasing number of worker processes and
+prints the speedup curve, so the best --jobs value can be picked per machine.
+Every run's output is compared with the serial output.
+"""
+import os
+import sys
+import time
+import filecmp
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_tex
+
+def job_counts(max_jobs):
+    """1, 2, 4, ... up to and including max_jobs."""
+    counts = []
+    jobs = 1
+    while jobs < max_jobs:
+        counts.append(jobs)
+        jobs *= 2
+    counts.append(max_jobs)
+    return counts
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description='Measure the --jobs speedup curve on a report')
+    parser.add_argument('input_file', help='Report to convert')
+    parser.add_argument('--max-jobs', type=int, default=os.cpu_count() or 1,
+                       help='Largest worker count to try (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=generate_tex.JOBS_BATCH_SIZE,
+                       help=f'Entries per worker batch (default: {generate_tex.JOBS_BATCH_SIZE})')
+    parser.add_argument('--stream', action='store_true',
+                       help='Benchmark the streaming conversion path')
+    args = parser.parse_args()
+
+    convert = generate_tex.convert_file_streaming if args.stream else generate_tex.convert_file
+
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = None
+        serial_time = None
+        print(f"{'jobs':>5}  {'seconds':>9}  {'speedup':>8}  {'efficiency':>10}")
+        for jobs in job_counts(args.max_jobs):
+            output_file = os.path.join(tmp, f"jobs{jobs}.tex")
+            start = time.perf_counter()
+            convert(args.input_file, output_file, jobs, args.batch_size)
+            elapsed = time.perf_counter() - start
+
+            if baseline is None:
+                baseline = output_file
+                serial_time = elapsed
+            elif not filecmp.cmp(baseline, output_file, shallow=False):
+                print(f"❌ Output with --jobs {jobs} differs from the serial output")
+                sys.exit(1)
+
+            speedup = serial_time / elapsed
+            print(f"{jobs:>5}  {elapsed:>9.2f}  {speedup:>7.2f}x  {speedup / jobs:>9.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark - line-break insertion in process_text()
+
+Times process_text() on General Notes style lines from 1 KB up to 10 MB and
+prints the cost per character, which should stay flat as the line grows.
+Output for the smaller sizes is checked against the original character-list
+implementation first.
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_tex
+
+WORDS = ["John", "Mary", "and", "of", "son", "son of", "daughter", "the", "was", "born",
+         "Springfield", "android", "often", "sonny", "50%", "St. Louis & Co", "{note}"]
+
+def legacy_insert_line_breaks(result):
+    """The original quadratic char-list loop from process_text(), kept as a reference."""
+    chars = list(result)
+    i = 0
+    while i < len(chars) - 3:
+        if chars[i] == '\\' and i + 1 < len(chars) and chars[i + 1].isalpha():
+            i += 1
+            while i < len(chars) and chars[i].isalpha():
+                i += 1
+            if i < len(chars) and chars[i] == '{':
+                brace_count = 1
+                i += 1
+                while i < len(chars) and brace_count > 0:
+                    if chars[i] == '{':
+                        brace_count += 1
+                    elif chars[i] == '}':
+                        brace_count -= 1
+                    i += 1
+        else:
+            if i + 5 < len(chars) and ''.join(chars[i:i+4]) == " and":
+                chars[i:i+4] = list(" and \\allowbreak ")
+                i += 14
+            elif i + 4 < len(chars) and ''.join(chars[i:i+3]) == " of":
+                chars[i:i+3] = list(" of \\allowbreak ")
+                i += 13
+            elif i + 8 < len(chars) and ''.join(chars[i:i+7]) == " son of":
+                chars[i:i+7] = list(" son of \\penalty10\\hspace{0pt} ")
+                i += 24
+            elif i + 5 < len(chars) and ''.join(chars[i:i+4]) == " son":
+                chars[i:i+4] = list(" son \\allowbreak ")
+                i += 14
+            elif i + 10 < len(chars) and ''.join(chars[i:i+9]) == " daughter":
+                chars[i:i+9] = list(" daughter \\allowbreak ")
+                i += 19
+            else:
+                i += 1
+    return ''.join(chars)
+
+def make_notes_line(size, seed=0):
+    """Build a deterministic notes line of roughly `size` characters with person links."""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < size:
+        if rng.random() < 0.05:
+            word = f"[{rng.choice(WORDS[:2])} Smith](#i{rng.randint(1, 99999)})"
+        else:
+            word = rng.choice(WORDS)
+        parts.append(word)
+        length += len(word) + 1
+    return ' '.join(parts)[:size]
+
+def link_converted_text(line):
+    """Return process_text() output for line with the line-break pass switched off."""
+    insert_line_breaks = generate_tex.insert_line_breaks
+    generate_tex.insert_line_breaks = lambda text: text
+    try:
+        return generate_tex.process_text(line)
+    finally:
+        generate_tex.insert_line_breaks = insert_line_breaks
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description='Benchmark line-break insertion in process_text()')
+    parser.add_argument('--max-size', type=int, default=10 * 1024 * 1024,
+                       help='Largest notes line to time, in characters (default: 10 MB)')
+    parser.add_argument('--verify-size', type=int, default=64 * 1024,
+                       help='Compare against the legacy loop up to this size (default: 64 KB)')
+    args = parser.parse_args()
+
+    sizes = []
+    size = 1024
+    while size < args.max_size:
+        sizes.append(size)
+        size *= 4
+    sizes.append(args.max_size)
+
+    print(f"{'size':>10}  {'seconds':>10}  {'ns/char':>8}  legacy check")
+    for size in sizes:
+        line = make_notes_line(size, seed=size)
+
+        start = time.perf_counter()
+        generate_tex.process_text(line)
+        elapsed = time.perf_counter() - start
+
+        check = "-"
+        if size <= args.verify_size:
+            # Compare the line-break pass on exactly the text process_text feeds it
+            prepared = link_converted_text(line)
+            if generate_tex.insert_line_breaks(prepared) != legacy_insert_line_breaks(prepared):
+                print(f"{size:>10}  output differs from the legacy implementation")
+                sys.exit(1)
+            check = "identical"
+
+        print(f"{size:>10}  {elapsed:>10.4f}  {elapsed / size * 1e9:>8.1f}  {check}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark - report segmentation on anchored and anchor-less reports
+
+Generates the same report with and without ##ANCHOR lines (or takes
+--input files), checks that split_report() yields exactly the entries of
+the original segmenter (a scan for anchors, a rewind and a second pass
+reading one line at a time), then times both on each report, reading from
+an open file as a conversion does.
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_tex
+from generate_corpus import write_corpus
+
+MB = 1024 * 1024
+
+LEGACY_PERSON_PATTERN = re.compile(r'^(\d+)\.\s+(.*?)(?:,\s+|$)')
+LEGACY_GENERATION_PATTERN = re.compile(r'^([A-Za-z]+)\s+Generation')
+LEGACY_ANCHOR_PATTERN = re.compile(r'##ANCHOR:i(\d+)##')
+
+def legacy_iter_lines(stream):
+    """The original line reader, one line of the stream at a time, kept as a reference."""
+    line = ''
+    for line in stream:
+        yield line[:-1] if line.endswith('\n') else line
+    if line == '' or line.endswith('\n'):
+        yield ''
+
+def legacy_anchor_entries(lines):
+    """The original anchor segmenter, kept as a reference."""
+    current_person_id = None
+    current_content = []
+    for line in lines:
+        if line.strip().startswith('##ANCHOR:i'):
+            if current_person_id is not None and current_content:
+                yield (current_person_id, '\n'.join(current_content).strip())
+                current_content = []
+            match = LEGACY_ANCHOR_PATTERN.search(line.strip())
+            current_person_id = match.group(1) if match else None
+        elif current_person_id is not None:
+            current_content.append(line)
+    if current_person_id is not None and current_content:
+        yield (current_person_id, '\n'.join(current_content).strip())
+
+def legacy_person_entries(lines):
+    """The original segmenter for reports without anchors, kept as a reference."""
+    person_id = None
+    current_content = []
+    for line in lines:
+        stripped = line.strip()
+        person_match = LEGACY_PERSON_PATTERN.match(stripped)
+        if person_match or LEGACY_GENERATION_PATTERN.match(stripped):
+            if person_id is not None:
+                yield (person_id, '\n'.join(current_content).strip())
+                person_id = None
+                current_content = []
+            if person_match:
+                person_id = person_match.group(1)
+                current_content.append(line)
+        elif person_id is not None:
+            current_content.append(line)
+    if person_id is not None and len(current_content) > 1:
+        yield (person_id, '\n'.join(current_content).strip())
+
+def legacy_split_report(f):
+    """The original passes over an open file: scan for an anchor (every line if there is none), rewind, segment."""
+    has_anchors = any(line.strip().startswith('##ANCHOR:i') for line in f)
+    f.seek(0)
+    lines = legacy_iter_lines(f)
+    return has_anchors, legacy_anchor_entries(lines) if has_anchors else legacy_person_entries(lines)
+
+def time_segmenter(split, input_file, repeat):
+    """Return (best seconds to segment input_file, number of entries)."""
+    best = None
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with open(input_file, 'r', encoding='utf-8') as f:
+            count = sum(1 for _ in split(f)[1])
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, count
+
+def verify(input_file):
+    """Return True if split_report() and the legacy segmenter agree on input_file."""
+    with open(input_file, 'r', encoding='utf-8') as f:
+        expected = legacy_split_report(f)
+        expected = (expected[0], list(expected[1]))
+    with open(input_file, 'r', encoding='utf-8') as f:
+        actual = generate_tex.split_report(f)
+        actual = (actual[0], list(actual[1]))
+    return actual == expected
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description='Benchmark report segmentation with and without anchors')
+    parser.add_argument('--persons', '-n', type=int, default=100000,
+                       help='Persons in each generated report (default: 100000)')
+    parser.add_argument('--seed', type=int, default=1,
+                       help='Seed of the generated reports (default: 1)')
+    parser.add_argument('--input', action='append', default=None,
+                       help='Benchmark this report instead of generated ones (may be repeated)')
+    parser.add_argument('--repeat', type=int, default=3,
+                       help='Timed runs per segmenter; the best is reported (default: 3)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        reports = args.input
+        if reports is None:
+            reports = []
+            for anchors in (True, False):
+                report = os.path.join(work_dir, 'anchors.txt' if anchors else 'no_anchors.txt')
+                with open(report, 'w', encoding='utf-8') as f:
+                    write_corpus(f, args.persons, args.seed, anchors)
+                reports.append(report)
+
+        print(f"{'report':<22}{'MB':>7}{'entries':>9}{'two-pass s':>12}{'single s':>10}{'MB/s':>8}{'speedup':>9}")
+        for report in reports:
+            if not verify(report):
+                print(f"❌ Entries of {report} differ from the legacy segmenter")
+                sys.exit(1)
+
+            size = os.path.getsize(report) / MB
+            legacy_seconds, _ = time_segmenter(legacy_split_report, report, args.repeat)
+            seconds, entries = time_segmenter(generate_tex.split_report, report, args.repeat)
+            print(f"{os.path.basename(report):<22}{size:>7.1f}{entries:>9}{legacy_seconds:>12.3f}"
+                  f"{seconds:>10.3f}{size / seconds:>8.1f}{legacy_seconds / seconds:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
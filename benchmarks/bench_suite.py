@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite - throughput and peak memory of the conversion pipeline
+
+Generates a deterministic report with generate_corpus.py (or takes --input)
+and measures escape_latex(), process_text(), process_child_entries(), a full
+generate_tex.py run (in memory, --stream and rendering from --parsed-cache)
+and split_file() (line and --mmap modes).  For each it prints MB/s and the
+peak memory traced by tracemalloc.  Results can be saved as JSON and compared with an earlier run
+so regressions stand out.
+"""
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_tex
+import split_file
+from generate_corpus import write_corpus
+
+MB = 1024 * 1024
+
+class NullWriter:
+    """Output stream that discards everything, so only the rendering itself is measured."""
+
+    def write(self, text):
+        return len(text)
+
+def text_size(texts):
+    return sum(len(text.encode('utf-8')) for text in texts)
+
+def load_workloads(input_file):
+    """Read the report once and cut it into the inputs of the function benchmarks."""
+    with open(input_file, 'r', encoding='utf-8') as f:
+        raw_lines = f.read().split('\n')
+    lines = [line.strip() for line in raw_lines]
+    lines = [line for line in lines if line and not line.startswith('##ANCHOR:i')]
+
+    # escape_latex() sees the text between links and the link names
+    fragments = []
+    for line in lines:
+        last_end = 0
+        for match in generate_tex.LINK_PATTERN.finditer(line):
+            fragments.append(line[last_end:match.start()])
+            fragments.append(match.group(1))
+            last_end = match.end()
+        fragments.append(line[last_end:])
+    fragments = [fragment for fragment in fragments if fragment]
+
+    # process_child_entries() gets the classified lines of each child list
+    child_sections = []
+    classified = [generate_tex.classify_line(line) for line in raw_lines]
+    for i, line in enumerate(classified):
+        if line.child_heading:
+            end = generate_tex.process_child_entries(i + 1, classified, NullWriter())
+            child_sections.append(classified[i + 1:end])
+
+    return {
+        'fragments': fragments,
+        'lines': lines,
+        'child_sections': child_sections,
+    }
+
+def measure(function, repeat, trace_memory):
+    """Return (best seconds over repeat runs, peak traced bytes or None)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return best, peak
+
+def build_benchmarks(input_file, workloads, work_dir):
+    """Return (name, input bytes, function) for every benchmark."""
+    fragments = workloads['fragments']
+    lines = workloads['lines']
+    child_sections = workloads['child_sections']
+    file_size = os.path.getsize(input_file)
+
+    def run_escape_latex():
+        generate_tex.set_escape_cache_size(generate_tex.ESCAPE_CACHE_SIZE)
+        for fragment in fragments:
+            generate_tex.escape_latex(fragment)
+
+    def run_process_text():
+        generate_tex.set_escape_cache_size(generate_tex.ESCAPE_CACHE_SIZE)
+        for line in lines:
+            generate_tex.process_text(line)
+
+    def run_process_child_entries():
+        output = NullWriter()
+        for section in child_sections:
+            generate_tex.process_child_entries(0, section, output)
+
+    def run_generate_tex(*options):
+        def run():
+            output_file = os.path.join(work_dir, 'bench_output.tex')
+            argv = sys.argv
+            sys.argv = ['generate_tex.py', input_file, output_file] + list(options)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    generate_tex.main()
+            finally:
+                sys.argv = argv
+        return run
+
+    def run_split_file(use_mmap):
+        def run():
+            output_dir = os.path.join(work_dir, 'bench_split')
+            with contextlib.redirect_stdout(io.StringIO()):
+                # force, or every run after the first would find the chunks unchanged and skip them
+                split_file.split_file(input_file, output_dir, 7000, "part", use_mmap, force=True)
+        return run
+
+    return [
+        ('escape_latex', text_size(fragments), run_escape_latex),
+        ('process_text', text_size(lines), run_process_text),
+        ('process_child_entries', text_size(line.text for section in child_sections for line in section),
+         run_process_child_entries),
+        ('generate_tex.main', file_size, run_generate_tex()),
+        ('generate_tex.main --stream', file_size, run_generate_tex('--stream')),
+        # The first run builds the parsed cache; the best time is a run rendering from it
+        ('generate_tex.main --parsed', file_size,
+         run_generate_tex('--parsed-cache', os.path.join(work_dir, 'bench.parsed'))),
+        ('split_file', file_size, run_split_file(False)),
+        ('split_file --mmap', file_size, run_split_file(True)),
+    ]
+
+def format_change(new, old, higher_is_better):
+    """Percentage change from old to new, marked when it is a regression of more than 5%."""
+    if not old:
+        return ""
+    change = (new - old) / old
+    regression = change < -0.05 if higher_is_better else change > 0.05
+    return f"{change:+.0%}{' !' if regression else ''}"
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description='Measure throughput and peak memory of the conversion pipeline')
+    parser.add_argument('--persons', '-n', type=int, default=10000,
+                       help='Persons in the generated report (default: 10000)')
+    parser.add_argument('--seed', type=int, default=1,
+                       help='Seed of the generated report (default: 1)')
+    parser.add_argument('--input', default=None,
+                       help='Benchmark an existing report instead of generating one')
+    parser.add_argument('--repeat', type=int, default=3,
+                       help='Timed runs per benchmark; the best is reported (default: 3)')
+    parser.add_argument('--only', default=None,
+                       help='Comma-separated benchmark names to run (default: all)')
+    parser.add_argument('--no-memory', action='store_true',
+                       help='Skip the tracemalloc run that measures peak memory')
+    parser.add_argument('--save', metavar='PATH', default=None,
+                       help='Write the results to a JSON file')
+    parser.add_argument('--compare', metavar='PATH', default=None,
+                       help='Compare with results saved earlier by --save')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_file = args.input
+        if input_file is None:
+            input_file = os.path.join(work_dir, 'corpus.txt')
+            start = time.perf_counter()
+            with open(input_file, 'w', encoding='utf-8') as f:
+                write_corpus(f, args.persons, args.seed)
+            print(f"Generated {args.persons} persons ({os.path.getsize(input_file) / MB:.1f} MB) "
+                  f"in {time.perf_counter() - start:.1f}s")
+
+        workloads = load_workloads(input_file)
+        benchmarks = build_benchmarks(input_file, workloads, work_dir)
+        if args.only:
+            selected = set(name.strip() for name in args.only.split(','))
+            benchmarks = [benchmark for benchmark in benchmarks if benchmark[0] in selected]
+
+        results = {}
+        print(f"\n{'benchmark':<28}{'input MB':>9}{'seconds':>9}{'MB/s':>8}{'peak MB':>9}"
+              f"{'  vs MB/s  vs peak' if baseline else ''}")
+        for name, size, function in benchmarks:
+            seconds, peak = measure(function, args.repeat, not args.no_memory)
+            result = {
+                'input_mb': size / MB,
+                'seconds': seconds,
+                'mb_per_s': size / MB / seconds if seconds else 0.0,
+                'peak_mb': peak / MB if peak is not None else None,
+            }
+            results[name] = result
+
+            peak_text = f"{result['peak_mb']:>9.1f}" if peak is not None else f"{'-':>9}"
+            line = f"{name:<28}{result['input_mb']:>9.1f}{seconds:>9.3f}{result['mb_per_s']:>8.1f}{peak_text}"
+            old = baseline.get(name)
+            if old:
+                line += f"  {format_change(result['mb_per_s'], old['mb_per_s'], True):>7}"
+                if peak is not None and old.get('peak_mb'):
+                    line += f"  {format_change(result['peak_mb'], old['peak_mb'], False):>7}"
+            print(line)
+
+    if args.save:
+        corpus = {'input': args.input} if args.input else {'persons': args.persons, 'seed': args.seed}
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'corpus': corpus, 'results': results}, f, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+if __name__ == "__main__":
+    main()
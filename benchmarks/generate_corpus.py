@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Synthetic Corpus Generator - deterministic genealogy reports in the real input format
+
+Writes an ancestors report numbered the usual way (the parents of person n
+are persons 2n and 2n+1), with ##ANCHOR:iNNN## markers, generation headers,
+General Notes, Biography URLs, marriages, every child-heading variant and
+both roman-numeral and badge child entries.  All person links point at
+entries that exist, so the output also passes generate_tex.py --check.
+
+The same --persons and --seed always produce the same bytes, from 1k
+persons (about 1 MB) up to 1M persons (about 1 GB).
+"""
+import sys
+import random
+import argparse
+
+FIRST_NAMES_MALE = ["Johann", "Peter", "Wilhelm", "Andrew", "John", "Heinrich", "Jacob", "Friedrich", "Georg", "Carl",
+                    "Philipp", "Adam", "Michael", "Thomas", "William", "James", "Samuel", "Christian"]
+FIRST_NAMES_FEMALE = ["Mary", "Anna", "Elisabeth", "Catharina", "Sarah", "Margaretha", "Maria", "Sophia", "Barbara",
+                      "Christina", "Magdalena", "Susanna", "Eva", "Dorothea", "Louisa", "Emma"]
+SURNAMES = ["Henkelmann", "Smith", "Müller", "Tonda", "Blake", "O'Neil", "von Berg", "Anderson", "Schneider", "Fischer",
+            "Weber", "Wagner", "Becker", "Hoffmann", "Schäfer", "Koch", "Richter", "Klein", "Wolf", "Neumann"]
+SUFFIXES = ["Jr.", "Sr.", "II", "III"]
+PLACES = ["Springfield, Sangamon, Illinois, USA", "Bad Kreuznach, Rheinland-Pfalz, Germany",
+          "St. Louis, Missouri, USA", "Philadelphia, Pennsylvania, USA", "Mainz, Hessen, Germany",
+          "Lancaster County, Pennsylvania, USA", "New Orleans, Louisiana, USA", "Trier, Rheinland-Pfalz, Germany",
+          "Baltimore, Maryland, USA", "Cincinnati, Hamilton, Ohio, USA", "Hamburg, Germany", "Zweibrücken, Pfalz, Germany"]
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+NOTE_SENTENCES = [
+    "He was a farmer and later ran the mill of his father-in-law.",
+    "She was baptized in the Lutheran church; her sponsors were her aunt and uncle.",
+    "The family emigrated via Le Havre & New Orleans in the spring.",
+    "In the 1850 census the household is listed with 7 children and 2 farm hands.",
+    "According to the church book, the fee of $2 was paid in full.",
+    "Land records show a purchase of 80 acres (about 50% cleared) near the river.",
+    "He served in the militia and is listed as private #114 in the muster roll.",
+    "The estate inventory mentions a Bible, a loom and livestock valued at 120_dollars.",
+    "She was known in the village as a midwife and helped deliver many of her grandchildren.",
+    "The name is also spelled Henckelmann or Henkelman in some records.",
+]
+ORDINALS = ["First", "Second", "Third", "Fourth", "Fifth", "Sixth", "Seventh", "Eighth", "Ninth", "Tenth",
+            "Eleventh", "Twelfth", "Thirteenth", "Fourteenth", "Fifteenth", "Sixteenth", "Seventeenth",
+            "Eighteenth", "Nineteenth", "Twentieth", "Twentyfirst"]
+ROMANS = ["i", "ii", "iii", "iv", "v", "vi", "vii", "viii", "ix", "x", "xi", "xii"]
+
+# Child headings written after a marriage line, by the sex of the person
+CHILD_HEADINGS = {
+    'M': (("His child was:", "His children were:"), ("The child from this marriage was:", "Children from this marriage were:")),
+    'F': (("Her child was:", "Her children were:"), ("The child from this marriage was:", "Children from this marriage were:")),
+}
+
+class Person:
+    """The generated facts about one person of the report."""
+    __slots__ = ('number', 'person_id', 'first', 'surname', 'suffix', 'sex', 'born')
+
+    def __init__(self, number, person_id, first, surname, suffix, sex, born):
+        self.number = number
+        self.person_id = person_id
+        self.first = first
+        self.surname = surname
+        self.suffix = suffix
+        self.sex = sex
+        self.born = born
+
+    @property
+    def name(self):
+        name = f"{self.first} {self.surname}"
+        return f"{name} {self.suffix}" if self.suffix else name
+
+    def link(self):
+        return f"[{self.name}](#i{self.person_id})"
+
+def generation_of(number):
+    """Generation (1-based) of Ahnentafel number `number`."""
+    return number.bit_length()
+
+def make_person_ids(persons, rng):
+    """Distinct, shuffled anchor IDs such as real genealogy software assigns; index number - 1."""
+    return rng.sample(range(1, persons * 8 + 1), persons)
+
+class CorpusGenerator:
+    """Generate the persons of the report lazily so memory stays flat for 1M persons."""
+
+    def __init__(self, persons, seed=1, anchors=True):
+        self.persons = persons
+        self.seed = seed
+        self.anchors = anchors
+        # Without anchors, entries are identified (and linked) by their number
+        self.person_ids = make_person_ids(persons, random.Random(seed)) if anchors else None
+        self._people = {}
+
+    def person(self, number):
+        """Return the Person with this number; the same number always gives the same facts."""
+        person = self._people.get(number)
+        if person is not None:
+            return person
+        rng = random.Random(self.seed * 1000003 + number)
+        sex = 'M' if number % 2 == 0 or (number == 1 and rng.random() < 0.5) else 'F'
+        first = rng.choice(FIRST_NAMES_MALE if sex == 'M' else FIRST_NAMES_FEMALE)
+        # Fathers pass their surname down the direct line
+        surname = self.person(number // 2).surname if number > 1 and sex == 'M' else rng.choice(SURNAMES)
+        suffix = rng.choice(SUFFIXES) if sex == 'M' and rng.random() < 0.08 else ""
+        born = 1950 - 28 * generation_of(number) + rng.randint(-6, 6)
+        if self.person_ids is None:
+            person_id = number
+        else:
+            # People outside the report still need an ID for their name links
+            person_id = self.person_ids[number - 1] if number <= self.persons else self.persons * 8 + number
+        person = Person(number, person_id, first, surname, suffix, sex, born)
+        # Only the line being written and its relatives are needed at any time
+        if len(self._people) > 4096:
+            self._people.clear()
+        self._people[number] = person
+        return person
+
+    def date(self, rng, year):
+        return f"{rng.randint(1, 28)} {rng.choice(MONTHS)} {year}"
+
+    def birth_date(self, person):
+        """The same birth date wherever the person is mentioned."""
+        return self.date(random.Random(self.seed * 31 + person.number), person.born)
+
+    def known(self, number):
+        """True if person `number` has an entry in this report."""
+        return 1 <= number <= self.persons
+
+    def main_line(self, person, rng):
+        father, mother = person.number * 2, person.number * 2 + 1
+        line = f"{person.number}. {person.name}"
+        if self.known(father) and self.known(mother):
+            relation = "son" if person.sex == 'M' else "daughter"
+            line += f", {relation} of {self.person(father).link()} and {self.person(mother).link()},"
+        elif rng.random() < 0.5:
+            line += ","
+        line += f" was born {self.birth_date(person)} in {rng.choice(PLACES)}."
+        if rng.random() < 0.8:
+            pronoun = "He" if person.sex == 'M' else "She"
+            line += f" {pronoun} died {self.date(rng, person.born + rng.randint(20, 85))} in {rng.choice(PLACES)}."
+        return line
+
+    def notes(self, person, rng):
+        lines = []
+        text = ' '.join(rng.choice(NOTE_SENTENCES) for _ in range(rng.randint(1, 4)))
+        if rng.random() < 0.3:
+            # A mention of a relative somewhere else in the report
+            relative = rng.randint(1, self.persons)
+            text += f" See also {self.person(relative).link()}."
+        if rng.random() < 0.3:
+            lines.append(f"General Notes: {text}")
+        else:
+            lines.append("General Notes:")
+            lines.append(text)
+        for _ in range(rng.randint(0, 2)):
+            lines.append(' '.join(rng.choice(NOTE_SENTENCES) for _ in range(rng.randint(1, 6))))
+        lines.append("")
+        return lines
+
+    def biography(self, person, rng):
+        slug = f"{person.first}-{person.surname}".lower().replace(' ', '-')
+        url = f"https://www.findagrave.com/memorial/{rng.randint(10000, 99999999)}/{slug}"
+        if rng.random() < 0.6:
+            return [f"Biography: {url}", ""]
+        lines = ["Biography:", url]
+        if rng.random() < 0.5:
+            lines.append(f"https://www.wikitree.com/wiki/{person.surname.replace(' ', '_')}-{rng.randint(1, 9999)}")
+        lines.append("")
+        return lines
+
+    def family(self, person, rng, after_biography_list=False):
+        """Marriage line and child list of a person with a child in the report."""
+        # Both spouses' entries describe the same marriage and the same children
+        father = person.number if person.sex == 'M' else person.number - 1
+        spouse = person.number + 1 if person.sex == 'M' else person.number - 1
+        couple = random.Random(self.seed * 104729 + father)
+        surname = self.person(father).surname
+
+        spouse_name = self.person(spouse).link() if self.known(spouse) else self.person(spouse).name
+        marriage = (f"married {spouse_name} on {self.date(couple, self.person(father).born + couple.randint(18, 30))} "
+                    f"in {couple.choice(PLACES)}.")
+        # A multi-line Biography section only ends at a line starting with "married"
+        lines = [marriage if after_biography_list else f"{person.first} {marriage}", ""]
+
+        child_number = person.number // 2
+        siblings = couple.randint(0, 7)
+        singular, plural = rng.choice(CHILD_HEADINGS[person.sex])
+        lines.append(plural if siblings else singular)
+
+        position = couple.randint(0, siblings)
+        for k in range(siblings + 1):
+            roman = ROMANS[k % len(ROMANS)]
+            if k == position:
+                child = self.person(child_number)
+                lines.append(f"({child_number}) {roman}. {child.link()}, born {self.birth_date(child)} in {couple.choice(PLACES)}")
+                continue
+            sibling = f"{couple.choice(FIRST_NAMES_MALE + FIRST_NAMES_FEMALE)} {surname}"
+            if couple.random() < 0.5:
+                lines.append(f"{roman}. {sibling} was born {self.person(father).born + 22 + 2 * k} in {couple.choice(PLACES)}")
+            else:
+                lines.append(f"{roman}. {sibling}")
+        lines.append("")
+        return lines
+
+    def entry(self, number):
+        person = self.person(number)
+        rng = random.Random(self.seed * 7919 + number)
+        lines = []
+        if self.anchors:
+            lines.append(f"##ANCHOR:i{person.person_id}##")
+        lines.append(self.main_line(person, rng))
+        lines.append("")
+        if rng.random() < 0.6:
+            lines.extend(self.notes(person, rng))
+        biography = self.biography(person, rng) if rng.random() < 0.5 else []
+        lines.extend(biography)
+        if number > 1:
+            lines.extend(self.family(person, rng, biography[:1] == ["Biography:"]))
+        return lines
+
+    def iter_lines(self):
+        """Yield the lines of the report, one entry at a time."""
+        yield f"Ancestors of {self.person(1).name}"
+        yield ""
+        generation = 0
+        for number in range(1, self.persons + 1):
+            if generation_of(number) != generation:
+                generation = generation_of(number)
+                yield f"{ORDINALS[generation - 1]} Generation"
+                yield ""
+            yield from self.entry(number)
+
+def write_corpus(output, persons, seed=1, anchors=True):
+    """Write a report of `persons` persons to the text stream output."""
+    generator = CorpusGenerator(persons, seed, anchors)
+    for line in generator.iter_lines():
+        output.write(line)
+        output.write("\n")
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description='Generate a deterministic synthetic genealogy report')
+    parser.add_argument('output_file', help='Path of the report to write ("-" for stdout)')
+    parser.add_argument('--persons', '-n', type=int, default=1000,
+                       help='Number of persons in the report, 1 to 1000000 (default: 1000)')
+    parser.add_argument('--seed', type=int, default=1,
+                       help='Random seed; the same seed always gives the same report (default: 1)')
+    parser.add_argument('--no-anchors', action='store_true',
+                       help='Leave out the ##ANCHOR:iNNN## markers, like older report exports')
+    args = parser.parse_args()
+
+    if not 1 <= args.persons <= 1000000:
+        print("Error: --persons must be between 1 and 1000000")
+        sys.exit(1)
+
+    if args.output_file == '-':
+        write_corpus(sys.stdout, args.persons, args.seed, not args.no_anchors)
+    else:
+        with open(args.output_file, 'w', encoding='utf-8') as f:
+            write_corpus(f, args.persons, args.seed, not args.no_anchors)
+        print(f"Wrote {args.persons} persons to {args.output_file}")
+
+if __name__ == "__main__":
+    main()
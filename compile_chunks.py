@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Chunk Compiler - Compiles .tex chunks to PDF in parallel, rerunning each until its cross-references settle
+"""
+import os
+import re
+import sys
+import json
+import shlex
+import hashlib
+import argparse
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+# Placeholders: {tex} is the document to compile, {jobname} the chunk name,
+# {output_dir} where the .pdf/.aux/.log files go
+DEFAULT_COMMAND = "xelatex -interaction=nonstopmode -halt-on-error -output-directory={output_dir} -jobname={jobname} {tex}"
+
+# hyperref and the table of contents usually settle after two passes
+MAX_PASSES = 4
+
+# Digest of each chunk's inputs at its last successful compile, kept in the output directory
+STATE_FILE = ".compile_state.json"
+
+# Log messages asking for another pass
+RERUN_PATTERN = re.compile(r'Rerun to get|Label\(s\) may have changed|Please rerun LaTeX')
+
+# Files a chunk includes, such as the <stem>_macros.tex written by --macros
+INPUT_PATTERN = re.compile(rb'^\\input\{([^}]+)\}', re.MULTILINE)
+
+def natural_sort_key(filename):
+    """Sort key that orders 'part2.tex' before 'part10.tex'."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', filename)]
+
+def file_digest(path):
+    """Return the SHA-256 of a file's contents, or None if it does not exist."""
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+def find_chunks(input_dir, prefix="part"):
+    """Return the {prefix}N.tex chunks in input_dir in natural order (the master file is skipped)."""
+    pattern = re.compile(rf'^{re.escape(prefix)}\d+\.tex$')
+    names = sorted((name for name in os.listdir(input_dir) if pattern.match(name)), key=natural_sort_key)
+    return [os.path.join(input_dir, name) for name in names]
+
+def tex_path(path):
+    """Path as TeX wants it: forward slashes and no .tex extension."""
+    return os.path.splitext(path)[0].replace(os.sep, '/')
+
+def chunk_document(chunk_file, template=None):
+    """
+    Return the {tex} argument that compiles chunk_file.
+
+    Chunks from generate_tex.py are document bodies, so with a template the
+    template is compiled with \\chunkfile defined as the chunk to include
+    (the template uses \\input{\\chunkfile}).  Without one the chunk is
+    compiled as it is.
+    """
+    if template is None:
+        return chunk_file
+    return f"\\def\\chunkfile{{{tex_path(chunk_file)}}}\\input{{{tex_path(template)}}}"
+
+def input_path(name, chunk_file):
+    """
+    Return the file TeX reads for \\input{name} in chunk_file.
+
+    The converters write \\input paths relative to the directory they ran
+    in, which is where the compiler runs too; a name found only beside the
+    chunk is taken from there.  A name without an extension gets .tex.
+    """
+    if not os.path.splitext(name)[1]:
+        name += '.tex'
+    beside_chunk = os.path.join(os.path.dirname(chunk_file), name)
+    if not os.path.exists(name) and os.path.exists(beside_chunk):
+        return beside_chunk
+    return name
+
+def inputs_digest(chunk_file, template, command):
+    """
+    Digest of everything a chunk's PDF depends on: the chunk, the files it
+    \\inputs (the macros file of --macros), the template and the compiler command.
+    """
+    with open(chunk_file, 'rb') as f:
+        content = f.read()
+    parts = [hashlib.sha256(content).hexdigest()]
+    for name in INPUT_PATTERN.findall(content):
+        path = input_path(name.decode('utf-8', errors='replace'), chunk_file)
+        parts += [path, file_digest(path)]
+    parts += [file_digest(template) if template else "", command]
+
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or "").encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def needs_rerun(aux_before, aux_file, log_file):
+    """Return True if the last pass changed the .aux file or its log asks for another pass."""
+    if file_digest(aux_file) != aux_before:
+        return True
+    try:
+        with open(log_file, 'r', encoding='utf-8', errors='replace') as f:
+            return RERUN_PATTERN.search(f.read()) is not None
+    except FileNotFoundError:
+        return False
+
+def log_errors(log_file, limit=5):
+    """Return the first few '!' error lines of a TeX log."""
+    try:
+        with open(log_file, 'r', encoding='utf-8', errors='replace') as f:
+            return [line.rstrip() for line in f if line.startswith('!')][:limit]
+    except FileNotFoundError:
+        return []
+
+def compile_chunk(chunk_file, output_dir, command=DEFAULT_COMMAND, template=None, max_passes=MAX_PASSES):
+    """
+    Compile one chunk, repeating the pass while the .aux file keeps changing.
+
+    A pass that leaves the .aux file as it found it (and whose log does not
+    ask for a rerun) is the last one, so a chunk whose .aux is already up to
+    date from an earlier build needs a single pass.
+
+    Returns:
+        tuple: (passes run, error message or None)
+    """
+    jobname = os.path.splitext(os.path.basename(chunk_file))[0]
+    aux_file = os.path.join(output_dir, f"{jobname}.aux")
+    log_file = os.path.join(output_dir, f"{jobname}.log")
+    values = {'tex': chunk_document(chunk_file, template), 'jobname': jobname, 'output_dir': output_dir}
+    args = [part.format(**values) for part in shlex.split(command)]
+
+    for passes in range(1, max_passes + 1):
+        aux_before = file_digest(aux_file)
+        try:
+            result = subprocess.run(args, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            return passes, f"Cannot run '{args[0]}': {e}"
+        if result.returncode != 0:
+            errors = log_errors(log_file)
+            details = ''.join(f"\n    {line}" for line in errors)
+            return passes, f"{args[0]} exited with status {result.returncode} (see {log_file}){details}"
+        if not needs_rerun(aux_before, aux_file, log_file):
+            return passes, None
+
+    print(f"Warning: {jobname} still asks for a rerun after {max_passes} passes")
+    return max_passes, None
+
+def load_state(state_file):
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def compile_chunks(input_dir, output_dir=None, prefix="part", jobs=None, command=DEFAULT_COMMAND,
+                   template=None, max_passes=MAX_PASSES, force=False):
+    """
+    Compile every {prefix}N.tex chunk in input_dir to PDF with a bounded pool of compiler processes.
+
+    Chunks whose inputs (chunk, the files it \\inputs, template and command)
+    are unchanged since their last successful compile, and whose PDF still
+    exists, are skipped.
+
+    Args:
+        input_dir (str): Directory of .tex chunks from batch_convert.py or generate_tex.py
+        output_dir (str): Directory for the PDFs and TeX auxiliary files (default: input_dir)
+        prefix (str): Prefix of the chunk files (default: "part")
+        jobs (int): Compiles run at the same time (default: one per CPU)
+        command (str): Compiler command with {tex}, {jobname} and {output_dir} placeholders
+        template (str): Template that includes \\chunkfile, compiled once per chunk
+        max_passes (int): Most passes run for one chunk
+        force (bool): Recompile even unchanged chunks
+
+    Returns:
+        bool: True if every chunk compiled, False if there were errors
+    """
+    if not os.path.isdir(input_dir):
+        print(f"Error: Input directory '{input_dir}' not found!")
+        return False
+    if template is not None and not os.path.exists(template):
+        print(f"Error: Template '{template}' not found!")
+        return False
+    if max_passes < 1:
+        print(f"Error: max_passes must be at least 1, not {max_passes}")
+        return False
+
+    output_dir = output_dir or input_dir
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+    except (PermissionError, OSError) as e:
+        print(f"Error: Cannot create/access output directory '{output_dir}': {e}")
+        return False
+
+    chunk_files = find_chunks(input_dir, prefix)
+    if not chunk_files:
+        print(f"Error: No {prefix}N.tex chunks found in '{input_dir}'")
+        return False
+
+    state_file = os.path.join(output_dir, STATE_FILE)
+    state = {} if force else load_state(state_file)
+
+    pending = []
+    for chunk_file in chunk_files:
+        jobname = os.path.splitext(os.path.basename(chunk_file))[0]
+        digest = inputs_digest(chunk_file, template, command)
+        if state.get(jobname) == digest and os.path.exists(os.path.join(output_dir, f"{jobname}.pdf")):
+            print(f"Skipped {jobname} (unchanged)")
+            continue
+        state.pop(jobname, None)
+        pending.append((jobname, digest, chunk_file))
+
+    print(f"Compiling {len(pending)} of {len(chunk_files)} chunks")
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as executor:
+        futures = [executor.submit(compile_chunk, chunk_file, output_dir, command, template, max_passes)
+                   for jobname, digest, chunk_file in pending]
+        for (jobname, digest, chunk_file), future in zip(pending, futures):
+            passes, error = future.result()
+            if error:
+                failed += 1
+                print(f"Error: {jobname} failed on pass {passes}: {error}")
+                continue
+            state[jobname] = digest
+            print(f"Compiled {os.path.join(output_dir, jobname + '.pdf')} ({passes} pass{'es' if passes > 1 else ''})")
+
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+
+    if failed:
+        print(f"{failed} of {len(pending)} chunks failed")
+        return False
+    return True
+
+def main():
+    """Main function with command-line interface."""
+    parser = argparse.ArgumentParser(
+        description='Compile .tex chunks to PDF in parallel, rerunning each until cross-references settle',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python compile_chunks.py output/
+  python compile_chunks.py output/ --template main_template.tex --jobs 4
+  python compile_chunks.py output/ pdf/ --prefix part --force
+  python compile_chunks.py output/ --command "python stub_tex.py {output_dir} {jobname}"
+        """
+    )
+
+    parser.add_argument('input_dir', help='Directory of .tex chunks from batch_convert.py or generate_tex.py')
+    parser.add_argument('output_dir', nargs='?', default=None,
+                       help='Directory for the PDFs and auxiliary files (default: input_dir)')
+    parser.add_argument('--prefix', '-p', default='part',
+                       help='Prefix of the chunk files (default: "part")')
+    parser.add_argument('--jobs', '-j', type=int, default=None,
+                       help='Chunks compiled in parallel (default: one per CPU)')
+    parser.add_argument('--template', default=None,
+                       help='Template compiled once per chunk; it includes the chunk with \\input{\\chunkfile}')
+    parser.add_argument('--command', default=DEFAULT_COMMAND,
+                       help='Compiler command with {tex}, {jobname} and {output_dir} placeholders (default: xelatex)')
+    parser.add_argument('--max-passes', type=int, default=MAX_PASSES,
+                       help=f'Most compiler passes per chunk (default: {MAX_PASSES})')
+    parser.add_argument('--force', action='store_true',
+                       help='Recompile chunks even if their inputs are unchanged')
+
+    args = parser.parse_args()
+
+    if args.max_passes < 1:
+        parser.error("--max-passes must be at least 1")
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+
+    success = compile_chunks(args.input_dir, args.output_dir, args.prefix, args.jobs, args.command,
+                             args.template, args.max_passes, args.force)
+
+    if success:
+        print("\n✅ All chunks compiled successfully!")
+        sys.exit(0)
+    else:
+        print("\n❌ Compilation failed!")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Compressed I/O - Transparent gzip, xz and bzip2 reading and writing of reports, chunks and .tex files
+"""
+import os
+import bz2
+import gzip
+import lzma
+
+# Magic bytes at the start of each compressed format
+MAGIC_BYTES = (
+    (b'\x1f\x8b', 'gz'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'BZh', 'bz2'),
+)
+
+# Formats written for output files with these extensions
+EXTENSIONS = {'.gz': 'gz', '.xz': 'xz', '.bz2': 'bz2'}
+
+# Formats accepted by the --compress options
+COMPRESSIONS = tuple(EXTENSIONS.values())
+
+# gzip's own default level; level 9 is several times slower for a few percent
+GZIP_LEVEL = 6
+
+def _open_compressed(compression, path, mode, encoding, newline=None):
+    if compression == 'gz':
+        if 'w' in mode:
+            return gzip.open(path, mode, compresslevel=GZIP_LEVEL, encoding=encoding, newline=newline)
+        return gzip.open(path, mode, encoding=encoding, newline=newline)
+    if compression == 'xz':
+        return lzma.open(path, mode, encoding=encoding, newline=newline)
+    return bz2.open(path, mode, encoding=encoding, newline=newline)
+
+def compression_from_name(path):
+    """Return the format written for path ('gz', 'xz', 'bz2') from its extension, or None."""
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+def detect_compression(path):
+    """Return the format of an existing file ('gz', 'xz', 'bz2') from its magic bytes, or None if it is plain."""
+    with open(path, 'rb') as f:
+        head = f.read(6)
+    for magic, compression in MAGIC_BYTES:
+        if head.startswith(magic):
+            return compression
+    return None
+
+def is_compressed(path):
+    """Return True if the existing file at path is gzip, xz or bzip2 compressed."""
+    return detect_compression(path) is not None
+
+def compressed_name(path, compression):
+    """Return path with the extension of compression appended (path itself when compression is None)."""
+    return f"{path}.{compression}" if compression else path
+
+def open_file(path, mode='r', newline=None):
+    """
+    Open path like open(), decompressing or compressing it transparently.
+
+    Reading detects gzip, xz and bzip2 from the file's magic bytes, so a
+    compressed report is read correctly whatever it is called.  Writing
+    compresses when path ends in .gz, .xz or .bz2.  Text modes always use
+    UTF-8 and, unless newline says otherwise (as for open()), universal
+    newlines, exactly like the plain files.
+    """
+    if 'r' in mode:
+        compression = detect_compression(path)
+    else:
+        compression = compression_from_name(path)
+
+    if 'b' in mode:
+        return open(path, mode) if compression is None else _open_compressed(compression, path, mode, None)
+    if compression is None:
+        return open(path, mode, encoding='utf-8', newline=newline)
+    return _open_compressed(compression, path, mode.replace('t', '') + 't', 'utf-8', newline)
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Conversion Worker - Resident converter serving JSON-line jobs on stdin or a Unix socket
+
+Loading generate_tex once keeps its compiled patterns and escape caches warm
+across jobs, so a queue of small conversions does not pay interpreter startup
+per job.  Each request is one JSON object per line:
+
+  {"id": 1, "text": "##ANCHOR:i1##\\n1. Name, born ..."}
+  {"id": 2, "input_file": "report.txt", "output_file": "report.tex"}
+  {"id": 3, "op": "stats"}
+
+and each response is one JSON line carrying the same id, "ok", the result
+("latex" or "output_file", and "entries"), "convert_ms" spent converting and
+"latency_ms" from receiving the request to answering it.  Responses are
+written as jobs finish, so they may come back out of order.  A request that
+cannot be run gets "ok": false and an "error", and counts as failed in the
+"stats"; that includes a request line over MAX_REQUEST_BYTES, which also
+ends its connection.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import contextlib
+import socket
+import asyncio
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import generate_tex
+import compressed_io
+
+# Longest request line accepted on the socket (a "text" job carries the whole report)
+MAX_REQUEST_BYTES = 256 * 1024 * 1024
+
+# Latencies remembered for the p50/p99 of the "stats" request
+LATENCY_WINDOW = 10000
+
+def run_job(job):
+    """Convert one job in a pool worker and return its result fields."""
+    start = time.perf_counter()
+    entries = 0
+    result = {}
+    if 'text' in job:
+        fragments = list(generate_tex.iter_latex(job['text']))
+        entries = len(fragments)
+        result['latex'] = ''.join(fragments)
+    else:
+        with compressed_io.open_file(job['input_file']) as f, \
+                compressed_io.open_file(job['output_file'], 'w') as output:
+            for fragment in generate_tex.iter_latex(f):
+                output.write(fragment)
+                entries += 1
+        result['output_file'] = job['output_file']
+    result['entries'] = entries
+    result['convert_ms'] = round((time.perf_counter() - start) * 1000, 3)
+    return result
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers (0.0 if it is empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+class ConversionWorker:
+    """
+    Runs jobs from any number of connections on one shared pool.
+
+    At most max_in_flight jobs are converting or queued for the pool at a
+    time; further requests wait for a slot, which keeps a burst from piling
+    up every report in memory at once.
+    """
+
+    def __init__(self, executor, max_in_flight):
+        self.executor = executor
+        self.completed = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    def stats(self):
+        latencies = list(self.latencies)
+        return {
+            'completed': self.completed,
+            'failed': self.failed,
+            'p50_ms': round(percentile(latencies, 0.50), 3),
+            'p99_ms': round(percentile(latencies, 0.99), 3),
+        }
+
+    def _finish(self, response, received):
+        """Record the latency of a job's response and count it as completed or failed."""
+        latency = (time.perf_counter() - received) * 1000
+        response['latency_ms'] = round(latency, 3)
+        self.latencies.append(latency)
+        if response['ok']:
+            self.completed += 1
+        else:
+            self.failed += 1
+        return response
+
+    def reject(self, job_id, error, received):
+        """Return the error response to a request that cannot be run, counted once as failed."""
+        return self._finish({'id': job_id, 'ok': False, 'error': error}, received)
+
+    async def handle_request(self, line):
+        """Parse one request line, run it and return the response."""
+        received = time.perf_counter()
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            return self.reject(None, f"Invalid JSON: {e}", received)
+        if not isinstance(job, dict):
+            return self.reject(None, "A request must be a JSON object", received)
+
+        job_id = job.get('id')
+        op = job.get('op', 'convert')
+        if op == 'ping':
+            return {'id': job_id, 'ok': True}
+        if op == 'stats':
+            return {'id': job_id, 'ok': True, **self.stats()}
+        if op != 'convert':
+            return self.reject(job_id, f"Unknown op '{op}'", received)
+        if 'text' in job:
+            fields = ('text',)
+        elif 'input_file' in job and 'output_file' in job:
+            fields = ('input_file', 'output_file')
+        else:
+            return self.reject(job_id, "A job needs 'text', or 'input_file' and 'output_file'", received)
+        for field in fields:
+            if not isinstance(job[field], str):
+                return self.reject(job_id, f"'{field}' must be a string", received)
+
+        async with self._slots:
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(self.executor, run_job, job)
+                response = {'id': job_id, 'ok': True, **result}
+            except Exception as e:
+                # Any failure of a job is that job's answer; the worker keeps serving
+                response = {'id': job_id, 'ok': False, 'error': f"{type(e).__name__}: {e}"}
+        return self._finish(response, received)
+
+    async def serve_lines(self, read_line, write_response):
+        """
+        Handle request lines until read_line() returns an empty line (end of input), then wait for jobs in flight.
+
+        Lines may be str or UTF-8 bytes.  read_line() raises
+        asyncio.LimitOverrunError for a request over MAX_REQUEST_BYTES; it is
+        answered with an error, and no further lines are read, since the rest
+        of it cannot be told apart from the next request.
+        """
+        tasks = set()
+
+        async def respond(line):
+            write_response(await self.handle_request(line))
+
+        while True:
+            try:
+                line = await read_line()
+            except asyncio.LimitOverrunError:
+                write_response(self.reject(None, f"Request longer than {MAX_REQUEST_BYTES} bytes; closing the connection",
+                                           time.perf_counter()))
+                break
+            if not line:
+                break
+            if not line.strip():
+                continue
+            task = asyncio.create_task(respond(line))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+async def serve_stdin(worker):
+    """
+    Read jobs from stdin and write responses to stdout until stdin is closed.
+
+    Only responses reach stdout: anything a conversion prints (warnings about
+    the report) goes to stderr, so the JSON lines stay parseable.
+    """
+    loop = asyncio.get_running_loop()
+    responses = sys.stdout
+
+    def write_response(response):
+        responses.write(json.dumps(response) + "\n")
+        responses.flush()
+
+    async def read_line():
+        return await loop.run_in_executor(None, sys.stdin.readline)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        await worker.serve_lines(read_line, write_response)
+
+def _remove_stale_socket(path):
+    """Remove a socket file left by a worker that is no longer running; return False if one still is."""
+    if not os.path.exists(path):
+        return True
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return False
+    except OSError:
+        os.unlink(path)
+        return True
+    finally:
+        probe.close()
+
+async def serve_socket(worker, path):
+    """Accept connections on a Unix socket; each sends request lines and gets its responses back."""
+    async def handle_connection(reader, writer):
+        def write_response(response):
+            writer.write((json.dumps(response) + "\n").encode('utf-8'))
+
+        async def read_line():
+            # Bytes, so a request that is not UTF-8 is answered as invalid JSON
+            try:
+                return await reader.readuntil(b'\n')
+            except asyncio.IncompleteReadError as e:
+                # The last line without a newline, or b'' at the end of input
+                return e.partial
+            except ConnectionError:
+                return b''
+
+        try:
+            await worker.serve_lines(read_line, write_response)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_unix_server(handle_connection, path, limit=MAX_REQUEST_BYTES)
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    print(f"Listening on {path}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+def _init_pool_process(escape_cache_size):
+    """Set up a pool process: its escape cache size, and its prints on stderr so they never mix with responses."""
+    generate_tex.set_escape_cache_size(escape_cache_size)
+    sys.stdout = sys.stderr
+
+async def run_worker(socket_path, workers, use_processes, max_in_flight, escape_cache_size):
+    generate_tex.set_escape_cache_size(escape_cache_size)
+    if use_processes:
+        # Pool processes live as long as the worker, so their caches stay warm too
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_pool_process,
+                                       initargs=(escape_cache_size,))
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+
+    worker = ConversionWorker(executor, max_in_flight or workers * 2)
+    try:
+        if socket_path:
+            await serve_socket(worker, socket_path)
+        else:
+            await serve_stdin(worker)
+    finally:
+        executor.shutdown()
+        stats = worker.stats()
+        print(f"Handled {stats['completed'] + stats['failed']} jobs ({stats['failed']} failed), "
+              f"p50 {stats['p50_ms']:.1f} ms, p99 {stats['p99_ms']:.1f} ms", file=sys.stderr)
+
+def main():
+    """Main function with command-line interface."""
+    parser = argparse.ArgumentParser(
+        description='Resident converter serving JSON-line jobs on stdin or a Unix socket',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python convert_worker.py < jobs.jsonl > responses.jsonl
+  python convert_worker.py --socket /tmp/sapling.sock --workers 4 --processes
+        """
+    )
+
+    parser.add_argument('--socket', metavar='PATH', default=None,
+                       help='Serve on this Unix socket instead of stdin/stdout')
+    parser.add_argument('--workers', '-w', type=int, default=os.cpu_count() or 1,
+                       help='Jobs converted at the same time (default: one per CPU)')
+    parser.add_argument('--processes', action='store_true',
+                       help='Convert in worker processes instead of threads, to use several CPUs')
+    parser.add_argument('--max-in-flight', type=int, default=None,
+                       help='Jobs accepted before new requests wait (default: twice --workers)')
+    parser.add_argument('--escape-cache-size', type=int, default=generate_tex.ESCAPE_CACHE_SIZE,
+                       help=f'Strings remembered by the LaTeX/URL escape caches (default: {generate_tex.ESCAPE_CACHE_SIZE})')
+
+    args = parser.parse_args()
+
+    if args.socket and not _remove_stale_socket(args.socket):
+        print(f"Error: Another worker is already listening on '{args.socket}'", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        asyncio.run(run_worker(args.socket, args.workers, args.processes, args.max_in_flight,
+                               args.escape_cache_size))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -5,13 +5,32 @@ Genealogical Text to LaTeX Converter
 import re
 import sys
 import os
+import argparse
+import contextlib
+import functools
+import hashlib
+import io
+import itertools
+import marshal
+import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def escape_latex(text):
-    """Escape LaTeX special characters."""
-    if text is None or text == "":
-        return ""
-    
+import anchor_index
+import compressed_io
+import profiling
+
+# Number of distinct strings remembered by each escape cache.  Place names,
+# parent names and URLs repeat thousands of times in large reports.
+ESCAPE_CACHE_SIZE = 4096
+
+# Longer strings (whole notes paragraphs) are rarely repeated and are escaped
+# directly so they cannot bloat the cache.
+ESCAPE_CACHE_MAX_LENGTH = 256
+
+def _escape_latex_uncached(text):
     # Replace special characters with LaTeX equivalents
+    # (the braces of \textbackslash{} are escaped again by the later replacements)
     text = text.replace('\\', '\\textbackslash{}')
     text = text.replace('#', '\\#')
     text = text.replace('$', '\\$')
@@ -25,84 +44,175 @@ def escape_latex(text):
     
     return text
 
+def _escape_url_uncached(url):
+    return url.replace("_", "\\_").replace("#", "\\#").replace("$", "\\$").replace("%", "\\%").replace("&", "\\&").replace("{", "\\{").replace("}", "\\}").replace("~", "\\~{}").replace("^", "\\^{}")
+
+def set_escape_cache_size(maxsize):
+    """Recreate the escape caches with room for maxsize strings each (0 disables caching)."""
+    global _escape_latex_cached, _escape_url_cached
+    _escape_latex_cached = functools.lru_cache(maxsize=maxsize)(_escape_latex_uncached)
+    _escape_url_cached = functools.lru_cache(maxsize=maxsize)(_escape_url_uncached)
+
+def escape_cache_info():
+    """Return the hit/miss counters of the escape caches as {'latex': ..., 'url': ...}."""
+    return {
+        'latex': _escape_latex_cached.cache_info(),
+        'url': _escape_url_cached.cache_info(),
+    }
+
+set_escape_cache_size(ESCAPE_CACHE_SIZE)
+
+def escape_latex(text):
+    """Escape LaTeX special characters."""
+    if text is None or text == "":
+        return ""
+    
+    if len(text) > ESCAPE_CACHE_MAX_LENGTH:
+        return _escape_latex_uncached(text)
+    return _escape_latex_cached(text)
+
+# Markdown-style links: [Name](#i123), [Name](i123) or [Text](http://...)
+LINK_PATTERN = re.compile(r'\[(.*?)\]\((.*?)\)')
+
+# Joining words that get a line-break opportunity after them, in the order they
+# are tried.  Each rule is (word, replacement, minimum characters from the
+# leading space to the end of the text for the rule to apply).
+LINE_BREAK_RULES = (
+    ("and", " and \\allowbreak", 6),
+    ("of", " of \\allowbreak", 5),
+    ("son of", " son of \\penalty10\\hspace{0pt}", 9),
+    ("son", " son \\allowbreak", 6),
+    ("daughter", " daughter \\allowbreak", 11),
+)
+
+# Next position worth looking at: a LaTeX command or a space starting a joining word
+_LINE_BREAK_SCAN = re.compile(r'\\| (?:and|of|son of|son|daughter)')
+_BRACE = re.compile(r'[{}]')
+
+def _line_break_rule(text, pos, remaining):
+    """Return the (word, replacement) rule for the joining word starting at pos, if any."""
+    for word, replacement, min_remaining in LINE_BREAK_RULES:
+        if remaining >= min_remaining and text.startswith(word, pos):
+            return word, replacement
+    return None
+
+def _skip_command(text, pos):
+    """Return the position just past the LaTeX command (and its first argument) at pos."""
+    n = len(text)
+    i = pos + 1
+    if i >= n or not text[i].isalpha():
+        # Escaped character such as \# - only the backslash is skipped
+        return i
+    # Skip command name
+    while i < n and text[i].isalpha():
+        i += 1
+    # Skip arguments if any
+    if i < n and text[i] == '{':
+        brace_count = 1
+        for brace in _BRACE.finditer(text, i + 1):
+            brace_count += 1 if brace.group() == '{' else -1
+            if brace_count == 0:
+                return brace.end()
+        return n
+    return i
+
+def insert_line_breaks(text):
+    """
+    Add line-break opportunities after "and", "of", "son of", "son" and "daughter".
+
+    The text is scanned once from left to right and the arguments of LaTeX
+    commands are left alone, so the cost is linear in the length of the text.
+    Each replacement ends with a space, and that space can in turn start the
+    next joining word, so " andof" gets a break after both words.
+    """
+    n = len(text)
+    pieces = []
+    start = 0  # start of the original text not yet copied to pieces
+    i = 0
+    pending_space = False  # the trailing space of the last replacement is still to be written
+    
+    while True:
+        if pending_space:
+            remaining = n - i + 1
+            if remaining <= 3:
+                break
+            rule = _line_break_rule(text, i, remaining)
+            if rule:
+                word, replacement = rule
+                pieces.append(replacement)
+                i += len(word)
+                start = i
+                continue
+            pieces.append(' ')
+            pending_space = False
+        
+        match = _LINE_BREAK_SCAN.search(text, i)
+        if match is None:
+            break
+        j = match.start()
+        remaining = n - j
+        if remaining <= 3:
+            break
+        
+        if text[j] == '\\':
+            i = _skip_command(text, j)
+            continue
+        
+        rule = _line_break_rule(text, j + 1, remaining)
+        if rule:
+            word, replacement = rule
+            pieces.append(text[start:j])
+            pieces.append(replacement)
+            i = j + 1 + len(word)
+            start = i
+            pending_space = True
+        else:
+            i = j + 1
+    
+    if pending_space:
+        pieces.append(' ')
+    pieces.append(text[start:])
+    return ''.join(pieces)
+
+def person_link_id(target):
+    """Return the person ID of a "#i123" / "i123" link target, or None for any other link."""
+    if target.startswith('#i') or target.startswith('i'):
+        return target.lstrip('#i')
+    return None
+
 def process_text(text):
     """Process text for LaTeX output, including links and formatting."""
     # First, convert links to LaTeX
-    result = ""
-    rest = text
-    
-    # Process links using a regex pattern
-    link_pattern = r'\[(.*?)\]\((.*?)\)'
+    result = []
     
     last_end = 0
-    for match in re.finditer(link_pattern, text):
+    for match in LINK_PATTERN.finditer(text):
         # Add text before the match
-        result += escape_latex(text[last_end:match.start()])
+        result.append(escape_latex(text[last_end:match.start()]))
         
         # Extract name and target
         name = match.group(1)
         target = match.group(2)
         
         # Check if it's a person link
-        if target.startswith('#i') or target.startswith('i'):
-            person_id = target.lstrip('#i')
+        person_id = person_link_id(target)
+        if person_id is not None:
             # Create a hyperlink to the person
-            result += f"\\textcolor{{accent}}{{\\textbf{{\\underline{{\\hyperlink{{person{person_id}}}{{\\breakablename{{{escape_latex(name)}}}}}}}}}}}"
+            result.append(f"\\textcolor{{accent}}{{\\textbf{{\\underline{{\\hyperlink{{person{person_id}}}{{\\breakablename{{{escape_latex(name)}}}}}}}}}}}")
         elif target.startswith('http'):
             # Create a link to an external URL
-            result += f"\\textcolor{{accent}}{{\\href{{{target}}}{{{escape_latex(name)}}}}}"
+            result.append(f"\\textcolor{{accent}}{{\\href{{{target}}}{{{escape_latex(name)}}}}}")
         else:
             # Unknown link type, just escape it
-            result += escape_latex(match.group(0))
+            result.append(escape_latex(match.group(0)))
         
         last_end = match.end()
     
     # Add remaining text
-    result += escape_latex(text[last_end:])
+    result.append(escape_latex(text[last_end:]))
     
     # Now add our line breaking commands (make sure not to add inside LaTeX commands)
-    # Convert to a list of characters to make targeted replacements easier
-    chars = list(result)
-    i = 0
-    while i < len(chars) - 3:
-        # Skip over actual LaTeX commands
-        if chars[i] == '\\' and i + 1 < len(chars) and chars[i + 1].isalpha():
-            # Skip the backslash
-            i += 1
-            # Skip command name
-            while i < len(chars) and chars[i].isalpha():
-                i += 1
-            # Skip arguments if any
-            if i < len(chars) and chars[i] == '{':
-                brace_count = 1
-                i += 1
-                while i < len(chars) and brace_count > 0:
-                    if chars[i] == '{':
-                        brace_count += 1
-                    elif chars[i] == '}':
-                        brace_count -= 1
-                    i += 1
-        else:
-            # Check for common phrases to add breaks
-            if i + 5 < len(chars) and ''.join(chars[i:i+4]) == " and":
-                chars[i:i+4] = list(" and \\allowbreak ")
-                i += 14  # "and" + "\\allowbreak" + space
-            elif i + 4 < len(chars) and ''.join(chars[i:i+3]) == " of":
-                chars[i:i+3] = list(" of \\allowbreak ")
-                i += 13  # "of" + "\\allowbreak" + space
-            elif i + 8 < len(chars) and ''.join(chars[i:i+7]) == " son of":
-                chars[i:i+7] = list(" son of \\penalty10\\hspace{0pt} ")
-                i += 24  # "son of" + "\\penalty10\\hspace{0pt}" + space
-            elif i + 5 < len(chars) and ''.join(chars[i:i+4]) == " son":
-                chars[i:i+4] = list(" son \\allowbreak ")
-                i += 14  # "son" + "\\allowbreak" + space
-            elif i + 10 < len(chars) and ''.join(chars[i:i+9]) == " daughter":
-                chars[i:i+9] = list(" daughter \\allowbreak ")
-                i += 19  # "daughter" + "\\allowbreak" + space
-            else:
-                i += 1
-    
-    return ''.join(chars)
+    return insert_line_breaks(''.join(result))
 
 def create_url_link(url):
     """Create a LaTeX hyperlink for a URL."""
@@ -112,564 +222,2236 @@ def escape_url(url):
     """Escape special LaTeX characters in URLs while preserving the URL functionality."""
     # For URLs we need to handle underscores and other special characters differently
     # We use \url{} from the url package which properly formats URLs
-    return url.replace("_", "\\_").replace("#", "\\#").replace("$", "\\$").replace("%", "\\%").replace("&", "\\&").replace("{", "\\{").replace("}", "\\}").replace("~", "\\~{}").replace("^", "\\^{}")
+    if len(url) > ESCAPE_CACHE_MAX_LENGTH:
+        return _escape_url_uncached(url)
+    return _escape_url_cached(url)
 
-def process_child_entries(start_idx, lines, output):
+# Line kinds assigned by classify_line()
+LINE_BLANK = 'blank'
+LINE_NOTES_HEADER = 'notes_header'
+LINE_BIO_HEADER = 'bio_header'
+LINE_CHILD_HEADING = 'child_heading'
+LINE_MARRIAGE = 'marriage'
+LINE_CHILD_ENTRY = 'child_entry'
+LINE_TEXT = 'text'
+
+# Child heading variants and the LaTeX macro each one renders as
+CHILD_HEADING_PREFIXES = (
+    ("his child was:", "\\hischildheadingsingular"),
+    ("his children were:", "\\hischildheadingplural"),
+    ("her child was:", "\\herchildheadingsingular"),
+    ("her children were:", "\\herchildheadingplural"),
+)
+
+# Lines that end a multi-line Biography section (besides lines starting with "married")
+BIO_END_LINES = frozenset(["The child from this marriage was:", "Children from this marriage were:"])
+
+# Child entries: "(12) ii. Name, ..." and "ii. Name, ..." / "ii. Name was ..."
+REF_ROMAN_CHILD_PATTERN = re.compile(r'^\((\d+)\)\s+([ivxlcdm]+)\.\s+(.*?)(?:,\s+(.*))?$', re.IGNORECASE)
+ROMAN_CHILD_PATTERN = re.compile(r'^([ivxlcdm]+)\.\s+(.*?)(?:(?:,|was)\s+(.*))?$', re.IGNORECASE)
+CHILD_ENTRY_PATTERN = re.compile(r'(?:\(\d+\)\s+)?[ivxlcdm]+\.\s', re.IGNORECASE)
+_CHILD_ENTRY_START = frozenset('(ivxlcdmIVXLCDM')
+
+class EntryLine:
+    """A stripped line of a person entry, classified once so the state machine only compares tags."""
+    __slots__ = ('text', 'lower', 'kind', 'child_heading', 'married')
+
+    def __init__(self, text, lower, kind, child_heading, married):
+        self.text = text
+        self.lower = lower
+        self.kind = kind
+        self.child_heading = child_heading  # heading macro, or None if not a child heading
+        self.married = married  # "married" appears in the line, in any case
+
+def child_heading_macro(lower):
+    """Return the heading macro for a lower-cased child heading line, or None."""
+    if "child" not in lower:
+        return None
+    for prefix, macro in CHILD_HEADING_PREFIXES:
+        if lower.startswith(prefix):
+            return macro
+    if "from this marriage" in lower:
+        if "children" in lower:
+            return "\\childrenheadingplural"
+        return "\\childrenheadingsingular"
+    return None
+
+def classify_line(line):
+    """Strip, lower-case and tag a single entry line."""
+    text = line.strip()
+    lower = text.lower()
+    child_heading = child_heading_macro(lower)
+    married = "married" in lower
+    
+    if not text:
+        kind = LINE_BLANK
+    elif text.startswith("General Notes:"):
+        kind = LINE_NOTES_HEADER
+    elif text.startswith("Biography:"):
+        kind = LINE_BIO_HEADER
+    elif child_heading:
+        kind = LINE_CHILD_HEADING
+    elif married:
+        kind = LINE_MARRIAGE
+    elif text[0] in _CHILD_ENTRY_START and CHILD_ENTRY_PATTERN.match(text):
+        kind = LINE_CHILD_ENTRY
+    else:
+        kind = LINE_TEXT
+    
+    return EntryLine(text, lower, kind, child_heading, married)
+
+class _Record:
+    """Base of the parsed-entry records: compact, and convertible to plain tuples for the parsed cache."""
+    __slots__ = ()
+    
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+    
+    def __eq__(self, other):
+        return type(self) is type(other) and self.as_tuple() == other.as_tuple()
+
+class ChildRecord(_Record):
+    """
+    One line of a child list.
+    
+    ref_number and roman are the "(12)" badge and roman numeral, when the line
+    has them.  name is bolded unless linked, in which case it is a "[Name](#i12)"
+    link.  rest is the text after the name, or None when nothing follows (and
+    no comma is written after the name).
+    """
+    __slots__ = ('ref_number', 'roman', 'name', 'linked', 'rest')
+    
+    def __init__(self, ref_number, roman, name, linked, rest):
+        self.ref_number = ref_number
+        self.roman = roman
+        self.name = name
+        self.linked = linked
+        self.rest = rest
+    
+    def as_tuple(self):
+        return (self.ref_number, self.roman, self.name, self.linked, self.rest)
+    
+    def intern_text(self, store):
+        intern = store.intern
+        self.ref_number = intern(self.ref_number)
+        self.roman = intern(self.roman)
+        self.name = intern(self.name)
+        self.rest = intern(self.rest)
+
+class NotesRecord(_Record):
+    """A General Notes section, with the marriage line and child list found inside it."""
+    __slots__ = ('lines', 'marriage', 'child_heading', 'children')
+    
+    def __init__(self, lines, marriage=None, child_heading=None, children=None):
+        self.lines = lines
+        self.marriage = marriage
+        self.child_heading = child_heading
+        self.children = children if children is not None else []
+    
+    def as_tuple(self):
+        return ('notes', self.lines, self.marriage, self.child_heading, [child.as_tuple() for child in self.children])
+    
+    def intern_text(self, store):
+        self.lines = store.intern_all(self.lines)
+        self.marriage = store.intern(self.marriage)
+        for child in self.children:
+            child.intern_text(store)
+
+class BiographyRecord(_Record):
+    """A Biography section: its lines, or the URL given on the header line itself."""
+    __slots__ = ('lines', 'url')
+    
+    def __init__(self, lines, url=None):
+        self.lines = lines
+        self.url = url
+    
+    def as_tuple(self):
+        return ('biography', self.lines, self.url)
+    
+    def intern_text(self, store):
+        self.lines = store.intern_all(self.lines)
+        self.url = store.intern(self.url)
+
+class MarriageRecord(_Record):
+    """A marriage line and the child list that follows it."""
+    __slots__ = ('text', 'child_heading', 'children')
+    
+    def __init__(self, text, child_heading=None, children=None):
+        self.text = text
+        self.child_heading = child_heading
+        self.children = children if children is not None else []
+    
+    def as_tuple(self):
+        return ('marriage', self.text, self.child_heading, [child.as_tuple() for child in self.children])
+    
+    def intern_text(self, store):
+        self.text = store.intern(self.text)
+        for child in self.children:
+            child.intern_text(store)
+
+class PersonRecord(_Record):
+    """
+    A parsed person entry: the main line split into number, name (with its
+    suffix) and additional info, then its notes, biography and marriage
+    sections in the order render_person() writes them.
+    """
+    __slots__ = ('person_id', 'entry_number', 'name', 'additional_info', 'sections')
+    
+    def __init__(self, person_id, entry_number, name, additional_info, sections=None):
+        self.person_id = person_id
+        self.entry_number = entry_number
+        self.name = name
+        self.additional_info = additional_info
+        self.sections = sections if sections is not None else []
+    
+    def as_tuple(self):
+        return (self.person_id, self.entry_number, self.name, self.additional_info,
+                [section.as_tuple() for section in self.sections])
+    
+    def intern_text(self, store):
+        """Replace the record's text with the shared copies kept by a TextStore."""
+        self.name = store.intern(self.name)
+        self.additional_info = store.intern(self.additional_info)
+        for section in self.sections:
+            section.intern_text(store)
+    
+    @classmethod
+    def from_tuple(cls, data):
+        """Rebuild a record from as_tuple() output."""
+        person_id, entry_number, name, additional_info, sections = data
+        return cls(person_id, entry_number, name, additional_info, [_section_from_tuple(section) for section in sections])
+
+def _section_from_tuple(data):
+    kind = data[0]
+    if kind == 'notes':
+        return NotesRecord(data[1], data[2], data[3], [ChildRecord(*child) for child in data[4]])
+    if kind == 'biography':
+        return BiographyRecord(data[1], data[2])
+    return MarriageRecord(data[1], data[2], [ChildRecord(*child) for child in data[3]])
+
+def parse_child_entries(start_idx, lines):
+    """
+    Parse child entries from classified lines starting at start_idx.
+    
+    Returns:
+        tuple: (list of ChildRecord, index where the child list ends)
+    """
+    children = []
     k = start_idx
     while k < len(lines):
-        if not lines[k].strip():
+        line = lines[k]
+        if line.kind == LINE_BLANK:
             k += 1  # Skip empty lines
             continue
         
-        child_line = lines[k].strip()
+        child_line = line.text
         
         # Skip if we've reached another section
-        if child_line == "General Notes:" or child_line == "Biography:" or "married" in child_line:
+        if child_line == "General Notes:" or child_line == "Biography:" or (line.married and "married" in child_line):
             break
         
         # Process different types of child entries
         # Type 1: Reference number in parentheses, then roman numeral
-        ref_roman_match = re.match(r'^\((\d+)\)\s+([ivxlcdm]+)\.\s+(.*?)(?:,\s+(.*))?$', child_line, re.IGNORECASE)
+        ref_roman_match = REF_ROMAN_CHILD_PATTERN.match(child_line)
         if ref_roman_match:
             ref_number = ref_roman_match.group(1)
             roman_numeral = ref_roman_match.group(2)
             name_part = ref_roman_match.group(3)
-            rest_part = ref_roman_match.group(4) if ref_roman_match.group(4) else ""
+            rest_part = ref_roman_match.group(4) or None
             
-            # Check if name contains a link
-            link_match = re.search(r'\[(.*?)\]\((.*?)\)', name_part)
+            # Keep only the link if the name contains one, otherwise the name is bolded
+            link_match = LINK_PATTERN.search(name_part)
             if link_match:
-                # Process the link
                 name_and_link = f"[{link_match.group(1)}]({link_match.group(2)})"
-                processed_name = process_text(name_and_link)
-            else:
-                # Bold the name only
-                processed_name = f"\\textbf{{{process_text(name_part)}}}"
-            
-            if rest_part:
-                # Format with badge for reference number, unbolded roman numeral, and comma after name
-                output.write(f"\\childentry{{\\badge{{{ref_number}}} {roman_numeral}. {processed_name},}}{{{process_text(rest_part)}}}\n\n")
+                children.append(ChildRecord(ref_number, roman_numeral, name_and_link, True, rest_part))
             else:
-                # No additional info
-                output.write(f"\\childentry{{\\badge{{{ref_number}}} {roman_numeral}. {processed_name}}}{{}}\n\n")
+                children.append(ChildRecord(ref_number, roman_numeral, name_part, False, rest_part))
         else:
             # Type 2: Just roman numeral
-            roman_match = re.match(r'^([ivxlcdm]+)\.\s+(.*?)(?:(?:,|was)\s+(.*))?$', child_line, re.IGNORECASE)
+            roman_match = ROMAN_CHILD_PATTERN.match(child_line)
             if roman_match:
                 roman_numeral = roman_match.group(1)
                 name_part = roman_match.group(2)
-                rest_part = roman_match.group(3) if roman_match.group(3) else ""
+                rest_part = roman_match.group(3) or None
                 
-                # Check if name contains a link
-                link_match = re.search(r'\[(.*?)\]\((.*?)\)', name_part)
+                link_match = LINK_PATTERN.search(name_part)
                 if link_match:
-                    # Process the link
                     name_and_link = f"[{link_match.group(1)}]({link_match.group(2)})"
-                    processed_name = process_text(name_and_link)
-                    
-                    if rest_part:
-                        # Add comma after name and include rest of text unbolded
-                        output.write(f"\\childentry{{{roman_numeral}. {processed_name},}}{{{process_text(rest_part)}}}\n\n")
-                    else:
-                        # No additional info, just output the name
-                        output.write(f"\\childentry{{{roman_numeral}. {processed_name}}}{{}}\n\n")
+                    children.append(ChildRecord(None, roman_numeral, name_and_link, True, rest_part))
                 else:
                     # Bold the name only, fix the spacing issue with comma
-                    name_part = name_part.rstrip()  # Remove trailing spaces
-                    processed_name = f"\\textbf{{{process_text(name_part)}}}"
-                    
-                    if rest_part:
-                        # Add comma directly after name (no space) and include rest of text unbolded
-                        output.write(f"\\childentry{{{roman_numeral}. {processed_name},}}{{{process_text(rest_part)}}}\n\n")
-                    else:
-                        # No additional info, just output the name
-                        output.write(f"\\childentry{{{roman_numeral}. {processed_name}}}{{}}\n\n")
+                    children.append(ChildRecord(None, roman_numeral, name_part.rstrip(), False, rest_part))
             else:
                 # Fallback for any other format
                 # Try to extract a name and additional info
                 parts = child_line.split(',', 1)
                 if len(parts) > 1:
-                    name_part = parts[0].strip()
-                    rest_part = parts[1].strip()
-                    output.write(f"\\childentry{{\\textbf{{{process_text(name_part)}}},}}{{{process_text(rest_part)}}}\n\n")
+                    profiling.count_fallback("child entry split at first comma")
+                    children.append(ChildRecord(None, None, parts[0].strip(), False, parts[1].strip()))
                 else:
                     # Just bold the entire line as a fallback
-                    output.write(f"\\childentry{{\\textbf{{{process_text(child_line)}}}}}{{}}\n\n")
+                    profiling.count_fallback("child entry bolded as a whole line")
+                    children.append(ChildRecord(None, None, child_line, False, None))
         
         k += 1
     
+    return children, k
+
+def render_children(children, output):
+    """Write parsed child entries to output."""
+    for child in children:
+        if child.linked:
+            processed_name = process_text(child.name)
+        else:
+            processed_name = f"\\textbf{{{process_text(child.name)}}}"
+        
+        # Badge for the reference number, unbolded roman numeral, then the name
+        label = processed_name
+        if child.roman is not None:
+            label = f"{child.roman}. {label}"
+        if child.ref_number is not None:
+            label = f"\\badge{{{child.ref_number}}} {label}"
+        
+        if child.rest is not None:
+            # Comma directly after the name, rest of the text unbolded
+            output.write(f"\\childentry{{{label},}}{{{process_text(child.rest)}}}\n\n")
+        else:
+            output.write(f"\\childentry{{{label}}}{{}}\n\n")
+
+def process_child_entries(start_idx, lines, output):
+    """Write child entries from classified lines starting at start_idx; return the index where they end."""
+    children, k = parse_child_entries(start_idx, lines)
+    render_children(children, output)
     return k
 
-def main():
-    """Main function."""
-    if len(sys.argv) != 3:
-        print("Usage: python generate_tex.py input.txt output.tex")
-        sys.exit(1)
+# Characters read at a time from a report stream
+READ_BLOCK_SIZE = 1 << 18
+
+def iter_lines(stream):
+    """
+    Lazily yield the lines of a text stream without their line terminators.
+
+    The sequence is identical to splitting the whole text on newlines,
+    including the trailing empty string produced when the text ends with a
+    newline, but only one block of READ_BLOCK_SIZE characters is held in
+    memory at a time.  Iterables of lines without read() (lists, generators)
+    are taken one line at a time, with or without their terminators.
+    """
+    read = getattr(stream, 'read', None)
+    if read is not None:
+        partial = ''
+        while True:
+            block = read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            lines = (partial + block).split('\n')
+            partial = lines.pop()
+            yield from lines
+        yield partial
+        return
     
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
+    line = ''
+    for line in stream:
+        if line.endswith('\n'):
+            yield line[:-1]
+        else:
+            yield line
+    if line == '' or line.endswith('\n'):
+        yield ''
+
+class TextStore:
+    """
+    Deduplicating store for the text of a report held in memory.
     
-    if not os.path.exists(input_file):
-        print(f"Error: Input file '{input_file}' not found")
-        sys.exit(1)
+    Large reports repeat the same section headings, place and parent phrases
+    and Biography URLs thousands of times, and every occurrence is otherwise a
+    separate string.  intern() returns one shared copy of each distinct
+    string, counting the memory the duplicates would have taken.  The store's
+    own table is only needed while text is being added; clear() drops it and
+    the strings stay shared.
+    """
     
-    # Read the input file
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+    def __init__(self):
+        self._strings = {}
+        self.shared = 0  # strings replaced by an equal stored one
+        self.saved_bytes = 0
     
-    # Process content in a different way to handle all anchors correctly
-    # First, find all lines starting with ##ANCHOR
-    lines = content.split('\n')
-    entries = []
-    current_person_id = None
-    current_content = []
+    def intern(self, text):
+        """Return the stored string equal to text, storing text if it is new."""
+        if text is None:
+            return None
+        stored = self._strings.setdefault(text, text)
+        if stored is not text:
+            self.shared += 1
+            self.saved_bytes += sys.getsizeof(text)
+        return stored
     
-    # Check if the file contains any anchor patterns
-    has_anchors = any(line.strip().startswith('##ANCHOR:i') for line in lines)
+    def intern_all(self, texts):
+        """Return a list of the stored copies of texts (None stays None)."""
+        if texts is None:
+            return None
+        return self.intern_into(texts, [])
     
+    def intern_into(self, texts, out):
+        """Append the stored copy of each of texts to the list out and return it."""
+        strings = self._strings
+        sizeof = sys.getsizeof
+        for text in texts:
+            stored = strings.setdefault(text, text)
+            if stored is not text:
+                self.shared += 1
+                self.saved_bytes += sizeof(text)
+            out.append(stored)
+        return out
+    
+    def __len__(self):
+        return len(self._strings)
+    
+    def clear(self):
+        self._strings = {}
+    
+    def summary(self):
+        return (f"Text store: {self.shared} repeated strings shared, "
+                f"{self.saved_bytes / (1024 * 1024):.1f} MB saved")
+
+# Entry boundaries: "##ANCHOR:i123##" markers, or numbered person lines and
+# generation headers in reports without anchors
+ANCHOR_PATTERN = re.compile(r'##ANCHOR:i(\d+)##')
+PERSON_LINE_PATTERN = re.compile(r'^(\d+)\.\s+(.*?)(?:,\s+|$)')
+GENERATION_PATTERN = re.compile(r'^([A-Za-z]+)\s+Generation')
+
+# Lines searched for an ##ANCHOR line before a report is taken to have none
+FORMAT_DETECT_LINES = 10000
+
+# First characters of lines that may be an anchor or person line once stripped:
+# '#', digits, and the ASCII whitespace str.strip() removes (lines starting with
+# a non-ASCII character are checked too, for Unicode whitespace).  Any other
+# line can only be an entry boundary if it is a generation header, which
+# contains "Generation", so most lines are passed over without stripping or a regex.
+_BOUNDARY_START = frozenset('#0123456789' + ''.join(chr(c) for c in range(128) if chr(c).isspace()))
+
+def detect_format(lines):
+    """
+    Detect whether a report is delimited by ##ANCHOR:iNNN## markers.
+    
+    Reads lines up to the first anchor, or FORMAT_DETECT_LINES lines if there
+    is none, so detection costs a bounded prefix instead of a pass over the
+    whole report.
+    
+    Returns:
+        tuple: (True if an anchor was found, iterator over all of lines from the start)
+    """
+    lines = iter(lines)
+    held_back = []
+    for line in lines:
+        held_back.append(line)
+        if line.strip().startswith('##ANCHOR:i'):
+            return True, itertools.chain(held_back, lines)
+        if len(held_back) >= FORMAT_DETECT_LINES:
+            break
+    return False, itertools.chain(held_back, lines)
+
+class Segment:
+    """
+    One entry of a report as found by iter_segments().
+    
+    start and end are the 0-based numbers of the report lines holding the
+    entry (end exclusive), content is their text as passed to the renderer,
+    and generation is the first word of the last "... Generation" header
+    before the entry ("First", "Second", ...), or None before the first header.
+    """
+    __slots__ = ('person_id', 'generation', 'start', 'end', 'content')
+    
+    def __init__(self, person_id, generation, start, end, content):
+        self.person_id = person_id
+        self.generation = generation
+        self.start = start
+        self.end = end
+        self.content = content
+
+def iter_segments(lines, has_anchors, warn=True):
+    """
+    Segment report lines into Segments in a single pass.
+    
+    With has_anchors (see detect_format()), an entry is every line after an
+    ##ANCHOR:iNNN## marker up to the next one.  Otherwise an entry starts at a
+    numbered person line ("12. Name, ...") and runs up to the next person line
+    or generation header, and a person line that is the very last line of the
+    input has no body and is dropped.  Only the lines of the current entry are
+    kept in memory, so lines may be a lazy iterator over a file of any size.
+    With warn=False, malformed anchors are skipped without printing a warning.
+    """
     if has_anchors:
-        # Original processing for files with anchors
-        for line in lines:
-            if line.strip().startswith('##ANCHOR:i'):
-                # If we have a previous entry, save it
-                if current_person_id is not None and current_content:
-                    entries.append((current_person_id, '\n'.join(current_content).strip()))
-                    current_content = []
-                
-                # Extract new person ID
-                match = re.search(r'##ANCHOR:i(\d+)##', line.strip())
-                if match:
-                    current_person_id = match.group(1)
-                else:
-                    current_person_id = None
-                    print(f"Warning: Could not extract person_id from anchor: '{line.strip()}'")
+        return _iter_anchor_segments(lines, warn)
+    return _iter_person_segments(lines, warn)
+
+def _last_generation(lines, generation):
+    """Return the generation named by the last header among lines, or generation if there is none."""
+    for line in lines:
+        match = GENERATION_PATTERN.match(line.strip())
+        if match:
+            generation = match.group(1)
+    return generation
+
+def _iter_anchor_segments(lines, warn):
+    boundary_start = _BOUNDARY_START
+    generation = None
+    entry_generation = None
+    person_id = None
+    start = 0
+    # Every line since the last anchor; they belong to person_id's entry unless it is None
+    content = []
+    
+    for line in lines:
+        first = line[:1]
+        if (first in boundary_start or first > '\x7f') and line.strip().startswith('##ANCHOR:i'):
+            # If we have a previous entry, save it
+            text = '\n'.join(content)
+            if person_id is not None and content:
+                yield Segment(person_id, entry_generation, start, start + len(content), text.strip())
+            # Generation headers sit at the end of the previous entry, so search it once rather than every line
+            if 'Generation' in text:
+                generation = _last_generation(content, generation)
+            
+            # Extract new person ID
+            stripped = line.strip()
+            match = ANCHOR_PATTERN.search(stripped)
+            if match:
+                person_id = match.group(1)
             else:
-                # Add line to current content if we have a person ID
-                if current_person_id is not None:
-                    current_content.append(line)
+                person_id = None
+                profiling.count_fallback("malformed anchor skipped")
+                if warn:
+                    print(f"Warning: Could not extract person_id from anchor: '{stripped}'")
+            entry_generation = generation
+            start += len(content) + 1
+            content = []
+        else:
+            content.append(line)
+    
+    # Add the last entry if there is one
+    if person_id is not None and content:
+        yield Segment(person_id, entry_generation, start, start + len(content), '\n'.join(content).strip())
+
+def _iter_person_segments(lines, warn):
+    boundary_start = _BOUNDARY_START
+    generation = None
+    person_id = None
+    start = 0
+    content = []
+    late_anchor = False
+    
+    for index, line in enumerate(lines):
+        first = line[:1]
+        if first in boundary_start or first > '\x7f' or 'Generation' in line:
+            stripped = line.strip()
+            
+            # A generation header or a new person line ends the current entry
+            person_match = PERSON_LINE_PATTERN.match(stripped)
+            generation_match = None if person_match else GENERATION_PATTERN.match(stripped)
+            if person_match or generation_match:
+                if person_id is not None:
+                    yield Segment(person_id, generation, start, index, '\n'.join(content).strip())
+                    person_id = None
+                    content = []
+                if person_match:
+                    profiling.count_fallback("entry segmented without anchors")
+                    person_id = person_match.group(1)
+                    start = index
+                    content.append(line)
+                else:
+                    generation = generation_match.group(1)
+                continue
+            
+            if warn and not late_anchor and stripped.startswith('##ANCHOR:i'):
+                late_anchor = True
+                print(f"Warning: Line {index + 1} is an anchor, but the first {FORMAT_DETECT_LINES} lines had none; "
+                      f"segmenting by person lines")
         
-        # Add the last entry if there is one
-        if current_person_id is not None and current_content:
-            entries.append((current_person_id, '\n'.join(current_content).strip()))
+        if person_id is not None:
+            content.append(line)
+    
+    # The last entry runs to the end of the input
+    if person_id is not None and len(content) > 1:
+        yield Segment(person_id, generation, start, start + len(content), '\n'.join(content).strip())
+
+def iter_anchor_entries(lines, warn=True):
+    """Yield (person_id, entry_content) pairs from lines delimited by ##ANCHOR:iNNN## markers."""
+    for segment in iter_segments(lines, True, warn):
+        yield segment.person_id, segment.content
+
+def iter_person_entries(lines):
+    """Yield (person_id, entry_content) pairs from a report without anchors."""
+    for segment in iter_segments(lines, False):
+        yield segment.person_id, segment.content
+
+def iter_entries(lines, has_anchors):
+    """Segment report lines into (person_id, entry_content) pairs."""
+    if has_anchors:
+        return iter_anchor_entries(lines)
+    return iter_person_entries(lines)
+
+# Entries handed to a worker process at a time when rendering with --jobs
+JOBS_BATCH_SIZE = 200
+
+def render_entry_text(person_id, entry_content):
+    """Return the LaTeX for a single person entry as a string."""
+    buffer = io.StringIO()
+    render_entry(person_id, entry_content, buffer)
+    return buffer.getvalue()
+
+def render_record_text(person_id, person):
+    """Return the LaTeX for a parsed PersonRecord as a string."""
+    buffer = io.StringIO()
+    render_person(person, buffer)
+    return buffer.getvalue()
+
+def _render_batch(batch, render=render_entry_text):
+    """Render a list of (person_id, entry_content) pairs in a worker process."""
+    return [render(person_id, entry_content) for person_id, entry_content in batch]
+
+def _iter_batches(entries, batch_size):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# Bump when a change alters the LaTeX produced for an entry.  The render cache
+# also keys on a digest of this file, so edits to the converter invalidate it.
+CONVERTER_VERSION = "1"
+
+_converter_fingerprint = None
+
+def converter_fingerprint():
+    """Return a string identifying this converter's version and source code."""
+    global _converter_fingerprint
+    if _converter_fingerprint is None:
+        with open(os.path.abspath(__file__), 'rb') as f:
+            source_digest = hashlib.sha256(f.read()).hexdigest()
+        _converter_fingerprint = f"{CONVERTER_VERSION}:{source_digest}"
+    return _converter_fingerprint
+
+class RenderCache:
+    """
+    Persistent SQLite store of rendered entries for incremental rebuilds.
+
+    Entries are keyed by a hash of the converter fingerprint, the person ID and
+    the entry's raw text, so an edited entry (or an upgraded converter) misses
+    the cache while every unchanged entry is served without rendering.  A
+    PersonRecord from the parsed cache is keyed by the fields it holds.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._fingerprint = converter_fingerprint().encode('utf-8')
+        self._pending = []
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, latex TEXT NOT NULL)")
+
+    def key(self, person_id, entry):
+        digest = hashlib.sha256(self._fingerprint)
+        digest.update(b'\0' + person_id.encode('utf-8') + b'\0')
+        if isinstance(entry, str):
+            digest.update(entry.encode('utf-8'))
+        else:
+            # Tagged so a record never shares a key with raw text
+            digest.update(b'record\0' + repr(entry.as_tuple()).encode('utf-8'))
+        return digest.digest()
+
+    def get(self, key):
+        """Return the cached LaTeX for key, or None, updating the hit/miss counters."""
+        row = self._connection.execute("SELECT latex FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, key, latex):
+        self._pending.append((key, latex))
+
+    def flush(self):
+        """Write entries added with put() to the database."""
+        if self._pending:
+            with self._connection:
+                self._connection.executemany("INSERT OR REPLACE INTO entries (key, latex) VALUES (?, ?)", self._pending)
+            self._pending = []
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+def _lookup_batch(batch, cache):
+    """Return (keys, cached LaTeX or None per entry, entries still to render)."""
+    keys = [cache.key(person_id, entry_content) for person_id, entry_content in batch]
+    found = [cache.get(key) for key in keys]
+    missing = [entry for entry, latex in zip(batch, found) if latex is None]
+    return keys, found, missing
+
+def _merge_batch(keys, found, rendered, cache):
+    """Fill the cache misses of a batch with freshly rendered LaTeX, storing it in the cache."""
+    rendered = iter(rendered)
+    results = []
+    for key, latex in zip(keys, found):
+        if latex is None:
+            latex = next(rendered)
+            cache.put(key, latex)
+        results.append(latex)
+    cache.flush()
+    return results
+
+def render_entries(entries, jobs=1, batch_size=JOBS_BATCH_SIZE, cache=None, render=render_entry_text):
+    """
+    Yield the rendered LaTeX of each entry, in input order.
+
+    With jobs > 1, batches of entries are rendered in a pool of worker
+    processes.  Only about two batches per worker are in flight at once, so a
+    lazy entries iterator keeps memory bounded in streaming mode too.  With a
+    RenderCache, unchanged entries are taken from the cache and only the
+    misses are rendered.  render is called as render(person_id, entry) and
+    defaults to rendering the entry's text; render_record_text() renders
+    (person_id, PersonRecord) pairs from the parsed cache instead.
+    """
+    if jobs <= 1 and cache is None:
+        for person_id, entry in entries:
+            yield render(person_id, entry)
+        return
+    
+    if jobs <= 1:
+        for batch in _iter_batches(entries, batch_size):
+            keys, found, missing = _lookup_batch(batch, cache)
+            yield from _merge_batch(keys, found, _render_batch(missing, render), cache)
+        return
+    
+    def finish(item):
+        batch_or_keys, found, future = item
+        rendered = future.result()
+        if cache is None:
+            return rendered
+        return _merge_batch(batch_or_keys, found, rendered, cache)
+    
+    # Workers start with the same escape cache size as this process
+    cache_size = escape_cache_info()['latex'].maxsize
+    with ProcessPoolExecutor(max_workers=jobs, initializer=set_escape_cache_size, initargs=(cache_size,)) as executor:
+        pending = deque()
+        for batch in _iter_batches(entries, batch_size):
+            if cache is None:
+                pending.append((batch, None, executor.submit(_render_batch, batch, render)))
+            else:
+                keys, found, missing = _lookup_batch(batch, cache)
+                pending.append((keys, found, executor.submit(_render_batch, missing, render)))
+            if len(pending) >= jobs * 2:
+                yield from finish(pending.popleft())
+        while pending:
+            yield from finish(pending.popleft())
+
+# Written between consecutive entries
+DIVIDER = "\\dividerline\n\n"
+
+def iter_fragments(entries, jobs=1, batch_size=JOBS_BATCH_SIZE, cache=None, render=render_entry_text):
+    """Yield the LaTeX of each entry, with the divider line in front of every entry but the first."""
+    for entry_idx, rendered in enumerate(render_entries(entries, jobs, batch_size, cache, render)):
+        if entry_idx > 0:
+            rendered = DIVIDER + rendered
+        yield rendered
+
+def write_entries(entries, output, jobs=1, batch_size=JOBS_BATCH_SIZE, cache=None, render=render_entry_text):
+    """Render each entry to output, with a divider line between consecutive entries."""
+    for fragment in iter_fragments(entries, jobs, batch_size, cache, render):
+        output.write(fragment)
+
+def input_line(tex_file):
+    """Return the \\input line that includes tex_file (TeX wants forward slashes and no .tex extension)."""
+    return f"\\input{{{os.path.splitext(tex_file)[0].replace(os.sep, '/')}}}\n"
+
+def write_master_file(master_file, tex_files):
+    """
+    Write a master file of \\input lines, one per .tex file, with the divider
+    line between them.
+    
+    Each file holds whole entries and starts without a divider, so a
+    template that includes the master produces the same document as one
+    conversion of all the entries.
+    """
+    with open(master_file, 'w', encoding='utf-8') as master:
+        for file_idx, tex_file in enumerate(tex_files):
+            if file_idx > 0:
+                master.write(DIVIDER)
+            master.write(input_line(tex_file))
+
+class ShardWriter:
+    """
+    Output for write_entries() that spreads the entries over numbered shard files.
+    
+    Writing to book.tex creates book_shard1.tex, book_shard2.tex, ... (after
+    removing the shards of any earlier run) and makes book.tex itself a
+    master file of \\input lines, so a template that includes book.tex
+    produces the same document as a single-file conversion.  A shard is
+    closed before an entry that would take it past max_bytes or
+    max_entries (an entry larger than max_bytes gets a shard of its own), so
+    shards always hold whole entries.  Each shard starts without a divider
+    line; the master puts one between shards instead, so every shard can
+    also be compiled on its own (see compile_chunks.py).
+    
+    Every write() must be one entry's fragment from iter_fragments(), which
+    is how write_entries() writes.
+    """
+    
+    def __init__(self, output_file, max_bytes=None, max_entries=None):
+        self.output_file = output_file
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.shard_files = []
+        self._stem = os.path.splitext(output_file)[0]
+        self._shard = None
+        self._size = 0
+        self._entries = 0
+        self._remove_old_shards()
+    
+    def _start_shard(self):
+        if self._shard is not None:
+            self._shard.close()
+        shard_file = f"{self._stem}_shard{len(self.shard_files) + 1}.tex"
+        self._shard = open(shard_file, 'w', encoding='utf-8')
+        self.shard_files.append(shard_file)
+        self._size = 0
+        self._entries = 0
+    
+    def write(self, fragment):
+        size = len(fragment.encode('utf-8'))
+        if (self._shard is None or
+                (self.max_entries and self._entries >= self.max_entries) or
+                (self.max_bytes and self._size + size > self.max_bytes)):
+            self._start_shard()
+            if fragment.startswith(DIVIDER):
+                fragment = fragment[len(DIVIDER):]
+                size -= len(DIVIDER)
+        self._shard.write(fragment)
+        self._size += size
+        self._entries += 1
+        return len(fragment)
+    
+    def _remove_old_shards(self):
+        """Remove the shards of an earlier run, so a smaller run leaves none of them behind."""
+        directory, stem = os.path.split(self._stem)
+        pattern = re.compile(rf'^{re.escape(stem)}_shard\d+\.tex$')
+        for name in os.listdir(directory or '.'):
+            if pattern.match(name):
+                os.remove(os.path.join(directory, name))
+    
+    def close(self):
+        """Close the last shard and write the master file."""
+        if self._shard is not None:
+            self._shard.close()
+            self._shard = None
+        write_master_file(self.output_file, self.shard_files)
+        print(f"Created {len(self.shard_files)} shards and master file {self.output_file}")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        elif self._shard is not None:
+            self._shard.close()
+        return False
+
+def open_output(output_file, shard_limits=None):
+    """
+    Open the .tex output of a conversion.
+    
+    shard_limits is None for a single file (compressed if its name ends in
+    .gz, .xz or .bz2), or (max_bytes, max_entries) for a ShardWriter.
+    """
+    if shard_limits is None:
+        return compressed_io.open_file(output_file, 'w')
+    return ShardWriter(output_file, *shard_limits)
+
+def parse_size(text):
+    """Parse a size such as "4000000", "800k", "5M" or "5MB" into bytes."""
+    match = re.match(r'^\s*(\d+)\s*([kmg]?)b?\s*$', text, re.IGNORECASE)
+    if not match or int(match.group(1)) == 0:
+        raise argparse.ArgumentTypeError(f"invalid size '{text}', expected e.g. 800k or 5MB")
+    return int(match.group(1)) * 1024 ** ' kmg'.index(match.group(2).lower() or ' ')
+
+# Rendered lines of at least this many characters are shared through a macro
+# by --macros when they repeat (General Notes paragraphs, Biography URLs)
+MACRO_MIN_LENGTH = 80
+
+# Macro names are this prefix, letters naming the output (see macro_prefix())
+# and letters numbering the line: \sharedtextqejzgda, \sharedtextqejzgdb, ...
+MACRO_PREFIX = "sharedtext"
+
+# Letters naming an output in its macro names
+MACRO_OUTPUT_LETTERS = 6
+
+# Once a line is stored in a macro body its characters are already tokenized:
+# # and % change meaning, and \href/\url can no longer read ~ and ^ verbatim
+_MACRO_UNSAFE = re.compile(r'(?<!\\)[#%~^]')
+
+_NOT_BRACE = re.compile(r'[^{}]+')
+
+_MASTER_INPUT_PATTERN = re.compile(r'^\\input\{(.*)\}$')
+
+def macro_prefix(output_file):
+    """
+    Return the prefix of the macro names defined for output_file.
+    
+    Outputs converted separately can end up in one document (chunks
+    converted one by one, several batch outputs under one master), and
+    \\providecommand keeps the first definition of a name, so each output
+    gets its own letters, taken from a hash of its path.
+    """
+    stem = os.path.normpath(os.path.splitext(output_file)[0]).replace(os.sep, '/')
+    digest = hashlib.sha256(stem.encode('utf-8')).digest()
+    return MACRO_PREFIX + ''.join(chr(ord('a') + byte % 26) for byte in digest[:MACRO_OUTPUT_LETTERS])
+
+def macro_name(index, prefix=MACRO_PREFIX):
+    """Return the control sequence name of the index-th shared line (letters only, as TeX requires)."""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('a') + remainder) + letters
+    return prefix + letters
+
+def _can_share(text):
+    """Return True if text can be stored in a macro body and expand to the same output."""
+    if ('#' in text or '%' in text or '~' in text or '^' in text) and _MACRO_UNSAFE.search(text):
+        return False
+    # The body must be balanced: strip escaped braces and everything else, then empty pairs
+    braces = _NOT_BRACE.sub('', text.replace('\\{', '').replace('\\}', ''))
+    while '{}' in braces:
+        braces = braces.replace('{}', '')
+    return not braces
+
+def master_inputs(master_file):
+    """Return the .tex files a master file of \\input lines includes, in order."""
+    tex_files = []
+    with open(master_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = _MASTER_INPUT_PATTERN.match(line.rstrip('\n'))
+            if match:
+                tex_files.append(match.group(1) + '.tex')
+    return tex_files
+
+def count_repeated_lines(tex_files, min_length=MACRO_MIN_LENGTH):
+    """
+    Return {line: occurrences} for the lines of at least min_length characters
+    that occur more than once across tex_files.
+    
+    Only one hash per distinct long line is kept until the line is seen
+    again, so unique notes paragraphs are never held in memory.  (Two
+    different lines with the same hash would make a unique line count as
+    repeated; sharing it would still be correct, merely not smaller.)
+    """
+    seen = set()
+    repeated = {}
+    for tex_file in tex_files:
+        with open(tex_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if len(line) < min_length:
+                    continue
+                if line in repeated:
+                    repeated[line] += 1
+                    continue
+                line_hash = hash(line)
+                if line_hash in seen:
+                    repeated[line] = 2
+                else:
+                    seen.add(line_hash)
+    return repeated
+
+def share_repeated_lines(output_file, sharded=False, min_length=MACRO_MIN_LENGTH):
+    """
+    Define each long line repeated in a conversion's output once, as a macro.
+    
+    The lines are counted in the finished output (every shard listed in the
+    master file when sharded), written to {stem}_macros.tex as
+    \\providecommand definitions, and every occurrence is replaced by the
+    macro.  Each rewritten .tex file starts by including the macros file, so
+    shards still compile on their own, and the document is unchanged.  Lines
+    are only shared when that makes the output smaller.
+    
+    Returns:
+        tuple: (macros file or None if nothing was shared, macros defined, bytes saved)
+    """
+    tex_files = master_inputs(output_file) if sharded else [output_file]
+    repeated = count_repeated_lines(tex_files, min_length)
+    
+    # Replacement of each shared line: its macro, then {} so the line end still counts as a space
+    replacements = {}
+    definitions = []
+    prefix = macro_prefix(output_file)
+    for line, count in repeated.items():
+        text = line.rstrip('\n')
+        if not _can_share(text):
+            continue
+        name = macro_name(len(definitions), prefix)
+        definition = f"\\providecommand{{\\{name}}}{{{text}}}\n"
+        reference = f"\\{name}{{}}"
+        if count * (len(text) - len(reference)) <= len(definition):
+            continue
+        replacements[line] = reference + line[len(text):]
+        definitions.append(definition)
+    
+    if not replacements:
+        return None, 0, 0
+    
+    macros_file = f"{os.path.splitext(output_file)[0]}_macros.tex"
+    with open(macros_file, 'w', encoding='utf-8') as f:
+        f.writelines(definitions)
+    include = input_line(macros_file)
+    
+    size_before = sum(os.path.getsize(tex_file) for tex_file in tex_files)
+    for tex_file in tex_files:
+        temp_file = tex_file + '.tmp'
+        with open(tex_file, 'r', encoding='utf-8') as f, open(temp_file, 'w', encoding='utf-8') as output:
+            output.write(include)
+            output.writelines(replacements.get(line, line) for line in f)
+        os.replace(temp_file, tex_file)
+    size_after = sum(os.path.getsize(tex_file) for tex_file in tex_files) + os.path.getsize(macros_file)
+    
+    return macros_file, len(definitions), size_before - size_after
+
+def macros_summary(result, min_length=MACRO_MIN_LENGTH):
+    """Describe the (macros file, macros defined, bytes saved) result of share_repeated_lines()."""
+    macros_file, defined, saved_bytes = result
+    if macros_file is None:
+        return f"Macros: no repeated lines of {min_length}+ characters to share"
+    return (f"Macros: {defined} repeated lines defined once in {macros_file}, "
+            f"{saved_bytes} bytes ({saved_bytes / (1024 * 1024):.1f} MB) saved")
+
+def split_report(source):
+    """
+    Detect a report's format and segment it into entries in a single pass.
+    
+    source is the whole report as a string, a text stream (an open file,
+    io.StringIO, ...) or any iterable of lines with or without their line
+    terminators.  It is read only once: the format is detected from the
+    lines up to the first anchor (see detect_format()), and those lines are
+    then segmented along with the rest, lazily.
+    
+    Returns:
+        tuple: (True if the report has ##ANCHOR lines, iterator of (person_id, entry_content))
+    """
+    if isinstance(source, str):
+        source = source.split('\n')
+    
+    has_anchors, lines = detect_format(iter_lines(source))
+    return has_anchors, iter_entries(lines, has_anchors)
+
+def iter_latex(source, jobs=1, batch_size=JOBS_BATCH_SIZE, cache=None):
+    """
+    Convert a report and yield its LaTeX one entry at a time.
+    
+    This is the in-process equivalent of running the command line: source is
+    anything split_report() accepts, and writing the fragments in order
+    produces exactly the .tex file the command line writes for the same
+    report.  Every fragment but the first starts with the divider line, so
+    fragments can be sent on (e.g. to an HTTP response) as soon as they are
+    rendered.  jobs, batch_size and cache work as on the command line.
+    """
+    entries = split_report(source)[1]
+    yield from iter_fragments(entries, jobs, batch_size, cache)
+
+# Main entry line: "12. Name, additional info" or "Name, additional info"
+MAIN_LINE_PATTERN = re.compile(r'^(\d+)\.?\s+(.*?)(?:,\s+(.*))?$')
+NAME_INFO_PATTERN = re.compile(r'^(.*?)(?:,\s+(.*))?$')
+
+# Common phrases that indicate the rest of the "name" is biographical information
+BIO_MARKERS = [
+    r'was born', r'born', r'died', r'baptized', r'baptised', r'christened',
+    r'married', r'buried', r'resided'
+]
+BIO_MARKER_SPLIT_PATTERN = re.compile(f'\\s+({"|".join(BIO_MARKERS)})\\s+', re.IGNORECASE)
+
+# Names ending in a suffix such as "Jr.", "Sr." or "III" keep the suffix in the bolded name
+SUFFIX_PATTERN = re.compile(r'(.*?(?:\s+(?:Jr\.|Sr\.|II|III|IV|V|VI|VII|VIII|IX|X)\.?))(?:\s+(.*))?$', re.IGNORECASE)
+
+def parse_main_line(main_line):
+    """Split an entry's main line into (entry_number, name, additional_info), moving dates out of the name."""
+    # Extract person entry number and name/additional info
+    match = MAIN_LINE_PATTERN.match(main_line)
+    if match:
+        entry_number = match.group(1).strip()  # This is the person's unique number
+        name = match.group(2).strip()
+        additional_info = match.group(3) if match.group(3) else ""
     else:
-        # Alternative processing for files without anchors
-        print("No anchor patterns found in input file. Processing by person entries...")
+        # Try with just name and additional info
+        profiling.count_fallback("main line without entry number")
+        match = NAME_INFO_PATTERN.match(main_line)
+        if match:
+            entry_number = ""
+            name = match.group(1).strip()
+            additional_info = match.group(2) if match.group(2) else ""
+        else:
+            entry_number = ""
+            name = main_line.strip()
+            additional_info = ""
+    
+    # Check if the name contains biographical information like birth/death dates
+    name_parts = BIO_MARKER_SPLIT_PATTERN.split(name, maxsplit=1)
+    
+    if len(name_parts) > 1:
+        # We found a biographical marker in what was considered the name
+        profiling.count_fallback("dates moved out of the name")
+        actual_name = name_parts[0].strip()
+        # Reconstruct the additional info from the rest of the parts
+        additional_text = ' '.join(name_parts[1:]).strip()
         
-        person_pattern = r'^(\d+)\.\s+(.*?)(?:,\s+|$)'
-        generation_pattern = r'^([A-Za-z]+)\s+Generation'
+        # If we already have additional_info from a comma, prepend this bio info
+        if additional_info:
+            additional_info = f"{additional_text}, {additional_info}"
+        else:
+            additional_info = additional_text
         
-        i = 0
-        current_generation = "First"
+        # Update the name to just the actual person's name
+        name = actual_name
+    
+    return entry_number, name, additional_info
+
+def parse_name_suffix(name, additional_info):
+    """Keep a suffix such as "Jr." in the bolded name and move "son of ..." parts into additional_info."""
+    # Check if the name contains suffixes like "Jr." or "Sr."
+    # These should be included in the bolded name with the comma right after them
+    name_with_suffix = name
+    
+    son_of_marker = " son of "
+    daughter_of_marker = " daughter of "
+    
+    suffix_match = SUFFIX_PATTERN.search(name_with_suffix)
+    if suffix_match:
+        # Extract the name with suffix
+        name_with_suffix = suffix_match.group(1).strip()
+        # If there's anything after the suffix that's not part of the name, move it to additional_info
+        if suffix_match.group(2):
+            rest_of_line = suffix_match.group(2).strip()
+            if additional_info:
+                additional_info = f"{rest_of_line}, {additional_info}"
+            else:
+                additional_info = rest_of_line
+    
+    # Now handle son of/daughter of cases if not already handled
+    if son_of_marker in name_with_suffix:
+        profiling.count_fallback("parents moved out of the name")
+        parts = name_with_suffix.split(son_of_marker, 1)
+        name_with_suffix = parts[0].strip()
+        if len(parts) > 1 and additional_info:
+            additional_info = f"son of {parts[1]}, {additional_info}"
+        elif len(parts) > 1:
+            additional_info = f"son of {parts[1]}"
+    elif daughter_of_marker in name_with_suffix:
+        profiling.count_fallback("parents moved out of the name")
+        parts = name_with_suffix.split(daughter_of_marker, 1)
+        name_with_suffix = parts[0].strip()
+        if len(parts) > 1 and additional_info:
+            additional_info = f"daughter of {parts[1]}, {additional_info}"
+        elif len(parts) > 1:
+            additional_info = f"daughter of {parts[1]}"
+    elif " and " in name_with_suffix:
+        # Handle cases where name might include "and" followed by parent names
+        # This checks if "and" is part of the title or connecting to parents
+        and_parts = name_with_suffix.split(" and ", 1)
+        if len(and_parts) > 1 and ("son of" in name_with_suffix or "daughter of" in name_with_suffix):
+            profiling.count_fallback("parents moved out of the name")
+            name_with_suffix = and_parts[0]
+            if additional_info:
+                additional_info = f"and {and_parts[1]}, {additional_info}"
+            else:
+                additional_info = f"and {and_parts[1]}"
+    
+    return name_with_suffix, additional_info
+
+def parse_entry(person_id, entry_content, store=None):
+    """
+    Parse a single person entry into a PersonRecord without rendering anything.
+    
+    The sections are recorded in the order the entry's lines are walked, so
+    render_person() reproduces exactly what the converter has always written,
+    including the spacing that depends on which sections came before.  With
+    a TextStore, text repeated across records (parent phrases, places, URLs)
+    is shared.
+    """
+    lines = [classify_line(line) for line in entry_content.split('\n')]
+    
+    # Process main entry line
+    entry_number, name, additional_info = parse_main_line(lines[0].text)
+    
+    name_with_suffix, additional_info = parse_name_suffix(name, additional_info)
+    
+    person = PersonRecord(person_id, entry_number, name_with_suffix, additional_info)
+    sections = person.sections
+    
+    # Lines starting with the person's name (or first name) are marriage lines
+    first_name = name.split()[0] if name else ""
+    name_lower = name.lower()
+    first_name_lower = first_name.lower()
+    
+    # Process notes, biography, marriages and children
+    i = 1
+    
+    while i < len(lines):
+        line = lines[i]
         
-        while i < len(lines):
-            line = lines[i].strip()
+        # Process General Notes section
+        if line.kind == LINE_NOTES_HEADER:
+            notes = []
+            j = i + 1
             
-            # Check if this is a generation header
-            generation_match = re.match(generation_pattern, line)
-            if generation_match:
-                current_generation = generation_match.group(1)
-                i += 1
-                continue
+            # If the notes are on the same line as the header
+            if len(line.text) > 15:
+                # Extract the content after the colon
+                first_note = line.text.split(":", 1)[1].strip()
+                if first_note:
+                    notes.append(first_note)
             
-            # Check if this is a new person entry
-            person_match = re.match(person_pattern, line)
-            if person_match:
-                person_id = person_match.group(1)
+            # Extract the content of the General Notes section
+            # Keep collecting until we find Biography:, a marriage line, or a child line
+            marriage_line_in_notes = None
+            child_heading_in_notes = None
+            
+            while j < len(lines):
+                current = lines[j]
+                if current.kind == LINE_BIO_HEADER:
+                    break
                 
-                # Find the end of this person's entry
-                start_idx = i
-                i += 1
-                while i < len(lines):
-                    next_line = lines[i].strip()
-                    next_person_match = re.match(person_pattern, next_line)
-                    next_gen_match = re.match(generation_pattern, next_line)
+                # First-name or full-name followed by "married" should be treated as a marriage line
+                if current.married and (current.lower.startswith(name_lower) or current.lower.startswith(first_name_lower)):
+                    marriage_line_in_notes = current.text
+                    
+                    # Check if the next non-empty line is a child heading
+                    next_j = j + 1
+                    while next_j < len(lines) and lines[next_j].kind == LINE_BLANK:
+                        next_j += 1
                     
-                    if next_person_match or next_gen_match or i == len(lines) - 1:
-                        # If we're at the last line, include it in the current entry
-                        end_idx = i if (next_person_match or next_gen_match) else i + 1
-                        # Extract the content for this person
-                        person_content = '\n'.join(lines[start_idx:end_idx]).strip()
-                        entries.append((person_id, person_content))
+                    if next_j < len(lines) and lines[next_j].child_heading:
+                        # We found a child heading after a marriage line within General Notes
+                        child_heading_in_notes = lines[next_j].child_heading
+                        j = next_j  # Skip ahead to after the marriage line
                         break
-                    i += 1
-            else:
-                i += 1
-    
-    # Generate output
-    with open(output_file, 'w', encoding='utf-8') as output:
-        for entry_idx, (person_id, entry_content) in enumerate(entries):
-            lines = entry_content.split('\n')
-            if not lines:
-                continue
-            
-            # Process main entry line
-            main_line = lines[0].strip()
-            
-            # Extract person entry number and name/additional info
-            match = re.match(r'^(\d+)\.?\s+(.*?)(?:,\s+(.*))?$', main_line)
-            if match:
-                entry_number = match.group(1).strip()  # This is the person's unique number
-                name = match.group(2).strip()
-                additional_info = match.group(3) if match.group(3) else ""
-            else:
-                # Try with just name and additional info
-                match = re.match(r'^(.*?)(?:,\s+(.*))?$', main_line)
-                if match:
-                    entry_number = ""
-                    name = match.group(1).strip()
-                    additional_info = match.group(2) if match.group(2) else ""
-                else:
-                    entry_number = ""
-                    name = main_line.strip()
-                    additional_info = ""
-            
-            # Check if the name contains biographical information like birth/death dates
-            # Common phrases that indicate this isn't part of the name
-            bio_markers = [
-                r'was born', r'born', r'died', r'baptized', r'baptised', r'christened',
-                r'married', r'buried', r'resided'
-            ]
+                    
+                    # Don't break - we'll handle this separately
+                    j += 1
+                    continue
+                
+                # Check for child headings in General Notes
+                if current.child_heading:
+                    child_heading_in_notes = current.child_heading
+                    break  # Break out of General Notes when we find a child heading
+                
+                if current.text:  # Only add non-empty lines
+                    notes.append(current.text)
+                j += 1
             
-            # Create a regex pattern to find these markers
-            bio_pattern = '|'.join(bio_markers)
+            section = NotesRecord(notes, marriage_line_in_notes, child_heading_in_notes)
+            sections.append(section)
+            if marriage_line_in_notes:
+                profiling.count_fallback("marriage line inside General Notes")
             
-            # Check if the name contains any of these markers
-            name_parts = re.split(f'\\s+({bio_pattern})\\s+', name, maxsplit=1, flags=re.IGNORECASE)
+            # If we found a child heading in the notes, its child list ends the section
+            if child_heading_in_notes:
+                section.children, i = parse_child_entries(j + 1, lines)
+                continue
             
-            if len(name_parts) > 1:
-                # We found a biographical marker in what was considered the name
-                actual_name = name_parts[0].strip()
-                # Reconstruct the additional info from the rest of the parts
-                additional_text = ' '.join(name_parts[1:]).strip()
+            i = j  # Move to the next section
+            continue
+        
+        # Process standalone Biography line
+        if line.kind == LINE_BIO_HEADER:
+            # If it's just "Biography:", look for content in the next lines
+            if line.text == "Biography:":
+                j = i + 1
+                bio_content = []
                 
-                # If we already have additional_info from a comma, prepend this bio info
-                if additional_info:
-                    additional_info = f"{additional_text}, {additional_info}"
-                else:
-                    additional_info = additional_text
+                # Extract the content of the Biography section
+                while j < len(lines):
+                    current_line = lines[j].text
+                    if current_line.startswith("married") or current_line in BIO_END_LINES:
+                        break
+                    if current_line:  # Only add non-empty lines
+                        bio_content.append(current_line)
+                    j += 1
                 
-                # Update the name to just the actual person's name
-                name = actual_name
-            
-            # Check if the name contains suffixes like "Jr." or "Sr."
-            # These should be included in the bolded name with the comma right after them
-            name_with_suffix = name
+                sections.append(BiographyRecord(bio_content))
+                i = j  # Move to the next section
+            else:
+                # If the URL is in the same line (Biography: http://...)
+                sections.append(BiographyRecord(None, line.text.split(":", 1)[1].strip()))
+                i += 1  # Move to the next line
             
-            # First, handle specific suffixes like Jr. and Sr.
-            # These should ALWAYS be included with the name and the comma should be right after them
-            son_of_marker = " son of "
-            daughter_of_marker = " daughter of "
+            continue
+        
+        # Process Marriage section
+        if line.married or (line.text and (line.text.startswith(first_name) or line.text.startswith(name))):
+            if not line.married:
+                profiling.count_fallback("marriage line matched by name only")
+            section = MarriageRecord(line.text)
+            sections.append(section)
             
-            # Add handling specifically for Jr. and Sr. and other name suffixes
-            # Step 1: Check if the name already has suffixes like Jr. or Sr. and ensure they stay with the name
-            suffixes = ["Jr.", "Sr.", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X"]
+            # Find children heading and parse the children after it
+            j = i + 1
+            while j < len(lines):
+                child_heading = lines[j].child_heading
+                if child_heading:
+                    section.child_heading = child_heading
+                    section.children = parse_child_entries(j + 1, lines)[0]
+                    break
+                
+                j += 1
             
-            # Improved approach for detecting suffixes - check for specific patterns
-            # Check for specific suffix patterns with regex - enhanced pattern
-            suffix_match = re.search(r'(.*?(?:\s+(?:Jr\.|Sr\.|II|III|IV|V|VI|VII|VIII|IX|X)\.?))(?:\s+(.*))?$', name_with_suffix, re.IGNORECASE)
-            if suffix_match:
-                # Extract the name with suffix
-                name_with_suffix = suffix_match.group(1).strip()
-                # If there's anything after the suffix that's not part of the name, move it to additional_info
-                if suffix_match.group(2):
-                    rest_of_line = suffix_match.group(2).strip()
-                    if additional_info:
-                        additional_info = f"{rest_of_line}, {additional_info}"
-                    else:
-                        additional_info = rest_of_line
+            # Resume from the child heading itself (or the next line if none was found)
+            if j >= len(lines):
+                i += 1
+            else:
+                i = j
+            continue
+        
+        i += 1
+    
+    if store is not None:
+        person.intern_text(store)
+    return person
+
+def render_person(person, output):
+    """Write the LaTeX for a parsed person entry to output."""
+    # Generate the main entry with properly bolded name
+    name_fixed = process_text(person.name)
+    name_bolded = f"\\textbf{{{name_fixed}}}"
+    
+    # Use the anchor ID only for the hyperlink target, but display the entry_number in the badge
+    if person.additional_info:
+        additional_info_fixed = process_text(person.additional_info)
+        # Use person_id for hyperlink target and entry_number for display
+        # Add a comma directly to the name
+        output.write(f"\\entry{{{person.person_id}}}{{{person.entry_number}}}{{{name_bolded},}}{{{additional_info_fixed.strip()}}}\n\n")
+    else:
+        output.write(f"\\entry{{{person.person_id}}}{{{person.entry_number}}}{{{name_bolded}}}{{}}\n\n")
+    
+    has_notes = False
+    has_bio = False
+    
+    for section in person.sections:
+        if type(section) is NotesRecord:
+            has_notes = True
             
-            # Now handle son of/daughter of cases if not already handled
-            if son_of_marker in name_with_suffix:
-                parts = name_with_suffix.split(son_of_marker, 1)
-                name_with_suffix = parts[0].strip()
-                if len(parts) > 1 and additional_info:
-                    additional_info = f"son of {parts[1]}, {additional_info}"
-                elif len(parts) > 1:
-                    additional_info = f"son of {parts[1]}"
-            elif daughter_of_marker in name_with_suffix:
-                parts = name_with_suffix.split(daughter_of_marker, 1)
-                name_with_suffix = parts[0].strip()
-                if len(parts) > 1 and additional_info:
-                    additional_info = f"daughter of {parts[1]}, {additional_info}"
-                elif len(parts) > 1:
-                    additional_info = f"daughter of {parts[1]}"
-            elif " and " in name_with_suffix:
-                # Handle cases where name might include "and" followed by parent names
-                # This checks if "and" is part of the title or connecting to parents
-                and_parts = name_with_suffix.split(" and ", 1)
-                if len(and_parts) > 1 and ("son of" in name_with_suffix or "daughter of" in name_with_suffix):
-                    name_with_suffix = and_parts[0]
-                    if additional_info:
-                        additional_info = f"and {and_parts[1]}, {additional_info}"
-                    else:
-                        additional_info = f"and {and_parts[1]}"
+            # Output the General Notes section
+            output.write(f"\\noindent \\textbf{{General Notes:}}\n")
             
-            # Generate the main entry with properly bolded name
-            name_fixed = process_text(name_with_suffix)
-            name_bolded = f"\\textbf{{{name_fixed}}}"
+            for note_line in section.lines:
+                notes_fixed = process_text(note_line)
+                output.write(f"{notes_fixed}\n")
             
-            # Use the anchor ID only for the hyperlink target, but display the entry_number in the badge
-            if additional_info:
-                additional_info_fixed = process_text(additional_info)
-                # Use person_id for hyperlink target and entry_number for display
-                # Add a comma directly to the name
-                output.write(f"\\entry{{{person_id}}}{{{entry_number}}}{{{name_bolded},}}{{{additional_info_fixed.strip()}}}\n\n")
-            else:
-                output.write(f"\\entry{{{person_id}}}{{{entry_number}}}{{{name_bolded}}}{{}}\n\n")
+            output.write("\n")
             
-            # Process notes, biography, marriages and children
-            i = 1
-            has_notes = False
-            has_bio = False
-            bio_url = None
+            # A marriage line found in the notes is written as a marriage line
+            if section.marriage:
+                # Add an extra newline for proper spacing
+                output.write("\n")
+                marriage_line = process_text(section.marriage)
+                output.write(f"\\marriage{{{marriage_line}}}\n\n")
             
-            while i < len(lines):
-                line = lines[i].strip()
-                
-                # Process General Notes section
-                if line == "General Notes:" or line.startswith("General Notes:"):
-                    has_notes = True
-                    notes = []
-                    j = i + 1
-                    
-                    # If the notes are on the same line as the header
-                    if line.startswith("General Notes:") and len(line) > 15:
-                        # Extract the content after the colon
-                        first_note = line.split(":", 1)[1].strip()
-                        if first_note:
-                            notes.append(first_note)
-                    
-                    # Extract the content of the General Notes section
-                    # Keep collecting until we find Biography:, a marriage line, or a child line
-                    is_marriage_found_in_notes = False
-                    marriage_line_in_notes = None
-                    is_child_heading_in_notes = False
-                    child_heading_in_notes = None
-                    
-                    while j < len(lines):
-                        current_line = lines[j].strip()
-                        if current_line == "Biography:" or current_line.startswith("Biography:"):
-                            break
-                        
-                        # Better detection for marriage lines - check if the line mentions marriage
-                        # First-name or full-name followed by "married" should be treated as a marriage line
-                        if "married" in current_line.lower() and (
-                            current_line.lower().startswith(name.lower()) or
-                            (len(name.split()) > 0 and current_line.lower().startswith(name.split()[0].lower()))
-                        ):
-                            is_marriage_found_in_notes = True
-                            marriage_line_in_notes = current_line
-                            
-                            # Check if the next non-empty line is a child heading
-                            next_j = j + 1
-                            while next_j < len(lines) and not lines[next_j].strip():
-                                next_j += 1
-                            
-                            if next_j < len(lines):
-                                next_line = lines[next_j].strip()
-                                if (next_line.lower().startswith("his child was:") or
-                                    next_line.lower().startswith("his children were:") or
-                                    next_line.lower().startswith("her child was:") or
-                                    next_line.lower().startswith("her children were:") or
-                                    (next_line.strip() and "child" in next_line.lower() and "from this marriage" in next_line.lower())):
-                                    # We found a child heading after a marriage line within General Notes
-                                    is_child_heading_in_notes = True
-                                    child_heading_in_notes = next_line
-                                    j = next_j  # Skip ahead to after the marriage line
-                                    break
-                            
-                            # Don't break - we'll handle this separately
-                            j += 1
-                            continue
-                        
-                        # Check for child headings in General Notes
-                        if (current_line.lower().startswith("his child was:") or 
-                            current_line.lower().startswith("his children were:") or
-                            current_line.lower().startswith("her child was:") or
-                            current_line.lower().startswith("her children were:") or
-                            (current_line.strip() and "child" in current_line.lower() and "from this marriage" in current_line.lower())):
-                            is_child_heading_in_notes = True
-                            child_heading_in_notes = current_line
-                            break  # Break out of General Notes when we find a child heading
-                        
-                        if current_line:  # Only add non-empty lines
-                            notes.append(current_line)
-                        j += 1
-                    
-                    # Output the General Notes section
-                    output.write(f"\\noindent \\textbf{{General Notes:}}\n")
-                    
-                    for note_line in notes:
-                        notes_fixed = process_text(note_line)
-                        output.write(f"{notes_fixed}\n")
-                    
+            if section.child_heading:
+                # Add an extra newline for proper spacing if there was no marriage line
+                if not section.marriage:
                     output.write("\n")
-                    
-                    # If we found a marriage line in the notes, process it as a marriage line
-                    if is_marriage_found_in_notes and marriage_line_in_notes:
-                        # Add an extra newline for proper spacing
-                        output.write("\n")
-                        marriage_line = process_text(marriage_line_in_notes)
-                        output.write(f"\\marriage{{{marriage_line}}}\n\n")
-                    
-                    # If we found a child heading in the notes, process it now
-                    if is_child_heading_in_notes and child_heading_in_notes:
-                        # Add an extra newline for proper spacing if there was no marriage line
-                        if not is_marriage_found_in_notes:
-                            output.write("\n")
-                        
-                        # Process the child heading based on its type
-                        if child_heading_in_notes.lower().startswith("his child was:"):
-                            output.write("\\hischildheadingsingular\n\n")
-                        elif child_heading_in_notes.lower().startswith("his children were:"):
-                            output.write("\\hischildheadingplural\n\n")
-                        elif child_heading_in_notes.lower().startswith("her child was:"):
-                            output.write("\\herchildheadingsingular\n\n")
-                        elif child_heading_in_notes.lower().startswith("her children were:"):
-                            output.write("\\herchildheadingplural\n\n")
-                        elif "children" in child_heading_in_notes.lower() and "from this marriage" in child_heading_in_notes.lower():
-                            output.write("\\childrenheadingplural\n\n")
-                        elif "child" in child_heading_in_notes.lower() and "from this marriage" in child_heading_in_notes.lower():
-                            output.write("\\childrenheadingsingular\n\n")
-                        
-                        # Process the child entries
-                        k = j + 1
-                        k = process_child_entries(k, lines, output)
-                        i = k
-                        continue  # Skip to the next iteration after processing child entries
-                    
-                    i = j  # Move to the next section
-                    continue
                 
-                # Process standalone Biography line
-                if line == "Biography:" or line.startswith("Biography:"):
-                    has_bio = True
-                    
-                    # If it's just "Biography:", look for content in the next lines
-                    if line == "Biography:":
-                        j = i + 1
-                        bio_content = []
-                        
-                        # Extract the content of the Biography section
-                        while j < len(lines):
-                            current_line = lines[j].strip()
-                            if current_line.startswith("married") or current_line == "The child from this marriage was:" or current_line == "Children from this marriage were:":
-                                break
-                            if current_line:  # Only add non-empty lines
-                                bio_content.append(current_line)
-                            j += 1
-                        
-                        output.write(f"\\noindent \\textbf{{Biography:}}\n")
-                        
-                        for bio_line in bio_content:
-                            if bio_line.startswith("http://") or bio_line.startswith("https://"):
-                                output.write(f"\\href{{{bio_line}}}{{\\small\\textcolor{{accent}}{{{escape_url(bio_line)}}}}}\n")
-                            else:
-                                bio_fixed = process_text(bio_line)
-                                output.write(f"{bio_fixed}\n")
-                        
-                        output.write("\n")
-                        i = j  # Move to the next section
+                output.write(f"{section.child_heading}\n\n")
+                render_children(section.children, output)
+        
+        elif type(section) is BiographyRecord:
+            has_bio = True
+            output.write(f"\\noindent \\textbf{{Biography:}}\n")
+            
+            if section.url is None:
+                for bio_line in section.lines:
+                    if bio_line.startswith("http://") or bio_line.startswith("https://"):
+                        output.write(f"\\href{{{bio_line}}}{{\\small\\textcolor{{accent}}{{{escape_url(bio_line)}}}}}\n")
                     else:
-                        # If the URL is in the same line (Biography: http://...)
-                        parts = line.split(":", 1)
-                        if len(parts) > 1:
-                            bio_url = parts[1].strip()
-                            output.write(f"\\noindent \\textbf{{Biography:}}\n")
-                            output.write(f"\\href{{{bio_url}}}{{\\small\\textcolor{{accent}}{{{escape_url(bio_url)}}}}}\n\n")
-                        
-                        i += 1  # Move to the next line
-                    
-                    continue
+                        bio_fixed = process_text(bio_line)
+                        output.write(f"{bio_fixed}\n")
                 
-                # Process Marriage section
-                if "married" in line.lower() or (line.strip() and (line.strip().startswith(name.split()[0]) or line.strip().startswith(name))):
-                    # If we just finished processing General Notes and didn't add Biography, make sure we add an extra newline
-                    if has_notes and not has_bio:
-                        # We already wrote one newline at the end of General Notes, but we need one more for proper spacing
-                        output.write("\n")
-                    
-                    # Process the marriage line with LaTeX formatting commands
-                    marriage_line = process_text(line)
-                    
-                    # Use the marriage command which now has proper spacing built in
-                    # The \marriage command in LaTeX already includes \vspace{0.5em} and proper indentation
-                    output.write(f"\\marriage{{{marriage_line}}}\n\n")
-                    
-                    # Find children heading and process children
-                    j = i + 1
-                    while j < len(lines):
-                        # Match various types of children headings
-                        current_line = lines[j].strip()
-                        is_child_heading = False
-                        is_plural = False
-                        child_heading_type = None
-                        
-                        # Check for all possible child heading patterns
-                        if current_line and "child" in current_line.lower():
-                            # New patterns for His/Her child/children
-                            if current_line.lower().startswith("his child was:"):
-                                is_child_heading = True
-                                is_plural = False
-                                child_heading_type = "his_singular"
-                            elif current_line.lower().startswith("his children were:"):
-                                is_child_heading = True
-                                is_plural = True
-                                child_heading_type = "his_plural"
-                            elif current_line.lower().startswith("her child was:"):
-                                is_child_heading = True
-                                is_plural = False
-                                child_heading_type = "her_singular"
-                            elif current_line.lower().startswith("her children were:"):
-                                is_child_heading = True
-                                is_plural = True
-                                child_heading_type = "her_plural"
-                            # Original patterns
-                            elif "from this marriage" in current_line.lower():
-                                is_child_heading = True
-                                is_plural = "children" in current_line.lower()
-                                child_heading_type = "marriage"
-                        
-                        if is_child_heading:
-                            # Add extra newline for spacing
-                            output.write("\n")
-                            
-                            # Output appropriate children heading based on type
-                            if child_heading_type == "his_singular":
-                                output.write("\\hischildheadingsingular\n\n")
-                            elif child_heading_type == "his_plural":
-                                output.write("\\hischildheadingplural\n\n")
-                            elif child_heading_type == "her_singular":
-                                output.write("\\herchildheadingsingular\n\n")
-                            elif child_heading_type == "her_plural":
-                                output.write("\\herchildheadingplural\n\n")
-                            elif is_plural:
-                                output.write("\\childrenheadingplural\n\n")
-                            else:
-                                output.write("\\childrenheadingsingular\n\n")
-                            
-                            # Process all subsequent lines with content as child entries
-                            k = j + 1
-                            k = process_child_entries(k, lines, output)
-                            
-                            i = k
-                            break
-                        
-                        j += 1
-                    
-                    if j >= len(lines):
-                        i += 1
-                    else:
-                        i = j
+                output.write("\n")
+            else:
+                output.write(f"\\href{{{section.url}}}{{\\small\\textcolor{{accent}}{{{escape_url(section.url)}}}}}\n\n")
+        
+        else:
+            # If we just finished processing General Notes and didn't add Biography, make sure we add an extra newline
+            if has_notes and not has_bio:
+                # We already wrote one newline at the end of General Notes, but we need one more for proper spacing
+                output.write("\n")
+            
+            # The \marriage command in LaTeX already includes \vspace{0.5em} and proper indentation
+            marriage_line = process_text(section.text)
+            output.write(f"\\marriage{{{marriage_line}}}\n\n")
+            
+            if section.child_heading:
+                # Add extra newline for spacing
+                output.write("\n")
+                output.write(f"{section.child_heading}\n\n")
+                render_children(section.children, output)
+
+def render_entry(person_id, entry_content, output):
+    """Write the LaTeX for a single person entry to output."""
+    render_person(parse_entry(person_id, entry_content), output)
+
+def convert_lines(lines, output, jobs=1, batch_size=JOBS_BATCH_SIZE, cache=None):
+    """Convert report lines held in memory and write the LaTeX to output."""
+    has_anchors, entries = split_report(lines)
+    if not has_anchors:
+        print("No anchor patterns found in input file. Processing by person entries...")
+    
+    entries = list(entries)
+    
+    # Generate output
+    write_entries(entries, output, jobs, batch_size, cache)
+
+def read_report(input_file, store=None):
+    """
+    Read a whole report and return its lines.
+    
+    With a TextStore, repeated lines share one string, and the report is
+    read in blocks so it is never held as a single string next to its lines
+    either.
+    """
+    with compressed_io.open_file(input_file) as f:
+        if store is not None:
+            return _read_interned_lines(f, store)
+        content = f.read()
+    return content.split('\n')
+
+def _read_interned_lines(stream, store):
+    """Split a text stream on newlines like str.split('\n'), interning each line, one block at a time."""
+    lines = []
+    partial = ''
+    while True:
+        block = stream.read(READ_BLOCK_SIZE)
+        if not block:
+            break
+        parts = (partial + block).split('\n')
+        partial = parts.pop()
+        store.intern_into(parts, lines)
+    lines.append(store.intern(partial))
+    return lines
+
+def convert_file(input_file, output_file, jobs=1, batch_size=JOBS_BATCH_SIZE, cache=None, store=None,
+                 shard_limits=None):
+    """
+    Convert a report by loading it fully into memory before rendering.
+    
+    With a TextStore, repeated lines share one string while the report is
+    read, and the entries are then segmented and rendered lazily from those
+    shared lines instead of being collected into a second, undeduplicated
+    copy of the report first.
+    """
+    lines = read_report(input_file, store)
+    if store is None:
+        with open_output(output_file, shard_limits) as output:
+            convert_lines(lines, output, jobs, batch_size, cache)
+        return
+    store.clear()
+    
+    has_anchors, entries = split_report(lines)
+    if not has_anchors:
+        print("No anchor patterns found in input file. Processing by person entries...")
+    with open_output(output_file, shard_limits) as output:
+        write_entries(entries, output, jobs, batch_size, cache)
+
+def convert_file_streaming(input_file, output_file, jobs=1, batch_size=JOBS_BATCH_SIZE, cache=None,
+                           shard_limits=None):
+    """
+    Convert a report one entry at a time.
+
+    Lines are read lazily and each entry is rendered and written before the
+    next one is read, so peak memory depends on the largest single entry
+    rather than on the size of the input file.
+    """
+    with compressed_io.open_file(input_file) as f:
+        has_anchors, entries = split_report(f)
+        if not has_anchors:
+            print("No anchor patterns found in input file. Processing by person entries...")
+        
+        with open_output(output_file, shard_limits) as output:
+            write_entries(entries, output, jobs, batch_size, cache)
+
+# Bump when parse_entry() or the records change what they capture.  Unlike the
+# render cache this does not key on the converter's source, so a parsed cache
+# stays valid while the rendering code (macros, spacing) is being changed.
+PARSED_CACHE_VERSION = "2"
+
+# Person records written per marshal block of the parsed cache
+PARSED_CACHE_BATCH = 1000
+
+# The last bytes of a complete parsed cache: this marker and the record
+# count (8 bytes, little-endian), written after the final block
+PARSED_CACHE_END = b"\0parsed-cache-end"
+
+def _parsed_cache_stamp(input_file):
+    """Header identifying the report (and parser) a parsed cache was built from."""
+    stat = os.stat(input_file)
+    # marshal's format can change between Python versions
+    return {'version': PARSED_CACHE_VERSION, 'python': tuple(sys.version_info[:2]),
+            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def read_parsed_cache(cache_file, input_file):
+    """
+    Return an iterator over the PersonRecords cached for input_file, or None
+    if cache_file is missing, unreadable, cut short (it has no end marker) or
+    was built from another version of the report.
+    
+    The iterator raises EOFError if the records turn out not to match the
+    count in the end marker, so a damaged cache is never taken for a report
+    that simply ends there.
+    """
+    try:
+        f = open(cache_file, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        header = marshal.load(f)
+        records_start = f.tell()
+        records_end = f.seek(-len(PARSED_CACHE_END) - 8, os.SEEK_END)
+        trailer = f.read()
+        f.seek(records_start)
+    except (EOFError, ValueError, TypeError, OSError):
+        header = trailer = None
+    if (header != _parsed_cache_stamp(input_file) or records_end < records_start
+            or not trailer.startswith(PARSED_CACHE_END)):
+        f.close()
+        return None
+    expected = int.from_bytes(trailer[len(PARSED_CACHE_END):], 'little')
+    
+    def iter_records():
+        count = 0
+        with f:
+            while f.tell() < records_end:
+                try:
+                    block = marshal.load(f)
+                except (EOFError, ValueError, TypeError) as e:
+                    raise EOFError(f"Parsed cache {cache_file} is damaged after {count} records: {e}")
+                count += len(block)
+                for data in block:
+                    yield PersonRecord.from_tuple(data)
+        if count != expected:
+            raise EOFError(f"Parsed cache {cache_file} holds {count} of its {expected} records")
+    
+    return iter_records()
+
+def iter_parsed(entries, cache_file=None, input_file=None, store=None):
+    """
+    Parse (person_id, entry_content) pairs and yield (person_id, PersonRecord).
+    
+    With a cache_file, the records are also written to it as they go.  The
+    cache is written to a temporary file and only replaces cache_file once
+    every entry has been parsed, so an interrupted run never leaves a partial
+    cache behind.  With a TextStore, repeated text is shared between records;
+    marshal writes a shared string once per block, so the cache gets smaller
+    too.  The store is cleared after each block to keep its table bounded.
+    """
+    if cache_file is None:
+        for person_id, entry_content in entries:
+            yield person_id, parse_entry(person_id, entry_content, store)
+        return
+    
+    temp_file = cache_file + ".tmp"
+    complete = False
+    try:
+        with open(temp_file, 'wb') as f:
+            marshal.dump(_parsed_cache_stamp(input_file), f)
+            block = []
+            count = 0
+            for person_id, entry_content in entries:
+                person = parse_entry(person_id, entry_content, store)
+                block.append(person.as_tuple())
+                count += 1
+                if len(block) >= PARSED_CACHE_BATCH:
+                    marshal.dump(block, f)
+                    block = []
+                    if store is not None:
+                        store.clear()
+                yield person_id, person
+            if block:
+                marshal.dump(block, f)
+            f.write(PARSED_CACHE_END + count.to_bytes(8, 'little'))
+        os.replace(temp_file, cache_file)
+        complete = True
+    finally:
+        if not complete and os.path.exists(temp_file):
+            os.remove(temp_file)
+
+def convert_parsed(input_file, output_file, cache_file, jobs=1, batch_size=JOBS_BATCH_SIZE, store=None,
+                   shard_limits=None):
+    """
+    Convert a report through a parsed cache.
+    
+    If cache_file holds the parsed entries of this exact report, they are
+    rendered directly and the report is not read at all.  Otherwise the report
+    is parsed and rendered in one streaming pass that also (re)writes the
+    cache for the next run.
+    """
+    records = read_parsed_cache(cache_file, input_file)
+    if records is not None:
+        print(f"Rendering from parsed cache {cache_file}")
+        try:
+            with open_output(output_file, shard_limits) as output:
+                entries = ((person.person_id, person) for person in records)
+                write_entries(entries, output, jobs, batch_size, render=render_record_text)
+            return
+        except EOFError as e:
+            # The output is rewritten from the report below
+            print(f"Warning: {e}; re-parsing the report")
+    elif os.path.exists(cache_file):
+        print(f"Parsed cache {cache_file} is out of date or incomplete; re-parsing the report")
+    
+    with compressed_io.open_file(input_file) as f:
+        has_anchors, entries = split_report(f)
+        if not has_anchors:
+            print("No anchor patterns found in input file. Processing by person entries...")
+        
+        with open_output(output_file, shard_limits) as output:
+            write_entries(iter_parsed(entries, cache_file, input_file, store), output, jobs, batch_size,
+                          render=render_record_text)
+    print(f"Saved parsed cache {cache_file}")
+
+def instrument_stages(profiler):
+    """
+    Time the conversion stages for --profile by swapping in timing wrappers.
+
+    The wrappers are removed again when the profiler exits, so a normal run
+    executes none of this.
+    """
+    module = sys.modules[__name__]
+    for attr, stage in (('read_report', 'reading'), ('detect_format', 'segmentation'),
+                        ('parse_main_line', 'name/suffix parsing'), ('parse_name_suffix', 'name/suffix parsing'),
+                        ('classify_line', 'line classification'), ('process_text', 'process_text'),
+                        ('parse_entry', 'parsing'), ('parse_child_entries', 'child entries'),
+                        ('render_children', 'child entries'), ('share_repeated_lines', 'macros')):
+        profiler.patch(module, attr, profiler.timed(stage, getattr(module, attr)))
+    for attr, stage in (('iter_lines', 'reading'), ('iter_segments', 'segmentation')):
+        profiler.patch(module, attr, profiler.timed_generator(stage, getattr(module, attr)))
+    profiler.patch(anchor_index, 'read_entries', profiler.timed_generator('reading', anchor_index.read_entries))
+    
+    # Rendering is timed per person ID so the slowest entries can be listed
+    profiler.patch(module, 'render_entry', profiler.timed('rendering', render_entry, label=lambda args: args[0]))
+    profiler.patch(module, 'render_record_text', profiler.timed('rendering', render_record_text, label=lambda args: args[0]))
+    
+    original_write_entries = write_entries
+    def timed_write_entries(entries, output, *args, **kwargs):
+        return original_write_entries(entries, profiler.writer('writing', output), *args, **kwargs)
+    profiler.patch(module, 'write_entries', timed_write_entries)
+
+# Directions a subtree can be walked from its root person
+SUBTREE_DIRECTIONS = ('descendants', 'ancestors', 'both')
+
+def _person_links(text):
+    """Return the person IDs linked from text, in order."""
+    person_ids = []
+    if '](' in text:
+        for match in LINK_PATTERN.finditer(text):
+            person_id = person_link_id(match.group(2))
+            if person_id:
+                person_ids.append(person_id)
+    return person_ids
+
+def entry_links(entry_content):
+    """
+    Return the (parents, children, spouses) person IDs linked from one entry.
+
+    Links on the main line are the person's parents ("son of [A](#i1) and
+    [B](#i2)"), the first link on each line of a child list is a child and
+    links on marriage lines are spouses.  Links in notes and biographies are
+    mentions rather than family relations and are ignored.
+    """
+    lines = entry_content.split('\n')
+    parents = _person_links(lines[0])
+    children = []
+    spouses = []
+    in_child_list = False
+    
+    for line in lines[1:]:
+        line = classify_line(line)
+        if line.kind == LINE_BLANK:
+            continue
+        if line.kind == LINE_CHILD_HEADING:
+            in_child_list = True
+        elif line.kind == LINE_NOTES_HEADER or line.kind == LINE_BIO_HEADER:
+            in_child_list = False
+        elif line.married:
+            # A marriage line ends the child list, as in process_child_entries()
+            in_child_list = False
+            spouses.extend(_person_links(line.text))
+        elif in_child_list:
+            links = _person_links(line.text)
+            if links:
+                children.append(links[0])
+    
+    return parents, children, spouses
+
+class FamilyGraph:
+    """
+    Parent, child and spouse links between the people of a report.
+
+    Every link is recorded in both directions, so a child that only names its
+    parent on its own main line is still found as that parent's descendant.
+    """
+
+    def __init__(self):
+        self.people = set()
+        self.parents = {}
+        self.children = {}
+        self.spouses = {}
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Build the graph in one pass over (person_id, entry_content) pairs."""
+        graph = cls()
+        for person_id, entry_content in entries:
+            graph.add_entry(person_id, entry_content)
+        return graph
+
+    def add_entry(self, person_id, entry_content):
+        self.people.add(person_id)
+        parents, children, spouses = entry_links(entry_content)
+        for parent_id in parents:
+            self.parents.setdefault(person_id, set()).add(parent_id)
+            self.children.setdefault(parent_id, set()).add(person_id)
+        for child_id in children:
+            self.children.setdefault(person_id, set()).add(child_id)
+            self.parents.setdefault(child_id, set()).add(person_id)
+        for spouse_id in spouses:
+            self.spouses.setdefault(person_id, set()).add(spouse_id)
+            self.spouses.setdefault(spouse_id, set()).add(person_id)
+
+    @staticmethod
+    def _walk(relation, root, depth):
+        """Breadth-first walk of one relation from root, at most depth steps (None for no limit)."""
+        reached = {root}
+        frontier = [root]
+        generation = 0
+        while frontier and (depth is None or generation < depth):
+            next_frontier = []
+            for person_id in frontier:
+                for other_id in relation.get(person_id, ()):
+                    if other_id not in reached:
+                        reached.add(other_id)
+                        next_frontier.append(other_id)
+            frontier = next_frontier
+            generation += 1
+        return reached
+
+    def walk(self, root, depth=None, direction='descendants', include_spouses=False):
+        """
+        Return the IDs of the people reachable from root, root included.
+
+        direction is one of SUBTREE_DIRECTIONS; "both" is the union of the
+        descendants and the ancestors, not every relative.  With
+        include_spouses, the spouses of everyone reached are added too.
+        """
+        reached = set()
+        if direction in ('descendants', 'both'):
+            reached |= self._walk(self.children, root, depth)
+        if direction in ('ancestors', 'both'):
+            reached |= self._walk(self.parents, root, depth)
+        if include_spouses:
+            for person_id in list(reached):
+                reached.update(self.spouses.get(person_id, ()))
+        return reached
+
+def convert_subtree(input_file, output_file, root, depth=None, direction='descendants', include_spouses=False,
+                    jobs=1, batch_size=JOBS_BATCH_SIZE, cache=None, shard_limits=None):
+    """
+    Convert only the people linked to root as descendants and/or ancestors.
+
+    The first pass over the report builds the link graph and keeps nothing
+    but the links; the second renders the reachable entries in report order,
+    exactly as they appear in a full conversion.
+
+    Returns:
+        bool: True if successful, False if root has no entry in the report
+    """
+    with compressed_io.open_file(input_file) as f:
+        has_anchors, lines = detect_format(iter_lines(f))
+        if not has_anchors:
+            print("No anchor patterns found in input file. Processing by person entries...")
+        graph = FamilyGraph.from_entries(iter_entries(lines, has_anchors))
+        
+        if root not in graph.people:
+            print(f"Error: Person ID {root} not found in '{input_file}'")
+            return False
+        
+        selected = graph.walk(root, depth, direction, include_spouses)
+        
+        f.seek(0)
+        entries = (entry for entry in iter_entries(iter_lines(f), has_anchors) if entry[0] in selected)
+        with open_output(output_file, shard_limits) as output:
+            write_entries(entries, output, jobs, batch_size, cache)
+    
+    relatives = "descendants and ancestors" if direction == 'both' else direction
+    print(f"Selected {len(selected & graph.people)} of {len(graph.people)} people ({relatives} of {root})")
+    return True
+
+# Problems of each kind listed in full by --check before summarising the rest
+CHECK_REPORT_LIMIT = 20
+
+def _child_entries_end(start_idx, lines):
+    """Return the index where process_child_entries() stops, without rendering anything."""
+    k = start_idx
+    while k < len(lines):
+        line = lines[k]
+        if line.kind != LINE_BLANK and (line.text == "General Notes:" or line.text == "Biography:" or
+                                        (line.married and "married" in line.text)):
+            break
+        k += 1
+    return k
+
+def unrendered_lines(lines):
+    """
+    Return the indices of the non-blank classified entry lines that render_entry() never writes.
+
+    Walks the same section state machine as render_entry() without producing
+    any output, so text that would silently vanish from the book (stray
+    lines between sections, child lists without a marriage line, all but the
+    last marriage line inside General Notes) can be reported cheaply.
+    """
+    n = len(lines)
+    if n == 0:
+        return []
+    rendered = [False] * n
+    rendered[0] = True
+    
+    entry_number, name, additional_info = parse_main_line(lines[0].text)
+    first_name = name.split()[0] if name else ""
+    name_lower = name.lower()
+    first_name_lower = first_name.lower()
+    
+    def render_children(heading_idx):
+        rendered[heading_idx] = True
+        k = _child_entries_end(heading_idx + 1, lines)
+        for child_idx in range(heading_idx + 1, k):
+            rendered[child_idx] = True
+        return k
+    
+    i = 1
+    while i < n:
+        line = lines[i]
+        
+        if line.kind == LINE_NOTES_HEADER:
+            rendered[i] = True
+            j = i + 1
+            marriage_in_notes = None
+            child_heading_in_notes = False
+            while j < n:
+                current = lines[j]
+                if current.kind == LINE_BIO_HEADER:
+                    break
+                if current.married and (current.lower.startswith(name_lower) or current.lower.startswith(first_name_lower)):
+                    # Only the last marriage line of the notes is written
+                    marriage_in_notes = j
+                    next_j = j + 1
+                    while next_j < n and lines[next_j].kind == LINE_BLANK:
+                        next_j += 1
+                    if next_j < n and lines[next_j].child_heading:
+                        child_heading_in_notes = True
+                        j = next_j
+                        break
+                    j += 1
                     continue
-                
+                if current.child_heading:
+                    child_heading_in_notes = True
+                    break
+                rendered[j] = True
+                j += 1
+            
+            if marriage_in_notes is not None:
+                rendered[marriage_in_notes] = True
+            if child_heading_in_notes:
+                i = render_children(j)
+                continue
+            i = j
+            continue
+        
+        if line.kind == LINE_BIO_HEADER:
+            rendered[i] = True
+            if line.text == "Biography:":
+                j = i + 1
+                while j < n:
+                    current_line = lines[j].text
+                    if current_line.startswith("married") or current_line in BIO_END_LINES:
+                        break
+                    rendered[j] = True
+                    j += 1
+                i = j
+            else:
                 i += 1
+            continue
+        
+        if line.married or (line.text and (line.text.startswith(first_name) or line.text.startswith(name))):
+            rendered[i] = True
+            j = i + 1
+            while j < n:
+                if lines[j].child_heading:
+                    render_children(j)
+                    break
+                j += 1
+            # Like render_entry(), resume at the child heading (or the next line if none was found)
+            if j >= n:
+                i += 1
+            else:
+                i = j
+            continue
+        
+        i += 1
+    
+    return [idx for idx in range(n) if not rendered[idx] and lines[idx].kind != LINE_BLANK]
+
+def _print_problems(symbol, title, problems):
+    """Print a numbered problem category, listing at most CHECK_REPORT_LIMIT items."""
+    if not problems:
+        return
+    print(f"{symbol} {len(problems)} {title}:")
+    for problem in problems[:CHECK_REPORT_LIMIT]:
+        print(f"    {problem}")
+    if len(problems) > CHECK_REPORT_LIMIT:
+        print(f"    ... and {len(problems) - CHECK_REPORT_LIMIT} more")
+
+def check_file(input_file):
+    """
+    Validate a report in one streaming pass without rendering it.
+
+    Collects the entry IDs that become hyperlink targets and every person
+    link the renderer would write, then reports dangling links, duplicate
+    and malformed anchors, and lines that would not appear in the output.
+
+    Returns:
+        bool: True if the report is safe to compile (unrendered lines are only warnings)
+    """
+    entry_counts = {}
+    link_targets = {}  # person ID -> [number of links, first entry linking to it]
+    malformed = []
+    unrendered = []
+    
+    def watch_anchor_lines(lines):
+        for line_number, line in enumerate(lines, 1):
+            if '##ANCHOR:i' in line:
+                stripped = line.strip()
+                if stripped.startswith('##ANCHOR:i') and not ANCHOR_PATTERN.search(stripped):
+                    malformed.append(f"line {line_number}: '{stripped}'")
+            yield line
+    
+    with compressed_io.open_file(input_file) as f:
+        has_anchors, lines = detect_format(watch_anchor_lines(iter_lines(f)))
+        if not has_anchors:
+            print("No anchor patterns found in input file. Processing by person entries...")
+        
+        if has_anchors:
+            entries = iter_anchor_entries(lines, warn=False)
+        else:
+            entries = iter_person_entries(lines)
+        
+        for person_id, entry_content in entries:
+            entry_counts[person_id] = entry_counts.get(person_id, 0) + 1
+            
+            lines = [classify_line(line) for line in entry_content.split('\n')]
+            dropped = unrendered_lines(lines)
+            for idx in dropped:
+                # Generation headers inside anchored entries are dropped on purpose
+                if not GENERATION_PATTERN.match(lines[idx].text):
+                    unrendered.append(f"entry i{person_id}: '{lines[idx].text[:80]}'")
+            dropped = set(dropped)
             
-            # Add divider line for all except the last entry
-            if entry_idx < len(entries) - 1:
-                output.write("\\dividerline\n\n")
+            for idx, line in enumerate(lines):
+                if idx in dropped or '](' not in line.text:
+                    continue
+                for match in LINK_PATTERN.finditer(line.text):
+                    target = person_link_id(match.group(2))
+                    if target is None:
+                        continue
+                    stats = link_targets.get(target)
+                    if stats is None:
+                        link_targets[target] = [1, person_id]
+                    else:
+                        stats[0] += 1
+    
+    dangling = [f"#i{target}: {count} link(s), first in entry i{first_entry}"
+                for target, (count, first_entry) in link_targets.items() if target not in entry_counts]
+    duplicates = [f"i{person_id}: {count} entries" for person_id, count in entry_counts.items() if count > 1]
+    link_count = sum(count for count, first_entry in link_targets.values())
+    
+    print(f"Checked {input_file}: {sum(entry_counts.values())} entries, {link_count} person links")
+    _print_problems("❌", "dangling person links (no entry with that ID)", dangling)
+    _print_problems("❌", "duplicate anchors", duplicates)
+    _print_problems("❌", "malformed anchors", malformed)
+    _print_problems("⚠️", "lines that would not be rendered", unrendered)
+    
+    return not (dangling or duplicates or malformed)
+
+def parse_id_list(text):
+    """Parse "12,40 i7" into ['12', '40', '7']."""
+    person_ids = []
+    for item in re.split(r'[,\s]+', text.strip()):
+        if item:
+            person_id = item[1:] if item[:1] in ('i', 'I') else item
+            if not person_id.isdigit():
+                raise argparse.ArgumentTypeError(f"invalid person ID '{item}'")
+            person_ids.append(person_id)
+    return person_ids
+
+def parse_id_range(text):
+    """Parse "100-150" into the inclusive range (100, 150)."""
+    match = re.match(r'^\s*i?(\d+)\s*-\s*i?(\d+)\s*$', text, re.IGNORECASE)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid ID range '{text}', expected FIRST-LAST")
+    first, last = int(match.group(1)), int(match.group(2))
+    if first > last:
+        raise argparse.ArgumentTypeError(f"invalid ID range '{text}', FIRST is larger than LAST")
+    return first, last
+
+def _convert_selection_scan(input_file, output_file, person_ids, id_range, jobs, batch_size, cache, shard_limits):
+    """convert_selection() for reports without random access: read every entry and keep the selected ones."""
+    wanted = set(person_ids)
+    found = set()
+    counts = {'selected': 0, 'total': 0}
+    
+    def selected_entries(entries):
+        for person_id, entry_content in entries:
+            counts['total'] += 1
+            if person_id in wanted or (id_range is not None and id_range[0] <= int(person_id) <= id_range[1]):
+                found.add(person_id)
+                counts['selected'] += 1
+                yield person_id, entry_content
+    
+    with compressed_io.open_file(input_file) as f:
+        has_anchors, entries = split_report(f)
+        if not has_anchors:
+            print(f"Error: No anchored entries in '{input_file}'; --ids and --range need ##ANCHOR:iNNN## markers")
+            return False
+        with open_output(output_file, shard_limits) as output:
+            write_entries(selected_entries(entries), output, jobs, batch_size, cache)
+    
+    for person_id in person_ids:
+        if person_id not in found:
+            print(f"Warning: Person ID {person_id} not found in '{input_file}'")
+    print(f"Selected {counts['selected']} of {counts['total']} entries")
+    return True
+
+def convert_selection(input_file, output_file, person_ids=(), id_range=None, index_file=None,
+                      jobs=1, batch_size=JOBS_BATCH_SIZE, cache=None, shard_limits=None):
+    """
+    Convert only the selected people, seeking straight to their entries through the anchor index.
+
+    The sidecar index is built on first use and rebuilt whenever the report
+    changes.  Entries are written in file order, exactly as they appear in a
+    full conversion.
+
+    Returns:
+        bool: True if successful, False if the report has no anchored entries
+    """
+    if compressed_io.is_compressed(input_file):
+        # Index offsets point into the file, so a compressed report is scanned instead
+        print("Note: compressed report, scanning it instead of using the anchor index")
+        return _convert_selection_scan(input_file, output_file, person_ids, id_range, jobs, batch_size, cache,
+                                       shard_limits)
+    
+    index, rebuilt = anchor_index.open_index(input_file, index_file)
+    try:
+        total = len(index)
+        if rebuilt:
+            print(f"Indexed {total} entries in {index.path}")
+        if total == 0:
+            print(f"Error: No anchored entries in '{input_file}'; --ids and --range need ##ANCHOR:iNNN## markers")
+            return False
+        rows = index.lookup(person_ids, id_range)
+    finally:
+        index.close()
+    
+    found = set(person_id for person_id, offset, length in rows)
+    for person_id in person_ids:
+        if person_id not in found:
+            print(f"Warning: Person ID {person_id} not found in '{input_file}'")
+    
+    with open_output(output_file, shard_limits) as output:
+        write_entries(anchor_index.read_entries(input_file, rows), output, jobs, batch_size, cache)
+    
+    print(f"Selected {len(rows)} of {total} entries")
+    return True
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(
+        description='Convert a genealogy text report to LaTeX',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python generate_tex.py input.txt output.tex
+  python generate_tex.py "Ancestors_Report.txt" output.tex --stream
+  python generate_tex.py "Ancestors_Report.txt" output.tex --jobs 8
+  python generate_tex.py "Ancestors_Report.txt" output.tex --cache report.cache
+  python generate_tex.py "Ancestors_Report.txt" output.tex --parsed-cache report.parsed
+  python generate_tex.py "Ancestors_Report.txt" preview.tex --ids 12,40,107 --range 500-549
+  python generate_tex.py "Ancestors_Report.txt" branch.tex --root 12 --depth 3 --spouses
+  python generate_tex.py "Ancestors_Report.txt" book.tex --shard-size 5MB
+  python generate_tex.py "Ancestors_Report.txt" output.tex --macros
+  python generate_tex.py "Ancestors_Report.txt" --check
+  python generate_tex.py "Ancestors_Report.txt" output.tex --profile --cprofile convert.prof
+        """
+    )
+    
+    parser.add_argument('input_file', help='Path to input text file')
+    parser.add_argument('output_file', nargs='?', help='Path to output .tex file (not needed with --check)')
+    parser.add_argument('--check', action='store_true',
+                       help='Validate anchors and person links without rendering, and exit non-zero on problems')
+    parser.add_argument('--stream', action='store_true',
+                       help='Read and render one entry at a time to keep memory bounded on very large reports')
+    parser.add_argument('--dedup', action='store_true',
+                       help='Share one copy of repeated lines and parsed text to cut memory, and report the bytes saved')
+    parser.add_argument('--escape-cache-size', type=int, default=ESCAPE_CACHE_SIZE,
+                       help=f'Strings remembered by the LaTeX/URL escape caches, 0 to disable (default: {ESCAPE_CACHE_SIZE})')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                       help='Worker processes used to render entries (default: 1)')
+    parser.add_argument('--batch-size', type=int, default=JOBS_BATCH_SIZE,
+                       help=f'Entries sent to a worker at a time with --jobs (default: {JOBS_BATCH_SIZE})')
+    parser.add_argument('--cache', metavar='PATH', default=None,
+                       help='SQLite file of rendered entries; unchanged entries are reused on the next run')
+    parser.add_argument('--parsed-cache', metavar='PATH', default=None,
+                       help='Binary file of parsed entries; later runs on the same report render from it without reparsing')
+    parser.add_argument('--ids', type=parse_id_list, default=None,
+                       help='Convert only these person IDs, e.g. "12,40,107" (uses the anchor index)')
+    parser.add_argument('--range', dest='id_range', metavar='FIRST-LAST', type=parse_id_range, default=None,
+                       help='Convert only person IDs in this inclusive range, e.g. "500-549" (uses the anchor index)')
+    parser.add_argument('--index', metavar='PATH', default=None,
+                       help='Anchor index used by --ids/--range (default: <input_file>.idx)')
+    parser.add_argument('--shard-size', metavar='SIZE', type=parse_size, default=None,
+                       help='Split the output into numbered shards of at most SIZE (e.g. 800k, 5MB) plus a master file')
+    parser.add_argument('--shard-entries', metavar='N', type=int, default=None,
+                       help='Split the output into numbered shards of at most N entries plus a master file')
+    parser.add_argument('--macros', action='store_true',
+                       help='Define long lines that repeat (notes, Biography URLs) once as macros in <output>_macros.tex, and report the bytes saved')
+    parser.add_argument('--macro-length', metavar='N', type=int, default=MACRO_MIN_LENGTH,
+                       help=f'Shortest line shared by --macros, in characters (default: {MACRO_MIN_LENGTH})')
+    parser.add_argument('--root', type=parse_id_list, default=None,
+                       help='Convert only the branch linked to this person ID')
+    parser.add_argument('--depth', type=int, default=None,
+                       help='Generations to follow from --root (default: no limit)')
+    parser.add_argument('--direction', choices=SUBTREE_DIRECTIONS, default='descendants',
+                       help='Follow --root\'s descendants, ancestors or both (default: descendants)')
+    parser.add_argument('--spouses', action='store_true',
+                       help='Also include the spouses of everyone in the --root branch')
+    profiling.add_arguments(parser)
+    
+    args = parser.parse_args()
+    
+    if args.output_file is None and not args.check:
+        parser.error("the following arguments are required: output_file")
+    
+    if args.root is not None:
+        if len(args.root) != 1:
+            parser.error("--root takes a single person ID")
+        if args.ids is not None or args.id_range is not None:
+            parser.error("--root cannot be combined with --ids or --range")
+    
+    if args.parsed_cache:
+        if args.root is not None or args.ids is not None or args.id_range is not None:
+            parser.error("--parsed-cache converts the whole report and cannot be combined with --root, --ids or --range")
+        if args.cache:
+            parser.error("--parsed-cache cannot be combined with --cache")
+    
+    shard_limits = None
+    if args.shard_size is not None or args.shard_entries is not None:
+        if args.shard_entries is not None and args.shard_entries < 1:
+            parser.error("--shard-entries must be at least 1")
+        if args.output_file and compressed_io.compression_from_name(args.output_file):
+            parser.error("--shard-size and --shard-entries write plain .tex shards; drop the compressed extension")
+        shard_limits = (args.shard_size, args.shard_entries)
+    
+    if args.dedup:
+        # --parsed-cache takes precedence over --stream and is itself rejected with --root, --ids and --range
+        if (args.stream and not args.parsed_cache) or args.root is not None or args.ids is not None or args.id_range is not None:
+            parser.error("--dedup shares the text of a whole report held in memory; "
+                         "it cannot be combined with --stream, --root, --ids or --range")
+    
+    if args.macros:
+        if args.macro_length < 1:
+            parser.error("--macro-length must be at least 1")
+        if args.output_file and compressed_io.compression_from_name(args.output_file):
+            parser.error("--macros rewrites the plain .tex output; drop the compressed extension")
+    
+    input_file = args.input_file
+    output_file = args.output_file
+    
+    if not os.path.exists(input_file):
+        print(f"Error: Input file '{input_file}' not found")
+        sys.exit(1)
+    
+    if args.check:
+        if check_file(input_file):
+            print("✅ No problems found - ready to compile")
+            sys.exit(0)
+        print("❌ Fix the problems above before compiling")
+        sys.exit(1)
+    
+    set_escape_cache_size(args.escape_cache_size)
+    
+    cache = RenderCache(args.cache) if args.cache else None
+    store = TextStore() if args.dedup else None
+    
+    profiler = None
+    if args.profile:
+        if args.jobs > 1:
+            print("Note: --profile renders in this process, ignoring --jobs")
+            args.jobs = 1
+        profiler = profiling.Profiler(args.profile_top)
+        instrument_stages(profiler)
+    
+    try:
+        with profiler or contextlib.nullcontext(), profiling.dumps(args.cprofile, args.tracemalloc):
+            success = run_conversion(args, cache, store, shard_limits)
+            if success and args.macros:
+                macros = share_repeated_lines(output_file, shard_limits is not None, args.macro_length)
+    finally:
+        if cache is not None:
+            cache.close()
+    
+    if profiler is not None:
+        profiler.report()
+    
+    if not success:
+        sys.exit(1)
+    
+    if cache is not None:
+        print(f"Render cache: {cache.hits} hits, {cache.misses} misses ({args.cache})")
+    
+    if store is not None:
+        print(store.summary())
+    
+    if args.macros:
+        print(macros_summary(macros, args.macro_length))
     
     print(f"Successfully converted {input_file} to {output_file}")
 
+def run_conversion(args, cache, store=None, shard_limits=None):
+    """Run the conversion selected on the command line; return True if it succeeded."""
+    if args.root is not None:
+        return convert_subtree(args.input_file, args.output_file, args.root[0], args.depth, args.direction,
+                               args.spouses, args.jobs, args.batch_size, cache, shard_limits)
+    if args.ids is not None or args.id_range is not None:
+        return convert_selection(args.input_file, args.output_file, args.ids or (), args.id_range, args.index,
+                                 args.jobs, args.batch_size, cache, shard_limits)
+    if args.parsed_cache:
+        convert_parsed(args.input_file, args.output_file, args.parsed_cache, args.jobs, args.batch_size, store,
+                       shard_limits)
+    elif args.stream:
+        convert_file_streaming(args.input_file, args.output_file, args.jobs, args.batch_size, cache, shard_limits)
+    else:
+        convert_file(args.input_file, args.output_file, args.jobs, args.batch_size, cache, store, shard_limits)
+    return True
+
 if __name__ == "__main__":
     main() 
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Report Merger - Combines overlapping genealogy reports into one, keeping every person once
+"""
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+
+import generate_tex
+import compressed_io
+
+# Conflicting people listed in the summary; --conflicts records all of them
+CONFLICT_REPORT_LIMIT = 20
+
+# Numbering that belongs to a report rather than to the person: the entry
+# number on the main line ("12. ") and the cross-reference on child lines ("(12) ")
+ENTRY_NUMBER_PATTERN = re.compile(r'^\d+\.\s+')
+CHILD_REFERENCE_PATTERN = re.compile(r'^\(\d+\)\s+')
+
+def strip_generation_headers(entry_content):
+    """Drop the generation headers (and blank lines) that end an entry; they belong to the report's layout."""
+    lines = entry_content.split('\n')
+    while len(lines) > 1 and (not lines[-1].strip() or generate_tex.GENERATION_PATTERN.match(lines[-1].strip())):
+        lines.pop()
+    return '\n'.join(lines)
+
+def person_digest(entry_content):
+    """
+    Return the SHA-256 of an entry as the same person would appear in any report.
+
+    Entry numbers, child cross-references and surrounding whitespace differ
+    between the reports of siblings or cousins without the person differing,
+    so they are left out.
+    """
+    lines = [line.strip() for line in entry_content.split('\n')]
+    lines[0] = ENTRY_NUMBER_PATTERN.sub('', lines[0], count=1)
+    digest = hashlib.sha256()
+    for line in lines:
+        digest.update(CHILD_REFERENCE_PATTERN.sub('', line, count=1).encode('utf-8'))
+        digest.update(b'\n')
+    return digest.digest()
+
+class MergeIndex:
+    """
+    Index of the people merged so far, by person ID and content digest.
+
+    The first entry seen for a person ID is kept.  A later entry with the
+    same digest is a duplicate and is skipped; one with a different digest is
+    a conflicting variant, skipped too but recorded with the input it came
+    from.  Only a digest and an input number are held per person, so reports
+    of any size can be merged.
+    """
+
+    def __init__(self, input_files):
+        self.input_files = input_files
+        self.entries = 0
+        self.duplicates = 0
+        self._people = {}  # person ID -> (digest, input number) of the kept entry
+        self.conflicts = {}  # person ID -> [(digest, input number)] of every distinct variant, kept one first
+
+    def add(self, person_id, entry_content, input_number):
+        """Record an entry; return True if it is the first entry for person_id and should be kept."""
+        self.entries += 1
+        digest = person_digest(entry_content)
+        kept = self._people.get(person_id)
+        if kept is None:
+            self._people[person_id] = (digest, input_number)
+            return True
+        if digest == kept[0]:
+            self.duplicates += 1
+            return False
+        variants = self.conflicts.setdefault(person_id, [kept])
+        if all(digest != variant_digest for variant_digest, variant_input in variants):
+            variants.append((digest, input_number))
+        return False
+
+    def __len__(self):
+        return len(self._people)
+
+    def describe_conflict(self, person_id):
+        names = [os.path.basename(self.input_files[input_number]) for digest, input_number in self.conflicts[person_id]]
+        return f"i{person_id}: {len(names)} variants, kept the one from {names[0]} (others from {', '.join(names[1:])})"
+
+    def write_conflicts(self, conflicts_file):
+        """Write one JSON line per conflicting person ID with the input and SHA-256 of each variant, kept one first."""
+        with open(conflicts_file, 'w', encoding='utf-8') as f:
+            for person_id, variants in self.conflicts.items():
+                record = {
+                    'person_id': person_id,
+                    'variants': [{'input': self.input_files[input_number], 'sha256': digest.hex()}
+                                 for digest, input_number in variants],
+                }
+                f.write(json.dumps(record) + "\n")
+
+def merge_reports(input_files, output_file, tex_file=None, conflicts_file=None, jobs=1):
+    """
+    Merge anchored reports into one report (and optionally one .tex file) holding each person once.
+
+    People are written in a stable order: everyone in the first report in its
+    order, then the people found only in the second report in its order, and
+    so on.  Each person's entry is taken from the first report that has it.
+    Inputs are read one entry at a time, and may be compressed.
+
+    Args:
+        input_files (list): Reports with ##ANCHOR:iNNN## markers, in order of preference
+        output_file (str): Merged report (compressed if it ends in .gz, .xz or .bz2)
+        tex_file (str): Also convert the merged entries to this .tex file in the same pass
+        conflicts_file (str): Write every conflicting person ID and its variants here as JSON lines
+        jobs (int): Worker processes used to render entries for tex_file
+
+    Returns:
+        bool: True if successful, False if there were errors
+    """
+    for input_file in input_files:
+        if not os.path.exists(input_file):
+            print(f"Error: Input file '{input_file}' not found!")
+            return False
+        # Person IDs only identify the same person across reports through anchors
+        with compressed_io.open_file(input_file) as f:
+            has_anchors = generate_tex.detect_format(generate_tex.iter_lines(f))[0]
+        if not has_anchors:
+            print(f"Error: No ##ANCHOR:iNNN## markers in '{input_file}'; merging needs person IDs")
+            return False
+
+    index = MergeIndex(input_files)
+
+    def merged_entries(output):
+        names = ', '.join(os.path.basename(input_file) for input_file in input_files)
+        output.write(f"Merged report of {names}\n\n")
+        for input_number, input_file in enumerate(input_files):
+            kept = 0
+            with compressed_io.open_file(input_file) as f:
+                for person_id, entry_content in generate_tex.split_report(f)[1]:
+                    entry_content = strip_generation_headers(entry_content)
+                    if index.add(person_id, entry_content, input_number):
+                        kept += 1
+                        output.write(f"##ANCHOR:i{person_id}##\n{entry_content}\n\n")
+                        yield person_id, entry_content
+            print(f"Merged {input_file}: {kept} new people")
+
+    try:
+        with compressed_io.open_file(output_file, 'w') as output:
+            if tex_file:
+                with generate_tex.open_output(tex_file) as tex_output:
+                    generate_tex.write_entries(merged_entries(output), tex_output, jobs)
+            else:
+                for _ in merged_entries(output):
+                    pass
+    except (IOError, PermissionError, UnicodeDecodeError) as e:
+        print(f"Error: Merging failed: {e}")
+        return False
+
+    print(f"Created {output_file} with {len(index)} people from {index.entries} entries "
+          f"({index.duplicates} duplicates skipped)")
+    if tex_file:
+        print(f"Created {tex_file}")
+
+    if index.conflicts:
+        print(f"⚠️ {len(index.conflicts)} people differ between reports:")
+        for person_id in list(index.conflicts)[:CONFLICT_REPORT_LIMIT]:
+            print(f"    {index.describe_conflict(person_id)}")
+        if len(index.conflicts) > CONFLICT_REPORT_LIMIT:
+            print(f"    ... and {len(index.conflicts) - CONFLICT_REPORT_LIMIT} more")
+    if conflicts_file:
+        index.write_conflicts(conflicts_file)
+        print(f"Created {conflicts_file} listing {len(index.conflicts)} conflicts")
+
+    return True
+
+def main():
+    """Main function with command-line interface."""
+    parser = argparse.ArgumentParser(
+        description='Merge overlapping genealogy reports into one, keeping every person once',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python merge_reports.py "Ancestors_Anna.txt" "Ancestors_Carl.txt" -o family.txt
+  python merge_reports.py a.txt b.txt.gz c.txt -o family.txt --tex family.tex --jobs 4
+  python merge_reports.py a.txt b.txt -o family.txt --conflicts conflicts.jsonl
+        """
+    )
+
+    parser.add_argument('input_files', nargs='+', help='Reports with ##ANCHOR:iNNN## markers, the preferred one first')
+    parser.add_argument('--output', '-o', required=True,
+                       help='Merged report (compressed if it ends in .gz, .xz or .bz2)')
+    parser.add_argument('--tex', metavar='PATH', default=None,
+                       help='Also convert the merged report to this .tex file in the same pass')
+    parser.add_argument('--conflicts', metavar='PATH', default=None,
+                       help='Write every person whose entry differs between reports to PATH as JSON lines')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                       help='Worker processes used to render entries for --tex (default: 1)')
+
+    args = parser.parse_args()
+
+    success = merge_reports(args.input_files, args.output, args.tex, args.conflicts, args.jobs)
+
+    if success:
+        print("\n✅ Merge completed successfully!")
+        sys.exit(0)
+    else:
+        print("\n❌ Merge failed!")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
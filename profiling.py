@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Profiling - Per-stage timings, slowest items and fallback counts behind the --profile option
+"""
+import time
+import heapq
+import cProfile
+import functools
+import contextlib
+import tracemalloc
+from collections import Counter
+
+# Profiler of the run in progress, or None when --profile is off
+active = None
+
+# Sentinel marking an exhausted generator in timed_generator()
+_DONE = object()
+
+def count_fallback(name):
+    """Record that a fallback path fired; a no-op unless a profile is running."""
+    if active is not None:
+        active.fallbacks[name] += 1
+
+class TimedWriter:
+    """Output stream wrapper that records every write() under a stage."""
+
+    def __init__(self, profiler, name, stream):
+        self._write = profiler.timed(name, stream.write)
+        self._stream = stream
+
+    def write(self, text):
+        return self._write(text)
+
+    def __getattr__(self, attr):
+        return getattr(self._stream, attr)
+
+class Profiler:
+    """
+    Wall time and call counts per pipeline stage, the slowest items and fallback counts.
+
+    Stages are measured by temporarily replacing module functions with timing
+    wrappers (see patch() and timed()), so the pipeline carries no timing code
+    of its own and runs at full speed without --profile.  Besides its total
+    time, each stage reports its own time excluding the stages it calls, e.g.
+    the process_text() calls made while rendering an entry.
+    """
+
+    def __init__(self, top=10, item_name='entries'):
+        self.top = top
+        self.item_name = item_name
+        self.stages = {}  # name -> [calls, total seconds, own seconds]
+        self.fallbacks = Counter()
+        self.wall_time = 0.0
+        self._slowest = []  # min-heap of (seconds, label)
+        self._nested = []  # time spent in nested stages, per stage in progress
+        self._patched = []
+        self._start = None
+
+    def _stage(self, name):
+        return self.stages.setdefault(name, [0, 0.0, 0.0])
+
+    def _record(self, stage, elapsed, calls=1):
+        nested = self._nested.pop()
+        stage[0] += calls
+        stage[1] += elapsed
+        stage[2] += elapsed - nested
+        if self._nested:
+            self._nested[-1] += elapsed
+
+    def _keep_slowest(self, elapsed, label):
+        if len(self._slowest) < self.top:
+            heapq.heappush(self._slowest, (elapsed, label))
+        elif elapsed > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, (elapsed, label))
+
+    def timed(self, name, function, label=None):
+        """Return function wrapped to record its calls under stage name; label(args) names its slowest calls."""
+        stage = self._stage(name)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            self._nested.append(0.0)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self._record(stage, elapsed)
+                if label is not None:
+                    self._keep_slowest(elapsed, label(args))
+        return wrapper
+
+    def timed_generator(self, name, function):
+        """Like timed() for a generator function; every item it produces counts as one call."""
+        stage = self._stage(name)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            iterator = iter(function(*args, **kwargs))
+            while True:
+                self._nested.append(0.0)
+                start = time.perf_counter()
+                item = next(iterator, _DONE)
+                self._record(stage, time.perf_counter() - start, 0 if item is _DONE else 1)
+                if item is _DONE:
+                    return
+                yield item
+        return wrapper
+
+    def writer(self, name, stream):
+        """Return stream with its writes recorded under stage name."""
+        return TimedWriter(self, name, stream)
+
+    def patch(self, module, attr, replacement):
+        """Replace module.attr for the duration of the profile."""
+        self._patched.append((module, attr, getattr(module, attr)))
+        setattr(module, attr, replacement)
+
+    def __enter__(self):
+        global active
+        active = self
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        global active
+        self.wall_time = time.perf_counter() - self._start
+        active = None
+        while self._patched:
+            module, attr, original = self._patched.pop()
+            setattr(module, attr, original)
+        return False
+
+    def report(self):
+        """Print stage timings, the slowest items and fallback counts."""
+        wall_time = self.wall_time or 1e-9
+        print(f"\nProfile ({self.wall_time:.3f}s wall time)")
+        print(f"  {'stage':<24}{'calls':>10}{'total s':>10}{'own s':>10}{'own %':>8}")
+        accounted = 0.0
+        for name, (calls, total, own) in sorted(self.stages.items(), key=lambda item: -item[1][2]):
+            if calls == 0 and total == 0.0:
+                continue
+            accounted += own
+            print(f"  {name:<24}{calls:>10}{total:>10.3f}{own:>10.3f}{own / wall_time:>8.1%}")
+        other = max(self.wall_time - accounted, 0.0)
+        print(f"  {'(other)':<24}{'':>10}{'':>10}{other:>10.3f}{other / wall_time:>8.1%}")
+
+        if self._slowest:
+            print(f"\n  Slowest {self.item_name}:")
+            for elapsed, label in sorted(self._slowest, reverse=True):
+                print(f"    {label:<20}{elapsed * 1000:>10.2f} ms")
+
+        print("\n  Fallback paths:")
+        if not self.fallbacks:
+            print("    none taken")
+        for name, count in self.fallbacks.most_common():
+            print(f"    {name:<44}{count:>8}")
+
+@contextlib.contextmanager
+def dumps(cprofile_path=None, tracemalloc_path=None, top=10):
+    """Run the body under cProfile and/or tracemalloc and write their dumps when it finishes."""
+    profile = None
+    if cprofile_path:
+        profile = cProfile.Profile()
+        profile.enable()
+    if tracemalloc_path:
+        tracemalloc.start()
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(cprofile_path)
+            print(f"Wrote cProfile stats to {cprofile_path} (view with: python -m pstats {cprofile_path})")
+        if tracemalloc_path:
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            snapshot.dump(tracemalloc_path)
+            print(f"Wrote tracemalloc snapshot to {tracemalloc_path} (peak {peak / (1024 * 1024):.1f} MB)")
+            for stat in snapshot.statistics('lineno')[:top]:
+                print(f"  {stat}")
+
+def add_arguments(parser):
+    """Add the --profile options shared by the command-line tools."""
+    parser.add_argument('--profile', action='store_true',
+                       help='Report wall time and calls per stage, the slowest items and fallback paths taken')
+    parser.add_argument('--profile-top', type=int, default=10, metavar='N',
+                       help='Slowest items listed by --profile (default: 10)')
+    parser.add_argument('--cprofile', metavar='PATH', default=None,
+                       help='Write cProfile stats of the run to PATH')
+    parser.add_argument('--tracemalloc', metavar='PATH', default=None,
+                       help='Write a tracemalloc snapshot taken at the end of the run to PATH')
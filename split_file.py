@@ -6,9 +6,642 @@ Enhanced with command-line interface and better error handling
 import re
 import os
 import sys
+import json
+import mmap
+import hashlib
 import argparse
+import itertools
+import contextlib
+from array import array
+from bisect import bisect_left, bisect_right
 
-def split_file(input_file, output_dir, lines_per_file=7000, prefix="split"):
+import profiling
+import compressed_io
+from anchor_index import open_index
+from generate_tex import CHILD_ENTRY_PATTERN
+
+# Entry boundary marker the splitter cuts in front of
+ANCHOR_LINE_PATTERN = re.compile(r'##ANCHOR:i\d+##')
+
+# How many lines past the target split point to look for an anchor
+ANCHOR_SEARCH_LINES = 200
+
+def iter_chunk_ranges(all_lines, lines_per_file=7000):
+    """
+    Yield (start_line, end_line) ranges that split all_lines into chunks.
+    
+    Each chunk ends approximately every 'lines_per_file' lines, just before the
+    first anchor line (##ANCHOR:iXXXXX##) found within ANCHOR_SEARCH_LINES lines
+    of that point.  Without a nearby anchor the chunk ends at the exact line.
+    
+    Args:
+        all_lines (list): Lines of the input file
+        lines_per_file (int): Approximate number of lines per chunk
+    """
+    total_lines = len(all_lines)
+    start_line = 0
+    
+    while start_line < total_lines:
+        # Calculate the approximate end line for this chunk
+        approx_end_line = min(start_line + lines_per_file, total_lines)
+        
+        # If we're at the end of the file, use all remaining lines
+        if approx_end_line >= total_lines:
+            end_line = total_lines
+        else:
+            # Look for an anchor pattern after the approximate end line
+            found_anchor = False
+            
+            # Search up to ANCHOR_SEARCH_LINES lines after the approximate end line
+            max_search = min(approx_end_line + ANCHOR_SEARCH_LINES, total_lines)
+            
+            for i in range(approx_end_line, max_search):
+                if ANCHOR_LINE_PATTERN.match(all_lines[i].strip()):
+                    end_line = i  # Split just before this line
+                    found_anchor = True
+                    break
+            
+            # If no anchor is found, use the approximate end line
+            if not found_anchor:
+                profiling.count_fallback("split at exact line, no anchor nearby")
+                print(f"Warning: No anchor found near line {approx_end_line}, using exact line number")
+                end_line = approx_end_line
+        
+        yield start_line, end_line
+        
+        # Set the start line for the next chunk
+        start_line = end_line
+
+def iter_stream_chunks(lines, lines_per_file=7000):
+    """
+    Yield (start_line, end_line, chunk_lines) for an iterator of lines.
+    
+    Streaming counterpart of iter_chunk_ranges() with the same boundaries:
+    at most lines_per_file + ANCHOR_SEARCH_LINES lines are held at a time,
+    so a compressed report can be split without decompressing it to disk or
+    into memory first.
+    """
+    lines = iter(lines)
+    pending = []  # lines read but not yet yielded, starting at start_line
+    start_line = 0
+    exhausted = False
+    
+    while True:
+        while not exhausted and len(pending) < lines_per_file + ANCHOR_SEARCH_LINES:
+            line = next(lines, None)
+            if line is None:
+                exhausted = True
+            else:
+                pending.append(line)
+        if not pending:
+            return
+        
+        # If we're at the end of the file, use all remaining lines
+        if exhausted and len(pending) <= lines_per_file:
+            end = len(pending)
+        else:
+            # Look for an anchor pattern after the approximate end line
+            end = None
+            for i in range(lines_per_file, min(len(pending), lines_per_file + ANCHOR_SEARCH_LINES)):
+                if ANCHOR_LINE_PATTERN.match(pending[i].strip()):
+                    end = i  # Split just before this line
+                    break
+            
+            if end is None:
+                profiling.count_fallback("split at exact line, no anchor nearby")
+                print(f"Warning: No anchor found near line {start_line + lines_per_file}, using exact line number")
+                end = lines_per_file
+        
+        chunk = pending[:end]
+        del pending[:end]
+        yield start_line, start_line + end, chunk
+        start_line += end
+
+def iter_range_chunks(lines, ranges):
+    """Yield (start_line, end_line, chunk_lines) for consecutive line ranges of an iterator of lines."""
+    lines = iter(lines)
+    for start_line, end_line in ranges:
+        yield start_line, end_line, list(itertools.islice(lines, end_line - start_line))
+
+# Cost model of --chunks: an entry's compile time grows with its text, and
+# every person link and child entry expands to a hyperlink or box costing
+# about as much as this many bytes of plain text
+LINK_COST = 120
+CHILD_COST = 200
+
+def line_cost(line):
+    """Estimated compile cost of one line: its size plus a weight per person link and child entry."""
+    cost = len(line.encode('utf-8')) + LINK_COST * line.count('](')
+    if CHILD_ENTRY_PATTERN.match(line.lstrip()):
+        cost += CHILD_COST
+    return cost
+
+def scan_costs(lines):
+    """
+    Return (cumulative, anchor_lines) for an iterable of lines.
+    
+    cumulative[i] is the estimated cost of the first i lines, kept in an
+    array so millions of lines stay compact; anchor_lines lists the indices
+    of the anchor lines a chunk may start at.  The cost of any range of
+    lines, and so of any entry, is a difference of two cumulative values.
+    """
+    cumulative = array('q', [0])
+    anchor_lines = []
+    total = 0
+    for index, line in enumerate(lines):
+        if ANCHOR_LINE_PATTERN.match(line.strip()):
+            anchor_lines.append(index)
+        total += line_cost(line)
+        cumulative.append(total)
+    return cumulative, anchor_lines
+
+def plan_balanced_ranges(cumulative, anchor_lines, chunks):
+    """
+    Return (start_line, end_line) ranges packing whole entries into `chunks` chunks of near-equal cost.
+    
+    Chunks only end just before an anchor line.  The plan minimises the cost
+    of the most expensive chunk, which bounds the compile wall time when the
+    chunks are compiled in parallel: a binary search finds the smallest cost
+    limit that greedy packing fits into `chunks` chunks, and chunks are then
+    halved until there are exactly `chunks` of them (or one per entry).
+    
+    Args:
+        cumulative (array): Cumulative line costs from scan_costs()
+        anchor_lines (list): Anchor line indices from scan_costs()
+        chunks (int): Number of chunks wanted
+    """
+    total_lines = len(cumulative) - 1
+    if total_lines == 0:
+        return []
+    
+    # Entry boundaries and the cumulative cost at each of them
+    bounds = [0] + [line for line in anchor_lines if line > 0] + [total_lines]
+    positions = [cumulative[line] for line in bounds]
+    units = len(bounds) - 1
+    chunks = max(1, min(chunks, units))
+    
+    def pack(limit):
+        """Greedy unit end indices with no chunk above limit, or None if more than `chunks` are needed."""
+        ends = []
+        start = 0
+        while start < units:
+            end = bisect_right(positions, positions[start] + limit, start + 1) - 1
+            if end == start or len(ends) == chunks:
+                return None
+            ends.append(end)
+            start = end
+        return ends
+    
+    low = max(positions[i + 1] - positions[i] for i in range(units))
+    high = positions[-1] - positions[0]
+    while low < high:
+        middle = (low + high) // 2
+        if pack(middle) is None:
+            low = middle + 1
+        else:
+            high = middle
+    
+    # Split the most expensive chunks in two until there are `chunks` of them
+    starts_ends = []
+    start = 0
+    for end in pack(low):
+        starts_ends.append((start, end))
+        start = end
+    while len(starts_ends) < chunks:
+        index = max((i for i, (start, end) in enumerate(starts_ends) if end - start > 1),
+                    key=lambda i: positions[starts_ends[i][1]] - positions[starts_ends[i][0]])
+        start, end = starts_ends[index]
+        middle = bisect_left(positions, (positions[start] + positions[end]) / 2, start + 1, end - 1)
+        if middle > start + 1 and positions[end] - positions[middle - 1] < positions[middle] - positions[start]:
+            middle -= 1
+        starts_ends[index:index + 1] = [(start, middle), (middle, end)]
+    
+    return [(bounds[start], bounds[end]) for start, end in starts_ends]
+
+def iter_mmap_lines(mm):
+    """Yield the decoded lines of a memory-mapped file one at a time."""
+    mm.seek(0)
+    for line in iter(mm.readline, b''):
+        yield line.decode('utf-8', errors='replace')
+
+def iter_range_offsets(mm, ranges):
+    """Yield (start_offset, end_offset, start_line, end_line) for line ranges of a memory-mapped file."""
+    offset = 0
+    line = 0
+    for start_line, end_line in ranges:
+        start_offset = _skip_lines(mm, offset, start_line - line)
+        end_offset = _skip_lines(mm, start_offset, end_line - start_line)
+        yield start_offset, end_offset, start_line, end_line
+        offset = end_offset
+        line = end_line
+
+# Byte-level equivalents used by the memory-mapped splitter
+ANCHOR_LINE_BYTES_PATTERN = re.compile(rb'##ANCHOR:i\d+##')
+
+# Size of the slices scanned, hashed (and copied, when sendfile is unavailable) at a time
+MMAP_BLOCK_SIZE = 1 << 20
+
+def _skip_lines(mm, offset, count):
+    """Return the offset just past `count` more newlines from offset (or the file size)."""
+    size = len(mm)
+    while count > 0 and offset < size:
+        block = mm[offset:offset + MMAP_BLOCK_SIZE]
+        newlines = block.count(b'\n')
+        if newlines < count:
+            count -= newlines
+            offset += len(block)
+            continue
+        index = -1
+        for _ in range(count):
+            index = block.index(b'\n', index + 1)
+        return offset + index + 1
+    return min(offset, size)
+
+def iter_chunk_offsets(mm, lines_per_file=7000):
+    """
+    Yield (start_offset, end_offset, start_line, end_line) for each chunk of a memory-mapped file.
+
+    Byte-level counterpart of iter_chunk_ranges(): chunks end approximately
+    every 'lines_per_file' lines, just before the first anchor line within
+    ANCHOR_SEARCH_LINES lines of that point.  Lines are never decoded; only
+    the few lines searched for an anchor are sliced out of the map.
+    """
+    size = len(mm)
+    start_offset = 0
+    start_line = 0
+    
+    while start_offset < size:
+        # Offset of the line that would end this chunk
+        approx_offset = _skip_lines(mm, start_offset, lines_per_file)
+        approx_end_line = start_line + lines_per_file
+        
+        # If we're at the end of the file, use all remaining lines
+        if approx_offset >= size:
+            end_offset = size
+            end_line = start_line + mm[start_offset:].count(b'\n') + (0 if mm[size - 1:size] == b'\n' else 1)
+        else:
+            # Look for an anchor line after the approximate end line
+            found_anchor = False
+            offset = approx_offset
+            line = approx_end_line
+            
+            while line < approx_end_line + ANCHOR_SEARCH_LINES and offset < size:
+                newline = mm.find(b'\n', offset)
+                line_end = size if newline == -1 else newline + 1
+                if ANCHOR_LINE_BYTES_PATTERN.match(mm[offset:line_end].strip()):
+                    found_anchor = True
+                    break
+                offset = line_end
+                line += 1
+            
+            if found_anchor:
+                end_offset = offset  # Split just before this line
+                end_line = line
+            else:
+                profiling.count_fallback("split at exact line, no anchor nearby")
+                print(f"Warning: No anchor found near line {approx_end_line}, using exact line number")
+                end_offset = approx_offset
+                end_line = approx_end_line
+        
+        yield start_offset, end_offset, start_line, end_line
+        
+        start_offset = end_offset
+        start_line = end_line
+
+def copy_byte_range(input_fd, mm, start, end, output_file):
+    """Copy bytes [start, end) of the input to output_file without decoding them (compressing by extension)."""
+    with compressed_io.open_file(output_file, 'wb') as out:
+        offset = start
+        if hasattr(os, 'sendfile') and not compressed_io.compression_from_name(output_file):
+            try:
+                while offset < end:
+                    sent = os.sendfile(out.fileno(), input_fd, offset, end - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+            except OSError:
+                # Not supported for regular files on this platform - fall back to slice writes
+                profiling.count_fallback("sendfile unavailable, copied with writes")
+        while offset < end:
+            block_end = min(offset + MMAP_BLOCK_SIZE, end)
+            out.write(mm[offset:block_end])
+            offset = block_end
+
+def open_report(input_file):
+    """
+    Open the report as text, keeping each line terminator as it is in the file.
+    
+    Lines are split exactly as with universal newlines, but a chunk's lines
+    still encode to the report's own bytes ("\\r\\n" included), so the
+    manifest hashes and byte offsets are the same ones --mmap records.
+    write_chunk() ends every line with "\\n" as before.
+    """
+    return compressed_io.open_file(input_file, newline='')
+
+def read_lines(input_file):
+    """Read the whole input file as a list of lines, keeping their line terminators."""
+    with open_report(input_file) as f:
+        return f.readlines()
+
+def write_chunk(output_file, chunk):
+    """Write a list of lines to a chunk file (compressed if its name ends in .gz, .xz or .bz2), ending lines with \\n."""
+    text = ''.join(chunk)
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    with compressed_io.open_file(output_file, 'w') as f:
+        f.write(text)
+
+def chunk_path(output_dir, prefix, file_count, compress=None):
+    """Path of chunk number file_count, e.g. split3.txt or split3.txt.gz."""
+    return compressed_io.compressed_name(os.path.join(output_dir, f"{prefix}{file_count}.txt"), compress)
+
+# Manifest of a split, kept next to its chunks: a header with the input's size
+# and modification time and the split settings, then one line per chunk written
+MANIFEST_VERSION = 1
+
+# Anchor lines inside a chunk's bytes, for the first and last anchor of the manifest
+ANCHOR_ID_BYTES_PATTERN = re.compile(rb'^[ \t\r\f\v]*##ANCHOR:(i\d+)##', re.MULTILINE)
+
+def manifest_path(output_dir, prefix):
+    """Path of the manifest of the {prefix}N chunks in output_dir."""
+    return os.path.join(output_dir, f"{prefix}_manifest.jsonl")
+
+def chunk_anchors(data, start, end):
+    """
+    Return the IDs ('i123') of the first and last anchor lines in data[start:end], or (None, None).
+    
+    data is bytes or the report's mmap, searched in place; start must be the
+    start of a line.
+    """
+    first = ANCHOR_ID_BYTES_PATTERN.search(data, start, end)
+    if first is None:
+        return None, None
+    
+    # Search backwards from the end, so a large chunk is not scanned twice
+    position = data.rfind(b'##ANCHOR:i', start, end)
+    while position > first.start():
+        line_start = max(start, data.rfind(b'\n', start, position) + 1)
+        last = ANCHOR_ID_BYTES_PATTERN.match(data, line_start, end)
+        if last is not None:
+            return first.group(1).decode('ascii'), last.group(1).decode('ascii')
+        position = data.rfind(b'##ANCHOR:i', start, position)
+    return first.group(1).decode('ascii'), first.group(1).decode('ascii')
+
+def hash_range(data, start, end):
+    """Return the SHA-256 hex digest of data[start:end] (bytes or an mmap), hashed in blocks without copying them."""
+    digest = hashlib.sha256()
+    with memoryview(data) as view:
+        for block_start in range(start, end, MMAP_BLOCK_SIZE):
+            digest.update(view[block_start:min(block_start + MMAP_BLOCK_SIZE, end)])
+    return digest.hexdigest()
+
+def _file_stamp(path):
+    """Return [size, mtime_ns] of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+class ChunkManifest:
+    """
+    Manifest of a split: which chunks it wrote and what they contain.
+    
+    For every chunk the manifest records its line range, its byte range in
+    the (decompressed) report, its first and last anchor, the SHA-256 of its
+    content and the size and modification time of the chunk file.  On the
+    next split into the same directory:
+    
+    - a chunk whose content hashes the same as before under the same
+      settings, and whose file is still the one written then, is not
+      rewritten, so its mtime is kept and downstream builds see it unchanged;
+    - if the report and the settings are also unchanged (an interrupted split
+      being run again), chunks already recorded are kept without even
+      reading or hashing them, so the split resumes where it stopped.
+    
+    Records are written and flushed as each chunk is done, so an interrupted
+    split leaves a manifest of everything it finished.  finish() marks the
+    manifest complete and removes chunks of the previous split that the new
+    split no longer has.
+    """
+    
+    def __init__(self, output_dir, prefix, input_file, settings, force=False):
+        self.output_dir = output_dir
+        self.path = manifest_path(output_dir, prefix)
+        self.written = 0
+        self.unchanged = 0
+        self._old_complete = False
+        self._header = {'version': MANIFEST_VERSION, 'input': os.path.basename(input_file),
+                        'input_stamp': _file_stamp(input_file), 'settings': settings}
+        
+        old_header, self._old = (None, {}) if force else self._load()
+        self._same_input = old_header is not None and old_header == self._header
+        # Chunks are only comparable by content digest if they were written the same way
+        self._same_settings = old_header is not None and old_header.get('settings') == settings
+        self.resumed = self._same_input and not self._old_complete and bool(self._old)
+        self._names = set()
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._write_line(self._header)
+    
+    def _load(self):
+        """Read the previous manifest: (header, {chunk name: record}), or (None, {}) if there is none."""
+        records = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                for line in f:
+                    record = json.loads(line)
+                    if record.get('complete'):
+                        self._old_complete = True
+                    else:
+                        records[record['name']] = record
+        except (OSError, ValueError, KeyError, TypeError):
+            return None, {}
+        if not isinstance(header, dict) or header.get('version') != MANIFEST_VERSION:
+            return None, {}
+        return header, records
+    
+    def _write_line(self, record):
+        self._file.write(json.dumps(record, sort_keys=True) + "\n")
+        self._file.flush()
+    
+    def _on_disk(self, record):
+        """True if the chunk file of an old record is still the file that split wrote."""
+        return _file_stamp(os.path.join(self.output_dir, record['name'])) == record['file_stamp']
+    
+    def resume(self, output_file, start_line, end_line):
+        """
+        Return the old record of a chunk that can be kept without reading it, or None.
+        
+        That is only the case when the report and the settings are the same as
+        in the previous split, so the same lines produce the same chunk.
+        """
+        record = self._old.get(os.path.basename(output_file)) if self._same_input else None
+        if (record is None or record['first_line'] != start_line + 1 or record['last_line'] != end_line or
+                not self._on_disk(record)):
+            return None
+        self._names.add(record['name'])
+        self.unchanged += 1
+        self._write_line(record)
+        return record
+    
+    def is_unchanged(self, output_file, digest):
+        """
+        True if output_file is the file written by the previous split for content with this digest.
+        
+        The digest is of the chunk's bytes in the report, and --mmap writes
+        those bytes as they are while the other modes write \\n line endings,
+        so a chunk is only taken as unchanged if the settings are the same too.
+        """
+        record = self._old.get(os.path.basename(output_file)) if self._same_settings else None
+        return record is not None and record['sha256'] == digest and self._on_disk(record)
+    
+    def add(self, output_file, start_line, end_line, start_offset, end_offset, anchors, digest, written):
+        """Record a chunk that was just written (or found unchanged): its ranges, (first, last) anchors and digest."""
+        first_anchor, last_anchor = anchors
+        record = {
+            'name': os.path.basename(output_file),
+            'first_line': start_line + 1,
+            'last_line': end_line,
+            'start_offset': start_offset,
+            'end_offset': end_offset,
+            'first_anchor': first_anchor,
+            'last_anchor': last_anchor,
+            'sha256': digest,
+            'file_stamp': _file_stamp(output_file),
+        }
+        self._names.add(record['name'])
+        if written:
+            self.written += 1
+        else:
+            self.unchanged += 1
+        self._write_line(record)
+        return record
+    
+    def finish(self):
+        """Mark the manifest complete and remove chunk files the previous split wrote but this one did not."""
+        for name, record in self._old.items():
+            if name not in self._names and self._on_disk(record):
+                stale_file = os.path.join(self.output_dir, name)
+                os.remove(stale_file)
+                print(f"Removed {stale_file} (no longer part of the split)")
+        self._write_line({'complete': True, 'chunks': len(self._names)})
+    
+    def close(self):
+        self._file.close()
+
+def save_chunk(manifest, output_file, start_line, end_line, start_offset, read_data, write):
+    """
+    Write one chunk unless the manifest shows it unchanged; return its end offset.
+    
+    read_data() returns (data, start, end), where data[start:end] are the
+    chunk's bytes in the report (data is the report's mmap, or the chunk's
+    encoded lines), and write() writes the chunk file.  Neither is called for
+    a chunk resumed from an interrupted split.
+    """
+    record = manifest.resume(output_file, start_line, end_line)
+    if record is not None:
+        print(f"Skipped {output_file} (unchanged, lines {start_line+1} to {end_line})")
+        return record['end_offset']
+    
+    data, start, end = read_data()
+    digest = hash_range(data, start, end)
+    if manifest.is_unchanged(output_file, digest):
+        print(f"Skipped {output_file} (unchanged, lines {start_line+1} to {end_line})")
+        written = False
+    else:
+        write()
+        print(f"Created {output_file} with lines {start_line+1} to {end_line}")
+        written = True
+    anchors = chunk_anchors(data, start, end)
+    return manifest.add(output_file, start_line, end_line, start_offset, start_offset + end - start, anchors, digest,
+                        written)['end_offset']
+
+def _encoded_range(chunk):
+    """read_data() result for a chunk held as lines: its bytes and their full range."""
+    data = ''.join(chunk).encode('utf-8')
+    return data, 0, len(data)
+
+def print_summary(file_count, manifest):
+    if manifest.unchanged:
+        print(f"Splitting complete. Created {file_count} files "
+              f"({manifest.written} written, {manifest.unchanged} unchanged; see {manifest.path}).")
+    else:
+        print(f"Splitting complete. Created {file_count} files.")
+
+def _split_file_stream(input_file, output_dir, lines_per_file, prefix, manifest, chunks=None, compress=None):
+    """
+    Streaming implementation of split_file() for compressed reports.
+    
+    Chunks are identical to the line-based split, but the input is
+    decompressed as it is read and only about one chunk is held in memory.
+    --chunks needs the total cost first, so it reads the input twice.
+    """
+    if chunks:
+        with open_report(input_file) as f:
+            ranges = plan_balanced_ranges(*scan_costs(f), chunks)
+    
+    file_count = 0
+    total_lines = 0
+    offset = 0
+    with open_report(input_file) as f:
+        if chunks:
+            chunk_lines = iter_range_chunks(f, ranges)
+        else:
+            chunk_lines = iter_stream_chunks(f, lines_per_file)
+        for start_line, end_line, chunk in chunk_lines:
+            file_count += 1
+            output_file = chunk_path(output_dir, prefix, file_count, compress)
+            try:
+                offset = save_chunk(manifest, output_file, start_line, end_line, offset,
+                                    lambda: _encoded_range(chunk), lambda: write_chunk(output_file, chunk))
+            except (IOError, PermissionError) as e:
+                print(f"Error: Cannot write to file '{output_file}': {e}")
+                return False
+            total_lines = end_line
+    
+    manifest.finish()
+    print(f"Total lines in input file: {total_lines}")
+    print_summary(file_count, manifest)
+    return True
+
+def _split_file_mmap(input_file, output_dir, lines_per_file, prefix, manifest, chunks=None, compress=None):
+    """Memory-mapped implementation of split_file(); chunks are byte-for-byte copies of the input."""
+    file_count = 0
+    total_lines = 0
+    
+    with open(input_file, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            manifest.finish()
+            print("Total lines in input file: 0")
+            print("Splitting complete. Created 0 files.")
+            return True
+        
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if chunks:
+                ranges = plan_balanced_ranges(*scan_costs(iter_mmap_lines(mm)), chunks)
+                chunk_offsets = iter_range_offsets(mm, ranges)
+            else:
+                chunk_offsets = iter_chunk_offsets(mm, lines_per_file)
+            for start_offset, end_offset, start_line, end_line in chunk_offsets:
+                file_count += 1
+                output_file = chunk_path(output_dir, prefix, file_count, compress)
+                try:
+                    save_chunk(manifest, output_file, start_line, end_line, start_offset,
+                               lambda: (mm, start_offset, end_offset),
+                               lambda: copy_byte_range(f.fileno(), mm, start_offset, end_offset, output_file))
+                except (IOError, PermissionError) as e:
+                    print(f"Error: Cannot write to file '{output_file}': {e}")
+                    return False
+                total_lines = end_line
+    
+    manifest.finish()
+    print(f"Total lines in input file: {total_lines}")
+    print_summary(file_count, manifest)
+    return True
+
+def split_file(input_file, output_dir, lines_per_file=7000, prefix="split", use_mmap=False, chunks=None,
+               compress=None, force=False):
     """
     Split a large text file into smaller files at anchor points.
     
@@ -21,6 +654,18 @@ def split_file(input_file, output_dir, lines_per_file=7000, prefix="split"):
         output_dir (str): Directory where split files will be created
         lines_per_file (int): Approximate number of lines per output file
         prefix (str): Prefix for output filenames (default: "split")
+        use_mmap (bool): Memory-map the input and copy chunks as raw byte ranges,
+            keeping memory flat on multi-GB inputs (default: False)
+        chunks (int): Instead of cutting every 'lines_per_file' lines, pack whole
+            entries into this many chunks of near-equal estimated compile cost
+        compress (str): Write the chunks compressed: 'gz', 'xz' or 'bz2'
+            (default: plain .txt).  Compressed inputs are detected and
+            decompressed as they are read, whatever this is.
+        force (bool): Rewrite every chunk, even those the manifest shows unchanged
+    
+    Chunk files whose content is unchanged since the last split into the
+    same directory are left untouched, and an interrupted split picks up
+    where it stopped; see ChunkManifest.
     
     Returns:
         bool: True if successful, False if there were errors
@@ -32,7 +677,7 @@ def split_file(input_file, output_dir, lines_per_file=7000, prefix="split"):
     
     # Validate input file is readable
     try:
-        with open(input_file, 'r', encoding='utf-8') as test_file:
+        with compressed_io.open_file(input_file) as test_file:
             test_file.readline()
     except (IOError, UnicodeDecodeError) as e:
         print(f"Error: Cannot read input file '{input_file}': {e}")
@@ -44,64 +689,110 @@ def split_file(input_file, output_dir, lines_per_file=7000, prefix="split"):
         print(f"Error: Cannot create/access output directory '{output_dir}': {e}")
         return False
     
+    compressed = compressed_io.is_compressed(input_file)
+    if compressed and use_mmap:
+        profiling.count_fallback("compressed input, split as a stream")
+        print("Note: --mmap needs an uncompressed input; splitting the compressed input as a stream")
+        use_mmap = False
+    
+    # --mmap copies raw bytes while the other modes rewrite decoded lines, so chunks may differ between them
+    settings = {'lines_per_file': None if chunks else lines_per_file, 'chunks': chunks,
+                'compress': compress, 'mmap': use_mmap}
+    try:
+        manifest = ChunkManifest(output_dir, prefix, input_file, settings, force)
+    except (PermissionError, OSError) as e:
+        print(f"Error: Cannot write manifest to '{output_dir}': {e}")
+        return False
+    if manifest.resumed:
+        print(f"Resuming the interrupted split recorded in {manifest.path}")
+    
+    # A split that fails or is interrupted leaves the manifest without its final line, to be resumed
+    try:
+        if compressed:
+            return _split_file_stream(input_file, output_dir, lines_per_file, prefix, manifest, chunks, compress)
+        if use_mmap:
+            return _split_file_mmap(input_file, output_dir, lines_per_file, prefix, manifest, chunks, compress)
+        return _split_file_lines(input_file, output_dir, lines_per_file, prefix, manifest, chunks, compress)
+    finally:
+        manifest.close()
+
+def _split_file_lines(input_file, output_dir, lines_per_file, prefix, manifest, chunks=None, compress=None):
+    """Line-based implementation of split_file(), reading the whole report into memory."""
     # Read the entire input file
-    with open(input_file, 'r', encoding='utf-8') as f:
-        all_lines = f.readlines()
+    all_lines = read_lines(input_file)
     
     total_lines = len(all_lines)
     print(f"Total lines in input file: {total_lines}")
     
-    start_line = 0
     file_count = 0
+    offset = 0
     
-    while start_line < total_lines:
+    if chunks:
+        ranges = plan_balanced_ranges(*scan_costs(all_lines), chunks)
+    else:
+        ranges = iter_chunk_ranges(all_lines, lines_per_file)
+    
+    for start_line, end_line in ranges:
         file_count += 1
         
-        # Calculate the approximate end line for this chunk
-        approx_end_line = min(start_line + lines_per_file, total_lines)
-        
-        # If we're at the end of the file, use all remaining lines
-        if approx_end_line >= total_lines:
-            end_line = total_lines
-        else:
-            # Look for an anchor pattern after the approximate end line
-            found_anchor = False
-            search_line = approx_end_line
-            
-            # Search up to 200 lines after the approximate end line
-            max_search = min(approx_end_line + 200, total_lines)
-            
-            for i in range(approx_end_line, max_search):
-                if re.match(r'##ANCHOR:i\d+##', all_lines[i].strip()):
-                    end_line = i  # Split just before this line
-                    found_anchor = True
-                    break
-            
-            # If no anchor is found, use the approximate end line
-            if not found_anchor:
-                print(f"Warning: No anchor found near line {approx_end_line}, using exact line number")
-                end_line = approx_end_line
-        
         # Create the output file name using the prefix
-        output_file = os.path.join(output_dir, f"{prefix}{file_count}.txt")
+        output_file = chunk_path(output_dir, prefix, file_count, compress)
         
-        # Extract the chunk of lines and write to output file
+        # Extract the chunk of lines and write to output file (unless it is unchanged)
+        chunk = all_lines[start_line:end_line]
         try:
-            chunk = all_lines[start_line:end_line]
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.writelines(chunk)
-            
-            print(f"Created {output_file} with lines {start_line+1} to {end_line}")
+            offset = save_chunk(manifest, output_file, start_line, end_line, offset,
+                                lambda: _encoded_range(chunk), lambda: write_chunk(output_file, chunk))
         except (IOError, PermissionError) as e:
             print(f"Error: Cannot write to file '{output_file}': {e}")
             return False
-        
-        # Set the start line for the next chunk
-        start_line = end_line
     
-    print(f"Splitting complete. Created {file_count} files.")
+    manifest.finish()
+    print_summary(file_count, manifest)
     return True
 
+def print_plan(input_file, output_dir, lines_per_file=7000, prefix="split", chunks=None, compress=None):
+    """Print the exact chunks split_file() would create, with their entries and estimated compile costs."""
+    all_lines = read_lines(input_file)
+    cumulative, anchor_lines = scan_costs(all_lines)
+    if chunks:
+        ranges = plan_balanced_ranges(cumulative, anchor_lines, chunks)
+    else:
+        ranges = list(iter_chunk_ranges(all_lines, lines_per_file))
+    
+    print(f"Would process {len(all_lines)} lines into {len(ranges)} files")
+    if not ranges:
+        return
+    
+    average = cumulative[-1] / len(ranges) or 1
+    largest = 0
+    for file_count, (start_line, end_line) in enumerate(ranges, 1):
+        cost = cumulative[end_line] - cumulative[start_line]
+        largest = max(largest, cost)
+        entries = bisect_left(anchor_lines, end_line) - bisect_left(anchor_lines, start_line)
+        output_file = chunk_path(output_dir, prefix, file_count, compress)
+        print(f"  Would create: {output_file} (lines {start_line+1} to {end_line}, {entries} entries, "
+              f"cost {cost}, {cost / average:.0%} of average)")
+    print(f"Largest chunk costs {largest / average:.0%} of the average")
+
+def instrument_stages(profiler):
+    """Time reading, chunk planning, the manifest and writing for --profile by swapping in timing wrappers."""
+    module = sys.modules[__name__]
+    profiler.patch(module, 'read_lines', profiler.timed('reading', read_lines))
+    profiler.patch(module, 'iter_chunk_ranges', profiler.timed_generator('segmentation', iter_chunk_ranges))
+    profiler.patch(module, 'iter_chunk_offsets', profiler.timed_generator('segmentation', iter_chunk_offsets))
+    profiler.patch(module, 'iter_stream_chunks', profiler.timed_generator('segmentation', iter_stream_chunks))
+    profiler.patch(module, 'scan_costs', profiler.timed('cost estimation', scan_costs))
+    profiler.patch(module, 'plan_balanced_ranges', profiler.timed('segmentation', plan_balanced_ranges))
+    # Hashing chunks and recording them; the writes inside are timed as writing
+    profiler.patch(module, 'save_chunk', profiler.timed('manifest', save_chunk))
+    
+    # Writes are timed per chunk so the slowest chunks can be listed
+    profiler.patch(module, 'write_chunk', profiler.timed('writing', write_chunk,
+                                                         label=lambda args: os.path.basename(args[0])))
+    profiler.patch(module, 'copy_byte_range', profiler.timed('writing', copy_byte_range,
+                                                             label=lambda args: os.path.basename(args[4])))
+
 def main():
     """Main function with command-line interface and fallback to hardcoded values."""
     parser = argparse.ArgumentParser(
@@ -112,6 +803,10 @@ Examples:
   python split_file.py input.txt output_dir/
   python split_file.py "Blake Tonda.txt" "chunks/" --lines 5000 --prefix "chunk"
   python split_file.py data.txt "D:/reports/chunks/" --prefix "parsed_chunked_output"
+  python split_file.py huge_report.txt chunks/ --mmap
+  python split_file.py huge_report.txt chunks/ --profile
+  python split_file.py huge_report.txt chunks/ --chunks 8 --dry-run
+  python split_file.py archived_report.txt.xz chunks/ --compress gz
   
 If no arguments provided, uses hardcoded defaults for backward compatibility.
         """
@@ -123,11 +818,25 @@ If no arguments provided, uses hardcoded defaults for backward compatibility.
                        help='Approximate lines per chunk (default: 7000)')
     parser.add_argument('--prefix', '-p', default='split',
                        help='Prefix for output files (default: "split")')
+    parser.add_argument('--chunks', '-k', type=int, default=None,
+                       help='Pack whole entries into this many chunks of near-equal compile cost instead of cutting every --lines lines')
     parser.add_argument('--dry-run', action='store_true',
-                       help='Show what would be done without actually splitting')
+                       help='Print the exact chunk plan without actually splitting')
+    parser.add_argument('--mmap', action='store_true',
+                       help='Memory-map the input and copy chunks as raw byte ranges (flat memory on multi-GB files)')
+    parser.add_argument('--compress', choices=compressed_io.COMPRESSIONS, default=None,
+                       help='Write compressed chunks (.txt.gz, .txt.xz or .txt.bz2); compressed inputs are always detected')
+    parser.add_argument('--force', action='store_true',
+                       help='Rewrite every chunk, even those unchanged since the last split (see <prefix>_manifest.jsonl)')
+    parser.add_argument('--index', action='store_true',
+                       help='Also build (or refresh) the <input_file>.idx anchor index used by generate_tex.py --ids/--range')
+    profiling.add_arguments(parser)
     
     args = parser.parse_args()
     
+    if args.chunks is not None and args.chunks < 1:
+        parser.error("--chunks must be at least 1")
+    
     # If no arguments provided, use hardcoded defaults for backward compatibility
     if args.input_file is None or args.output_dir is None:
         print("No arguments provided, using hardcoded defaults...")
@@ -146,24 +855,40 @@ If no arguments provided, uses hardcoded defaults for backward compatibility.
     print(f"Configuration:")
     print(f"  Input file: {input_file}")
     print(f"  Output directory: {output_dir}")
-    print(f"  Lines per file: {lines_per_file}")
+    if args.chunks:
+        print(f"  Chunks: {args.chunks} (balanced by estimated compile cost)")
+    else:
+        print(f"  Lines per file: {lines_per_file}")
     print(f"  File prefix: {prefix}")
     
     if args.dry_run:
         print("\n*** DRY RUN MODE - No files will be created ***")
         if os.path.exists(input_file):
-            with open(input_file, 'r', encoding='utf-8') as f:
-                total_lines = sum(1 for line in f)
-            estimated_files = (total_lines + lines_per_file - 1) // lines_per_file
-            print(f"Would process {total_lines} lines into approximately {estimated_files} files")
-            for i in range(1, estimated_files + 1):
-                print(f"  Would create: {os.path.join(output_dir, f'{prefix}{i}.txt')}")
+            print_plan(input_file, output_dir, lines_per_file, prefix, args.chunks, args.compress)
         else:
             print(f"Input file '{input_file}' not found!")
         return
     
+    profiler = None
+    if args.profile:
+        profiler = profiling.Profiler(args.profile_top, 'chunks')
+        instrument_stages(profiler)
+    
     # Perform the split
-    success = split_file(input_file, output_dir, lines_per_file, prefix)
+    with profiler or contextlib.nullcontext(), profiling.dumps(args.cprofile, args.tracemalloc):
+        success = split_file(input_file, output_dir, lines_per_file, prefix, args.mmap, args.chunks, args.compress,
+                             args.force)
+    
+    if profiler is not None:
+        profiler.report()
+    
+    if success and args.index and compressed_io.is_compressed(input_file):
+        print("Note: the anchor index needs an uncompressed report; --index skipped")
+    elif success and args.index:
+        index, rebuilt = open_index(input_file)
+        status = "Built" if rebuilt else "Reused up-to-date"
+        print(f"{status} anchor index {index.path} ({len(index)} entries)")
+        index.close()
     
     if success:
         print("\n✅ Split operation completed successfully!")
@@ -0,0 +1,30 @@
+"""
+Shared fixtures: small generated reports, and the repository's modules and
+the corpus generator on sys.path (they are scripts, not an installed package).
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from helpers import make_report
+
+@pytest.fixture
+def report(tmp_path):
+    """A 300-person report with ##ANCHOR lines."""
+    return make_report(tmp_path / "report.txt")
+
+@pytest.fixture
+def plain_report(tmp_path):
+    """The same kind of report without ##ANCHOR lines."""
+    return make_report(tmp_path / "plain.txt", anchors=False)
+
+@pytest.fixture
+def in_tmp_path(tmp_path, monkeypatch):
+    """Run the test from tmp_path, since master files hold \\input paths relative to the working directory."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
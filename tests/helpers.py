@@ -0,0 +1,29 @@
+"""Helpers shared by the tests: generated reports and reading back .tex output."""
+import re
+
+from generate_corpus import write_corpus
+
+INPUT_LINE_PATTERN = re.compile(r'^\\input\{(.*)\}$')
+
+def make_report(path, persons=300, seed=1, anchors=True):
+    """Write a generated report of `persons` persons to path and return path."""
+    with open(path, 'w', encoding='utf-8') as f:
+        write_corpus(f, persons, seed, anchors)
+    return str(path)
+
+def inline_master(master_file):
+    """Return a master file's text with every \\input line replaced by the file it includes."""
+    parts = []
+    with open(master_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = INPUT_LINE_PATTERN.match(line.rstrip('\n'))
+            if match:
+                with open(match.group(1) + '.tex', 'r', encoding='utf-8') as included:
+                    parts.append(included.read())
+            else:
+                parts.append(line)
+    return ''.join(parts)
+
+def read_text(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
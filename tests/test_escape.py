@@ -0,0 +1,71 @@
+"""escape_latex() and escape_url() against the original chained str.replace() versions."""
+import itertools
+import random
+
+import pytest
+
+import generate_tex
+
+# Every character either escaper rewrites, the replacement texts themselves,
+# and characters that must pass through unchanged
+SPECIALS = "\\#$%&_{}~^"
+ALPHABET = SPECIALS + " aZ9é\n\t "
+FRAGMENTS = ["\\textbackslash{}", "\\#", "\\~{}", "{}", "\\\\", "__", "http://x.org/a_b?c=%20&d=~e^f#g"]
+
+def legacy_escape_latex(text):
+    """The original escape_latex()."""
+    if text is None or text == "":
+        return ""
+    text = text.replace('\\', '\\textbackslash{}')
+    text = text.replace('#', '\\#')
+    text = text.replace('$', '\\$')
+    text = text.replace('%', '\\%')
+    text = text.replace('&', '\\&')
+    text = text.replace('_', '\\_')
+    text = text.replace('{', '\\{')
+    text = text.replace('}', '\\}')
+    text = text.replace('~', '\\textasciitilde{}')
+    text = text.replace('^', '\\textasciicircum{}')
+    return text
+
+def legacy_escape_url(url):
+    """The original escape_url()."""
+    return url.replace("_", "\\_").replace("#", "\\#").replace("$", "\\$").replace("%", "\\%").replace("&", "\\&").replace("{", "\\{").replace("}", "\\}").replace("~", "\\~{}").replace("^", "\\^{}")
+
+def adversarial_strings():
+    """Every string of up to three special characters, then random mixes of characters and replacement texts."""
+    for length in range(4):
+        for chars in itertools.product(SPECIALS, repeat=length):
+            yield ''.join(chars)
+    rng = random.Random(3)
+    for _ in range(2000):
+        pieces = [rng.choice(ALPHABET) if rng.random() < 0.8 else rng.choice(FRAGMENTS)
+                  for _ in range(rng.randint(1, 60))]
+        yield ''.join(pieces)
+    # Longer than ESCAPE_CACHE_MAX_LENGTH, so the uncached path is taken
+    yield ''.join(rng.choice(ALPHABET) for _ in range(generate_tex.ESCAPE_CACHE_MAX_LENGTH * 3))
+
+@pytest.fixture(params=[generate_tex.ESCAPE_CACHE_SIZE, 0], ids=['cached', 'uncached'])
+def cache_size(request):
+    generate_tex.set_escape_cache_size(request.param)
+    yield request.param
+    generate_tex.set_escape_cache_size(generate_tex.ESCAPE_CACHE_SIZE)
+
+def test_escape_latex_matches_legacy(cache_size):
+    for text in adversarial_strings():
+        assert generate_tex.escape_latex(text) == legacy_escape_latex(text), repr(text)
+
+def test_escape_url_matches_legacy(cache_size):
+    for text in adversarial_strings():
+        assert generate_tex.escape_url(text) == legacy_escape_url(text), repr(text)
+
+def test_cache_hits_return_the_same_text():
+    generate_tex.set_escape_cache_size(generate_tex.ESCAPE_CACHE_SIZE)
+    text = "St. Louis & Co, 50% of #3_{x}~^"
+    first = generate_tex.escape_latex(text)
+    assert generate_tex.escape_latex(text) == first == legacy_escape_latex(text)
+    assert generate_tex.escape_cache_info()['latex'].hits >= 1
+
+def test_escape_latex_of_nothing_is_empty():
+    assert generate_tex.escape_latex(None) == ""
+    assert generate_tex.escape_latex("") == ""
@@ -0,0 +1,75 @@
+"""The --parsed-cache round trip: records written while converting, rendered back to the same .tex."""
+import os
+
+import pytest
+
+import generate_tex
+from helpers import read_text
+
+@pytest.fixture
+def expected(report, tmp_path):
+    """The .tex of a plain conversion of the report."""
+    output_file = str(tmp_path / "expected.tex")
+    generate_tex.convert_file(report, output_file)
+    return read_text(output_file)
+
+@pytest.mark.parametrize('dedup', [False, True], ids=['plain', 'dedup'])
+def test_round_trip_renders_the_same_tex(report, tmp_path, expected, dedup, capsys):
+    cache_file = str(tmp_path / "report.parsed")
+    output_file = str(tmp_path / "output.tex")
+    store = generate_tex.TextStore() if dedup else None
+
+    generate_tex.convert_parsed(report, output_file, cache_file, store=store)
+    assert "Saved parsed cache" in capsys.readouterr().out
+    assert read_text(output_file) == expected
+
+    os.remove(output_file)
+    generate_tex.convert_parsed(report, output_file, cache_file)
+    assert "Rendering from parsed cache" in capsys.readouterr().out
+    assert read_text(output_file) == expected
+
+def test_round_trip_with_jobs(report, tmp_path, expected):
+    cache_file = str(tmp_path / "report.parsed")
+    output_file = str(tmp_path / "output.tex")
+    generate_tex.convert_parsed(report, output_file, cache_file, jobs=2, batch_size=50)
+    generate_tex.convert_parsed(report, output_file, cache_file, jobs=2, batch_size=50)
+    assert read_text(output_file) == expected
+
+def test_truncated_cache_is_reparsed(report, tmp_path, expected, capsys):
+    cache_file = str(tmp_path / "report.parsed")
+    output_file = str(tmp_path / "output.tex")
+    generate_tex.convert_parsed(report, output_file, cache_file)
+    size = os.path.getsize(cache_file)
+    with open(cache_file, 'r+b') as f:
+        f.truncate(size // 2)
+    capsys.readouterr()
+
+    assert generate_tex.read_parsed_cache(cache_file, report) is None
+    generate_tex.convert_parsed(report, output_file, cache_file)
+    assert "re-parsing the report" in capsys.readouterr().out
+    assert read_text(output_file) == expected
+    assert os.path.getsize(cache_file) == size
+
+def test_cache_of_another_report_is_ignored(report, tmp_path, capsys):
+    cache_file = str(tmp_path / "report.parsed")
+    output_file = str(tmp_path / "output.tex")
+    generate_tex.convert_parsed(report, output_file, cache_file)
+    with open(report, 'a', encoding='utf-8') as f:
+        f.write("\n##ANCHOR:i999999##\n999. Late Addition, born 1990\nA note.\n")
+    capsys.readouterr()
+
+    generate_tex.convert_parsed(report, output_file, cache_file)
+    assert "Rendering from parsed cache" not in capsys.readouterr().out
+    assert "Late Addition" in read_text(output_file)
+
+def test_records_through_render_cache(report, tmp_path, expected):
+    with open(report, 'r', encoding='utf-8') as f:
+        text = f.read()
+    for run in range(2):
+        cache = generate_tex.RenderCache(str(tmp_path / "render.cache"))
+        entries = ((person_id, generate_tex.parse_entry(person_id, entry_content))
+                   for person_id, entry_content in generate_tex.split_report(text)[1])
+        rendered = ''.join(generate_tex.iter_fragments(entries, cache=cache, render=generate_tex.render_record_text))
+        assert (cache.hits, cache.misses) == ((0, 300) if run == 0 else (300, 0))
+        cache.close()
+        assert rendered == expected
@@ -0,0 +1,49 @@
+"""Single-pass segmentation, including the fallback for reports without anchors."""
+import io
+
+import generate_tex
+from bench_segment import legacy_split_report
+
+def segment(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        has_anchors, entries = generate_tex.split_report(f)
+        return has_anchors, list(entries)
+
+def legacy_segment(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        has_anchors, entries = legacy_split_report(f)
+        return has_anchors, list(entries)
+
+def test_anchored_report_matches_legacy_segmenter(report):
+    has_anchors, entries = segment(report)
+    assert has_anchors
+    assert len(entries) == 300
+    assert (has_anchors, entries) == legacy_segment(report)
+
+def test_report_without_anchors_falls_back_to_person_lines(plain_report):
+    has_anchors, entries = segment(plain_report)
+    assert not has_anchors
+    # Without anchors an entry is identified by its number
+    assert [person_id for person_id, entry_content in entries] == [str(number) for number in range(1, 301)]
+    assert (has_anchors, entries) == legacy_segment(plain_report)
+
+def test_detect_format_keeps_every_line():
+    lines = ["Header", "", "1. Anna Smith, born 1900", "##ANCHOR:i7##", "2. Carl Smith", "more"]
+    for report_lines in (lines, lines[:3]):
+        has_anchors, all_lines = generate_tex.detect_format(iter(report_lines))
+        assert has_anchors == ("##ANCHOR:i7##" in report_lines)
+        assert list(all_lines) == report_lines
+
+def test_late_anchor_is_segmented_by_person_lines(monkeypatch, capsys):
+    monkeypatch.setattr(generate_tex, 'FORMAT_DETECT_LINES', 3)
+    text = "First Generation\n\n1. Anna Smith, born 1900\nShe lived in Trier.\n##ANCHOR:i42##\n2. Carl Smith, born 1870\nA farmer.\n"
+    has_anchors, entries = generate_tex.split_report(io.StringIO(text))
+    entries = list(entries)
+    assert not has_anchors
+    assert [person_id for person_id, entry_content in entries] == ['1', '2']
+    assert "is an anchor, but the first 3 lines had none" in capsys.readouterr().out
+
+def test_string_and_stream_sources_agree(report):
+    with open(report, 'r', encoding='utf-8') as f:
+        text = f.read()
+    assert list(generate_tex.iter_latex(text)) == list(generate_tex.iter_latex(io.StringIO(text)))
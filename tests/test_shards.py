@@ -0,0 +1,40 @@
+"""Sharded output and batch master files: inlining every \\input gives the single-file .tex."""
+import os
+
+import pytest
+
+import generate_tex
+import batch_convert
+from helpers import inline_master, read_text
+
+@pytest.fixture
+def expected(report, in_tmp_path):
+    generate_tex.convert_file(report, "single.tex")
+    return read_text("single.tex")
+
+@pytest.mark.parametrize('shard_limits', [(None, 25), (20000, None), (20000, 10), (None, 1000)],
+                         ids=['entries', 'bytes', 'both', 'one-shard'])
+def test_shards_inline_to_single_file(report, expected, shard_limits):
+    generate_tex.convert_file(report, "book.tex", shard_limits=shard_limits)
+    assert inline_master("book.tex") == expected
+
+def test_shard_bytes_limit_is_kept(report, expected):
+    generate_tex.convert_file(report, "book.tex", shard_limits=(20000, None))
+    for tex_file in generate_tex.master_inputs("book.tex"):
+        assert os.path.getsize(tex_file) <= 20000 or read_text(tex_file).count("\\dividerline") == 0
+
+def test_old_shards_are_removed(report, expected):
+    generate_tex.convert_file(report, "book.tex", shard_limits=(None, 10))
+    generate_tex.convert_file(report, "book.tex", shard_limits=(None, 100))
+    shards = sorted(name for name in os.listdir('.') if name.startswith("book_shard"))
+    assert shards == ["book_shard1.tex", "book_shard2.tex", "book_shard3.tex"]
+    assert inline_master("book.tex") == expected
+
+def test_streaming_shards_match(report, expected):
+    generate_tex.convert_file_streaming(report, "book.tex", shard_limits=(None, 40))
+    assert inline_master("book.tex") == expected
+
+def test_batch_master_inlines_to_single_file(report, expected):
+    assert batch_convert.batch_convert(report, "out", lines_per_file=400, jobs=1)
+    assert len(generate_tex.master_inputs(os.path.join("out", "part_master.tex"))) > 3
+    assert inline_master(os.path.join("out", "part_master.tex")) == expected
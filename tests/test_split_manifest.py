@@ -0,0 +1,98 @@
+"""split_file()'s manifest: skipping unchanged chunks, resuming an interrupted split, removing stale chunks."""
+import os
+import json
+
+import pytest
+
+import split_file
+from helpers import make_report, read_text
+
+def chunk_files(output_dir, prefix="split"):
+    return sorted(name for name in os.listdir(output_dir) if name.startswith(prefix) and name.endswith('.txt'))
+
+def snapshot(output_dir):
+    """{chunk name: (mtime_ns, content)} of every chunk in output_dir."""
+    return {name: (os.stat(os.path.join(output_dir, name)).st_mtime_ns, read_text(os.path.join(output_dir, name)))
+            for name in chunk_files(output_dir)}
+
+@pytest.fixture(params=[False, True], ids=['lines', 'mmap'])
+def use_mmap(request):
+    return request.param
+
+def test_resplit_keeps_unchanged_chunks(report, tmp_path, use_mmap, capsys):
+    output_dir = str(tmp_path / "chunks")
+    assert split_file.split_file(report, output_dir, 500, use_mmap=use_mmap)
+    before = snapshot(output_dir)
+    assert len(before) > 3
+    capsys.readouterr()
+
+    assert split_file.split_file(report, output_dir, 500, use_mmap=use_mmap)
+    assert snapshot(output_dir) == before
+    assert f"(0 written, {len(before)} unchanged" in capsys.readouterr().out
+
+def test_edited_entry_rewrites_only_its_chunk(report, tmp_path):
+    output_dir = str(tmp_path / "chunks")
+    assert split_file.split_file(report, output_dir, 500)
+    before = snapshot(output_dir)
+
+    text = read_text(report)
+    with open(report, 'w', encoding='utf-8') as f:
+        f.write(text.rstrip('\n') + " Edited.\n")
+    assert split_file.split_file(report, output_dir, 500)
+    after = snapshot(output_dir)
+    last = chunk_files(output_dir)[-1]
+    assert after[last][1].endswith("Edited.\n")
+    assert {name: after[name] for name in after if name != last} == {name: before[name] for name in before if name != last}
+
+def test_interrupted_split_resumes(report, tmp_path, capsys):
+    output_dir = str(tmp_path / "chunks")
+    fresh_dir = str(tmp_path / "fresh")
+    assert split_file.split_file(report, fresh_dir, 500)
+    assert split_file.split_file(report, output_dir, 500)
+
+    # Cut the manifest back to its first two chunks and drop the chunks after them, as an interrupted split leaves it
+    manifest_file = split_file.manifest_path(output_dir, "split")
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        f.writelines(lines[:3])
+    kept = [json.loads(line)['name'] for line in lines[1:3]]
+    for name in chunk_files(output_dir)[2:]:
+        os.remove(os.path.join(output_dir, name))
+    before = snapshot(output_dir)
+    capsys.readouterr()
+
+    assert split_file.split_file(report, output_dir, 500)
+    out = capsys.readouterr().out
+    assert "Resuming the interrupted split" in out
+    after = snapshot(output_dir)
+    assert {name: after[name] for name in kept} == before
+    assert {name: content for name, (mtime, content) in after.items()} == \
+        {name: content for name, (mtime, content) in snapshot(fresh_dir).items()}
+
+def test_fewer_chunks_remove_stale_ones(report, tmp_path):
+    output_dir = str(tmp_path / "chunks")
+    assert split_file.split_file(report, output_dir, 300)
+    many = len(chunk_files(output_dir))
+    assert split_file.split_file(report, output_dir, 3000)
+    assert len(chunk_files(output_dir)) < many
+    assert ''.join(read_text(os.path.join(output_dir, name)) for name in chunk_files(output_dir)) == read_text(report)
+
+def test_switching_mode_rewrites_crlf_chunks(tmp_path):
+    report = str(tmp_path / "crlf.txt")
+    make_report(report)
+    with open(report, 'rb') as f:
+        data = f.read()
+    with open(report, 'wb') as f:
+        f.write(data.replace(b'\n', b'\r\n'))
+    output_dir = str(tmp_path / "chunks")
+
+    # The line-based split writes \n endings, --mmap copies the report's \r\n
+    assert split_file.split_file(report, output_dir, 500)
+    assert split_file.split_file(report, output_dir, 500, use_mmap=True)
+    with open(os.path.join(output_dir, chunk_files(output_dir)[0]), 'rb') as f:
+        assert b'\r\n' in f.read()
+
+    assert split_file.split_file(report, output_dir, 500)
+    with open(os.path.join(output_dir, chunk_files(output_dir)[0]), 'rb') as f:
+        assert b'\r\n' not in f.read()